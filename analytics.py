@@ -0,0 +1,148 @@
+import threading  # Guards the per-version result cache
+
+import numpy as np  # Vectorized statistics over the marks column
+
+from db import get_data_version, get_distinct_subjects, iter_subject_marks, get_student_names_by_ids
+
+# Percentiles reported for every subject
+PERCENTILES = (10, 25, 75, 90)
+
+# Histogram bin edges: ten 10-mark buckets, the last one closed at 100
+HISTOGRAM_EDGES = np.arange(0, 101, 10)
+
+# Grade bands as (label, lowest mark); marks below every bound get the last label
+GRADE_BANDS = (('A', 90), ('B', 75), ('C', 60), ('D', 40), ('F', 0))
+
+# Best-ranked students listed per subject
+TOP_STUDENTS = 5
+
+# Label used for the school-wide row
+ALL_SUBJECTS = 'All subjects'
+
+
+# ---------------------------------------------------------
+# Function: load_marks_by_subject
+# Reads (id, marks) for every record, one subject at a time, straight
+# from the cursor into NumPy arrays (no per-row Python objects kept)
+# Returns:
+#   - dict subject -> structured array with 'id' and 'marks' fields
+# ---------------------------------------------------------
+_ROW_DTYPE = np.dtype([('id', np.int64), ('marks', np.int16)])
+
+def load_marks_by_subject(conn=None):
+    return {subject: np.fromiter(iter_subject_marks(subject, conn=conn), dtype=_ROW_DTYPE)
+            for subject in get_distinct_subjects(conn=conn)}
+
+
+# ---------------------------------------------------------
+# Function: competition_ranks
+# Standard competition ranking ("1224"): rank = 1 + number of
+# strictly higher marks, computed with one sort and a binary search
+# ---------------------------------------------------------
+def competition_ranks(marks):
+    ascending = np.sort(marks)
+    return len(marks) - np.searchsorted(ascending, marks, side='right') + 1
+
+
+# ---------------------------------------------------------
+# Function: grade_band_counts
+# Number of marks in each GRADE_BANDS band, in band order
+# ---------------------------------------------------------
+def grade_band_counts(marks):
+    bounds = np.array([low for _, low in reversed(GRADE_BANDS)])  # Ascending: 0, 40, 60, ...
+    band_index = np.searchsorted(bounds, marks, side='right') - 1
+    counts = np.bincount(band_index, minlength=len(bounds))[::-1]
+    return {label: int(count) for (label, _), count in zip(GRADE_BANDS, counts)}
+
+
+# ---------------------------------------------------------
+# Function: summarize_marks
+# All statistics for one array of marks (ids line up with marks)
+# Returns a dict of plain Python values, ready for templates/JSON
+# ---------------------------------------------------------
+def summarize_marks(ids, marks):
+    if len(marks) == 0:
+        return {'count': 0}
+
+    values = marks.astype(np.float64)
+    percentiles = np.percentile(values, PERCENTILES)
+    histogram, _ = np.histogram(marks, bins=HISTOGRAM_EDGES)
+    ranks = competition_ranks(marks)
+
+    # Top students without sorting everything: partition, then sort the few
+    top_count = min(TOP_STUDENTS, len(marks))
+    top = np.argpartition(-marks, top_count - 1)[:top_count]
+    top = top[np.lexsort((ids[top], -marks[top]))]
+
+    return {
+        'count': int(len(marks)),
+        'mean': float(values.mean()),
+        'median': float(np.median(values)),
+        'std': float(values.std()),
+        'min': int(marks.min()),
+        'max': int(marks.max()),
+        'percentiles': {p: float(v) for p, v in zip(PERCENTILES, percentiles)},
+        'histogram': [int(count) for count in histogram],
+        'grades': grade_band_counts(marks),
+        'top': [{'id': int(ids[i]), 'marks': int(marks[i]), 'rank': int(ranks[i])} for i in top],
+    }
+
+
+# ---------------------------------------------------------
+# Function: compute_class_analytics
+# Per-subject statistics plus a school-wide row
+# Returns:
+#   - list of (subject, summary) with ALL_SUBJECTS first
+# ---------------------------------------------------------
+def compute_class_analytics(conn=None):
+    arrays = load_marks_by_subject(conn=conn)
+    results = []
+    if arrays:
+        combined = np.concatenate(list(arrays.values()))
+        results.append((ALL_SUBJECTS, summarize_marks(combined['id'], combined['marks'])))
+    for subject, data in arrays.items():
+        results.append((subject, summarize_marks(data['id'], data['marks'])))
+
+    # Names only for the handful of top-ranked students, in one lookup
+    top_ids = {student['id'] for _, summary in results for student in summary.get('top', ())}
+    names = get_student_names_by_ids(top_ids, conn=conn)
+    for _, summary in results:
+        for student in summary.get('top', ()):
+            student['student_name'] = names.get(student['id'], '')
+    return results
+
+
+# ---------------------------------------------------------
+# Function: get_class_analytics
+# Cached entry point for the /analytics page
+# - Results are reused until get_data_version() changes, so repeat
+#   views cost one version query until a record is written
+# - cache: a dict from new_cache(); each app keeps its own, since data
+#   versions of different databases aren't comparable (default: the
+#   module's cache)
+# Returns:
+#   - (data_version, results)
+# ---------------------------------------------------------
+def new_cache():
+    return {'version': None, 'results': None}
+
+_cache = new_cache()
+_cache_lock = threading.Lock()
+
+def get_class_analytics(conn=None, cache=None):
+    cache = _cache if cache is None else cache
+    version = get_data_version(conn=conn)
+    with _cache_lock:
+        if cache['version'] == version:
+            return version, cache['results']
+
+    results = compute_class_analytics(conn=conn)
+    with _cache_lock:
+        cache['version'] = version
+        cache['results'] = results
+    return version, results
+
+# Drops the cached results (e.g. when the app is pointed at another database)
+def invalidate_cache(cache=None):
+    with _cache_lock:
+        (_cache if cache is None else cache).update(new_cache())
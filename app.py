@@ -1,42 +1,375 @@
 # Core Flask modules
-from flask import Flask, request, session, render_template, flash, url_for, redirect
+from flask import (Flask, Blueprint, current_app, request, session, render_template, flash, url_for,
+                   redirect, jsonify, Response, stream_with_context, stream_template, make_response, g,
+                   abort, get_flashed_messages, has_app_context)
+from flask.signals import before_render_template, template_rendered
+from flask.globals import request_ctx
+from markupsafe import Markup
+from jinja2 import FileSystemBytecodeCache
 
-# For password hashing and verification
-from werkzeug.security import check_password_hash
+# Off-thread password verification (bounded process pool)
+from auth import PasswordVerifier, VerifierBusy
 
 # Flask-WTF for CSRF protection
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 
 # For environment variable management
+import io
 import os
+import csv
+import json
+import time
+import gzip
+import zlib
+import hashlib
+import functools
 from dotenv import load_dotenv
 
-# Import helper to get teacher from DB, insert student record and get all student records
-from db import (get_teacher_by_username, insert_student_record, get_all_student_records,
-                delete_student_record, update_student_record, find_duplicate_record,
-                  fetch_student_record_by_id, log_update_message_for_records)
+# Connection setup, caches and constants from the synchronous DB layer
+from db import (init_app as init_db, Storage, TTLCache, iter_student_records, EXPORT_COLUMNS,
+                check_record_fields, RECORD_SORT_COLUMNS, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, record_key,
+                read_replica_stats, audit_entry, SQLITE_PATH)
+import db  # Synchronous helpers for work done while a response streams (outside the event loop)
+
+# Routes are async: DB helpers are awaited on per-request connection threads
+import asyncio
+import async_db
+from async_db import (get_teacher_by_username, upsert_student_record, delete_student_record,
+                      update_student_record, find_duplicate_record, fetch_student_record_by_id,
+                      unit_of_work, get_teacher_subjects, get_data_version,
+                      get_all_teachers, get_teacher_summaries, fetch_student_records_by_ids,
+                      find_duplicate_records_many, update_student_records_many,
+                      delete_student_records_many, insert_audit_entries, get_audit_history,
+                      init_app as init_async_db)
 # Login, Logout and Student forms using Flask-WTF
-from forms import LoginForm, LogoutForm, StudentForm
+from forms import LoginForm, LogoutForm, StudentForm, ImportForm, validate_student_row
+
+# Bulk CSV roster import (shared with the roster_import.py CLI)
+from roster_import import import_roster
+
+# Background writer for the audit log, and rotation of old entries into archive files
+from log_writer import LogWriter
+from audit_archive import AuditArchiver, DEFAULT_ARCHIVE_DIR, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_ROWS
+
+# Vectorized per-subject statistics for /analytics
+from analytics import (get_class_analytics, PERCENTILES, HISTOGRAM_EDGES, GRADE_BANDS,
+                       new_cache as new_analytics_cache)
+
+# Request, SQL and template timings exposed at /metrics
+import metrics
+
+# Schema migrations and index builds (run when the app is started directly)
+import models
 
 # Load environment variables from .env file (e.g., SECRET_KEY)
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
+# ---------------------------------------------------------
+# Configuration
+# Every setting is read from the environment (see README); create_app()
+# takes a dict overriding any of them by the same name, e.g.
+#     create_app({'TESTING': True, 'DATABASE_PATH': '/tmp/ledger.db'})
+# DATABASE_PATH is the SQLite file, or a 'file:' URI such as
+# 'file:ledger?mode=memory&cache=shared' for an in-memory database
+# ---------------------------------------------------------
+def _env_flag(name, default=''):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+def config_from_env():
+    return {
+        # Secret key is used to secure session data and CSRF tokens
+        'SECRET_KEY': os.environ.get('SECRET_KEY'),
+
+        # METRICS_ENABLED=1 turns on timing hooks, SQL tracing and /metrics
+        # SLOW_QUERY_MS=n logs SQL statements taking n ms or more (unset = off)
+        'METRICS_ENABLED': _env_flag('METRICS_ENABLED'),
+        'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS') or 0) or None,
+
+        # Storage backend and its settings (see db.configure)
+        # STORAGE_BACKEND=postgres with DATABASE_URL=postgresql://... uses PostgreSQL
+        # through a bounded connection pool; the SQLite defaults suit several
+        # worker processes sharing one database file
+        'STORAGE_BACKEND': os.environ.get('STORAGE_BACKEND', 'sqlite'),
+        'DATABASE_URL': os.environ.get('DATABASE_URL'),
+        'DATABASE_PATH': os.environ.get('DATABASE_PATH') or SQLITE_PATH,
+        'DB_POOL_MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        'DB_POOL_MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'DB_POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'SQLITE_JOURNAL_MODE': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'SQLITE_SYNCHRONOUS': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'SQLITE_BUSY_TIMEOUT_MS': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'SQLITE_MMAP_SIZE': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'SQLITE_CACHE_SIZE_KIB': int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 16 * 1024)),
+        'SQLITE_WRITE_RETRIES': int(os.environ.get('SQLITE_WRITE_RETRIES', 5)),
+        'READ_REPLICA': _env_flag('READ_REPLICA'),
+        'READ_REPLICA_MAX_STALENESS_MS': float(os.environ.get('READ_REPLICA_MAX_STALENESS_MS', 1000)),
+
+        # Connections one request may read through in parallel (see async_db.py)
+        'ASYNC_READ_CONNECTIONS': int(os.environ.get('ASYNC_READ_CONNECTIONS', 4)),
+
+        # Number of student records shown per dashboard page
+        'RECORDS_PER_PAGE': int(os.environ.get('RECORDS_PER_PAGE', DEFAULT_PAGE_SIZE)),
+
+        # Teachers (comma-separated usernames) allowed to browse every teacher's records
+        'ADMIN_USERNAMES': {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',')
+                            if name.strip()},
+
+        # Seconds a rendered records table (see /home) and a teacher row
+        # stay cached (0 disables the cache)
+        'FRAGMENT_CACHE_TTL': float(os.environ.get('FRAGMENT_CACHE_TTL', 300)),
+        'TEACHER_CACHE_TTL': float(os.environ.get('TEACHER_CACHE_TTL', 60)),
+
+        # Stream /home: send the page head before the records query runs (STREAM_HOME=0
+        # renders the whole page first, as before)
+        'STREAM_HOME': os.environ.get('STREAM_HOME', '1').lower() not in ('0', 'false', 'no'),
+
+        # Compiled templates are kept in a bytecode cache on disk, so a fresh worker
+        # loads them instead of compiling them again. JINJA_BYTECODE_CACHE_DIR picks
+        # the directory (default: a per-user temp directory); JINJA_BYTECODE_CACHE=0 turns it off
+        'JINJA_BYTECODE_CACHE': os.environ.get('JINJA_BYTECODE_CACHE', '1').lower() not in ('0', 'false', 'no'),
+        'JINJA_BYTECODE_CACHE_DIR': os.environ.get('JINJA_BYTECODE_CACHE_DIR') or None,
+
+        # Password hashes are checked in a process pool so logins scale across cores
+        # LOGIN_HASH_WORKERS=0 verifies inline; LOGIN_MAX_PENDING caps checks in flight
+        'LOGIN_HASH_WORKERS': int(os.environ['LOGIN_HASH_WORKERS']) if os.environ.get('LOGIN_HASH_WORKERS') else None,
+        'LOGIN_MAX_PENDING': int(os.environ.get('LOGIN_MAX_PENDING', 0)) or None,
+
+        # Audit entries older than AUDIT_MAX_AGE_DAYS, or beyond the newest AUDIT_MAX_ROWS,
+        # are moved to monthly files in AUDIT_ARCHIVE_DIR (0 switches a limit off)
+        'AUDIT_ARCHIVE_DIR': os.environ.get('AUDIT_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR),
+        'AUDIT_MAX_AGE_DAYS': float(os.environ.get('AUDIT_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS)),
+        'AUDIT_MAX_ROWS': int(os.environ.get('AUDIT_MAX_ROWS', DEFAULT_MAX_ROWS)),
+
+        # Audit entries are queued and written in batches by a worker thread,
+        # which also runs the rotation every AUDIT_ROTATE_INTERVAL seconds
+        'AUDIT_LOG_QUEUE_SIZE': int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', 10000)),
+        'AUDIT_LOG_BATCH_SIZE': int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 200)),
+        'AUDIT_LOG_FLUSH_INTERVAL': float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 0.5)),
+        'AUDIT_ROTATE_INTERVAL': float(os.environ.get('AUDIT_ROTATE_INTERVAL', 3600)),
+    }
+
+
+# ---------------------------------------------------------
+# Function: storage_settings
+# db.Storage / db.configure() keyword arguments for a config
+# (e.g. config_from_env() for scripts using the db.py helpers)
+# ---------------------------------------------------------
+def storage_settings(config):
+    return dict(
+        backend=config['STORAGE_BACKEND'],
+        database_url=config['DATABASE_URL'],
+        database_path=config['DATABASE_PATH'],
+        pool_min_size=config['DB_POOL_MIN_SIZE'],
+        pool_max_size=config['DB_POOL_MAX_SIZE'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        journal_mode=config['SQLITE_JOURNAL_MODE'],
+        synchronous=config['SQLITE_SYNCHRONOUS'],
+        busy_timeout_ms=config['SQLITE_BUSY_TIMEOUT_MS'],
+        mmap_size=config['SQLITE_MMAP_SIZE'],
+        cache_size_kib=config['SQLITE_CACHE_SIZE_KIB'],
+        write_retries=config['SQLITE_WRITE_RETRIES'],
+        read_replica=config['READ_REPLICA'],
+        replica_max_staleness_ms=config['READ_REPLICA_MAX_STALENESS_MS'])
+
+# ---------------------------------------------------------
+# Class: LedgerServices
+# What one app needs besides Flask, built by create_app() from the
+# app's config and kept in app.extensions['ledger'] (see services()),
+# so apps in one process (e.g. one per test) each use their own
+# database, caches and audit log:
+# - storage: database settings, backend, read replica and teacher cache (db.Storage)
+# - fragment_cache: rendered records tables, keyed by data version and view (see /home)
+# - analytics_cache: /analytics results for the current data version
+# - audit_archiver / audit_log: moves old audit entries into monthly
+#   archive files / queues audit entries for the background writer,
+#   which also runs the rotation
+# - password_verifier: login hashing worker pool (see auth.py), shared
+#   by apps with the same sizing since worker processes are slow to start
+# ---------------------------------------------------------
+_password_verifiers = {}  # (workers, max pending) -> PasswordVerifier
+
+class LedgerServices:
+    def __init__(self, config):
+        self.storage = Storage(**storage_settings(config))
+        self.storage.teacher_cache.ttl = config['TEACHER_CACHE_TTL']
+
+        self.fragment_cache = TTLCache(ttl=config['FRAGMENT_CACHE_TTL'], max_entries=256)
+        self.analytics_cache = new_analytics_cache()
+
+        self.audit_archiver = AuditArchiver(config['AUDIT_ARCHIVE_DIR'], max_age_days=config['AUDIT_MAX_AGE_DAYS'],
+                                            max_rows=config['AUDIT_MAX_ROWS'])
+        self.audit_log = LogWriter(connect=self.storage.connect,
+                                   max_queue=config['AUDIT_LOG_QUEUE_SIZE'],
+                                   batch_size=config['AUDIT_LOG_BATCH_SIZE'],
+                                   flush_interval=config['AUDIT_LOG_FLUSH_INTERVAL'],
+                                   rotate=self.audit_archiver.rotate,
+                                   rotate_interval=config['AUDIT_ROTATE_INTERVAL'])
+
+        sizing = (config['LOGIN_HASH_WORKERS'], config['LOGIN_MAX_PENDING'])
+        if sizing not in _password_verifiers:
+            _password_verifiers[sizing] = PasswordVerifier(max_workers=sizing[0], max_pending=sizing[1])
+        self.password_verifier = _password_verifiers[sizing]
+
+    # Writes what is still queued for the audit log, then releases the
+    # database (an app's services aren't used after this)
+    def close(self):
+        self.audit_log.stop()
+        self.storage.close()
+
+# The current app's services
+def services():
+    return current_app.extensions['ledger']
+
+# ---------------------------------------------------------
+# Metrics
+# The registry is process-wide (one /metrics endpoint per process); the
+# callbacks below report on the app serving the scrape. SQL tracing is
+# process-wide too: create_app() switches it on when the app enables
+# metrics or slow query logging
+# ---------------------------------------------------------
+def _current_services():
+    return services() if has_app_context() and 'ledger' in current_app.extensions else None
+
+def _audit_log_stats():
+    ledger_services = _current_services()
+    return ledger_services.audit_log.stats() if ledger_services is not None else {}
+
+def _replica_stats():
+    return read_replica_stats() if _current_services() is not None else {}
+
+# Audit log writer counters, read when /metrics is scraped
+metrics.registry.callback(
+    'ledger_audit_log_messages_total', 'Audit log entries by outcome (archived: moved to archive files).',
+    lambda: {(name,): value for name, value in _audit_log_stats().items() if name != 'queued'},
+    kind='counter', labelnames=('outcome',))
+metrics.registry.callback(
+    'ledger_audit_log_queued', 'Audit log entries waiting to be written.',
+    lambda: {(): stats['queued']} if (stats := _audit_log_stats()) else {})
+
+# Read replica counters and lag (nothing is exported while it's off)
+metrics.registry.callback(
+    'ledger_replica_reads_total', 'Reads by where they were served from (replica or primary fallback).',
+    lambda: {(source,): value for source, value in _replica_stats().items() if source in ('replica', 'primary')},
+    kind='counter', labelnames=('source',))
+metrics.registry.callback(
+    'ledger_replica_refreshes_total', 'Read replica refreshes by outcome.',
+    lambda: {('ok',): stats['refreshes'], ('failed',): stats['failed']} if (stats := _replica_stats()) else {},
+    kind='counter', labelnames=('outcome',))
+metrics.registry.callback(
+    'ledger_replica_lag_seconds', 'Seconds since the read replica was last confirmed current.',
+    lambda: {(): stats['lag_seconds']} if (stats := _replica_stats()) else {})
+
+
+# Enable global CSRF protection for all forms and POST routes (of every app)
+csrf = CSRFProtect()
+
+# The routes below, registered on each app by create_app()
+ledger = Blueprint('ledger', __name__)
+
+
+# ---------------------------------------------------------
+# Function: create_app
+# Builds a Flask app from config_from_env(), with `config`
+# overriding any of its keys, and its services (see LedgerServices)
+# ---------------------------------------------------------
+def create_app(config=None):
+    settings = config_from_env()
+    settings.update(config or {})
+
+    # Metrics must be configured before the first DB connection is opened
+    if settings['METRICS_ENABLED'] or settings['SLOW_QUERY_MS']:
+        metrics.configure(enabled=settings['METRICS_ENABLED'], slow_query_ms=settings['SLOW_QUERY_MS'])
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    app.config.update(settings)
+    app.extensions['ledger'] = ledger_services = LedgerServices(settings)
+    csrf.init_app(app)
+
+    if settings['JINJA_BYTECODE_CACHE']:
+        if settings['JINJA_BYTECODE_CACHE_DIR']:
+            os.makedirs(settings['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(settings['JINJA_BYTECODE_CACHE_DIR'])
 
-# Secret key is used to secure session data and CSRF tokens
-app.secret_key = os.environ.get('SECRET_KEY')
+    app.register_blueprint(ledger)
 
-# Enable global CSRF protection for all forms and POST routes
-csrf = CSRFProtect(app)
+    # Requests use the app's storage; their DB connections are closed
+    # when the app context ends
+    init_db(app, ledger_services.storage)
+    init_async_db(app, max_read_connections=settings['ASYNC_READ_CONNECTIONS'])
+
+    # Template render timings (see Request instrumentation)
+    before_render_template.connect(_start_render_timer, app)
+    template_rendered.connect(_record_render_time, app)
+    return app
+
+
+# -------------------------------------
+# Request instrumentation
+# - Route latency per (method, endpoint, status), plus the share
+#   spent in SQL, recorded when the response is ready (streamed
+#   bodies are produced after that and are not included)
+# - Template render time via Flask's render signals
+# All hooks return immediately unless metrics are enabled
+# -------------------------------------
+@ledger.before_app_request
+def _start_request_timer():
+    if current_app.config['METRICS_ENABLED']:
+        g.request_started = time.perf_counter()
+
+@ledger.after_app_request
+def _record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_request_seconds.observe(time.perf_counter() - started,
+                                             request.method, endpoint, str(response.status_code))
+        metrics.http_request_sql_seconds.observe(g.get('sql_seconds', 0.0), endpoint)
+    return response
+
+def _start_render_timer(sender, template, context, **extra):
+    if current_app.config['METRICS_ENABLED']:
+        g.setdefault('render_started', []).append(time.perf_counter())
+
+def _record_render_time(sender, template, context, **extra):
+    started = g.get('render_started')
+    if started:
+        metrics.template_render_seconds.observe(time.perf_counter() - started.pop(),
+                                                template.name or 'string')
+
+
+# -------------------------------------
+# Conditional GET helpers
+# - make_etag(): strong ETag from the parts a response depends on,
+#   typically including get_data_version()
+# - not_modified(): empty 304 answer for a matching If-None-Match
+# - Responses are private (per-session) and must be revalidated
+# -------------------------------------
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def _set_revalidation_headers(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def not_modified(etag):
+    return _set_revalidation_headers(Response(status=304), etag)
+
+# Pages embed signed CSRF tokens that expire after WTF_CSRF_TIME_LIMIT,
+# so cached copies are only reused within half of that window
+def _csrf_token_bucket():
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    return int(time.time() // (limit / 2)) if limit else 0
 
 
 # -------------------------------------
 # Route: /login
 # Handles both GET (render login page) and POST (form submission)
 # -------------------------------------
-@app.route('/login', methods=['POST', 'GET'])
-def teacher_login():
+@ledger.route('/login', methods=['POST', 'GET'])
+async def teacher_login():
     form = LoginForm()  # Create form instance
 
     # If form was submitted and passed all validators
@@ -46,13 +379,27 @@ def teacher_login():
         password = form.teacher_password.data
 
         # Query DB to find teacher with given username
-        teacher = get_teacher_by_username(username)
+        teacher = await get_teacher_by_username(username)
+
+        # Verify the password in the worker pool (awaited, so the event loop keeps
+        # running); refuse politely if the pool is saturated
+        started = time.perf_counter()
+        try:
+            valid = teacher is not None and await services().password_verifier.verify_async(teacher['password'],
+                                                                                            password)
+        except VerifierBusy:
+            flash("Too many login attempts right now, please try again.", "error")
+            return render_template('login.html', form=form)
+        finally:
+            if current_app.config['METRICS_ENABLED'] and teacher is not None:
+                metrics.password_verify_seconds.observe(time.perf_counter() - started)
 
         # If teacher exists and password is correct
-        if teacher and check_password_hash(teacher['password'], password):
+        if valid:
             # Store teacher ID in session to track login
             session['teacher_id'] = teacher['id']
-            return redirect(url_for('home'))  # Redirect to home/dashboard
+            session['is_admin'] = teacher['username'] in current_app.config['ADMIN_USERNAMES']
+            return redirect(url_for('ledger.home'))  # Redirect to home/dashboard
         else:
             # Invalid login credentials
             flash("Invalid username or password.", "error")  
@@ -66,54 +413,268 @@ def teacher_login():
 # Logs out the user (POST only) and clears session
 # Protected with CSRF token via LogoutForm
 # -------------------------------------
-@app.route('/logout', methods=['POST'])
-def logout():
+@ledger.route('/logout', methods=['POST'])
+async def logout():
     session.clear()  # Clear all session data
     flash("You have been logged out.", "info")
-    return redirect(url_for('teacher_login'))  # Redirect back to login page
+    return redirect(url_for('ledger.teacher_login'))  # Redirect back to login page
+
+
+# -------------------------------------
+# Record list query options (shared by /home and /api/records)
+# - sort: name | subject | marks, order: asc | desc
+# - scope: mine (default, the logged-in teacher's records) | all
+#   (admins only; others always get their own records)
+# - subject: optional filter; teacher: optional filter in the all scope
+# - q: full-text search; matches are ranked by relevance instead of sorted
+# - per_page: page size (capped at MAX_PAGE_SIZE)
+# Anything unexpected falls back to the defaults. Returns the
+# normalized options, omitting defaults so URLs stay short
+# -------------------------------------
+def _record_view_args():
+    sort = request.args.get('sort', 'name')
+    if sort not in RECORD_SORT_COLUMNS:
+        sort = 'name'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    subject = request.args.get('subject', '').strip()
+    query = request.args.get('q', '').strip()
+    scope = 'all' if request.args.get('scope') == 'all' and session.get('is_admin') else 'mine'
+    teacher = request.args.get('teacher', type=int) if scope == 'all' else None
+    per_page = request.args.get('per_page', current_app.config['RECORDS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+
+    view_args = {'sort': sort, 'order': order}
+    if scope == 'all':
+        view_args['scope'] = scope
+    if query:
+        view_args['q'] = query
+    if subject:
+        view_args['subject'] = subject
+    if teacher is not None:
+        view_args['teacher'] = teacher
+    if per_page != current_app.config['RECORDS_PER_PAGE']:
+        view_args['per_page'] = per_page
+    return view_args
+
+# db.py call (conn= left to the caller) fetching the page selected by
+# view_args and the after/before cursor; request and session are read up
+# front, so the call can also run later, while /home streams
+def _records_page_query(view_args, fields=None):
+    page_size = view_args.get('per_page', current_app.config['RECORDS_PER_PAGE'])
+    if 'q' in view_args:
+        return functools.partial(db.search_student_records, view_args['q'],
+                                 subject=view_args.get('subject'),
+                                 teacher_id=_viewed_teacher_id(view_args),
+                                 after=request.args.get('after'),
+                                 before=request.args.get('before'),
+                                 page_size=page_size,
+                                 fields=fields)
+    if view_args.get('scope') != 'all':
+        return functools.partial(db.get_teacher_records_page, session['teacher_id'],
+                                 sort=view_args['sort'],
+                                 descending=(view_args['order'] == 'desc'),
+                                 subject=view_args.get('subject'),
+                                 after=request.args.get('after'),
+                                 before=request.args.get('before'),
+                                 page_size=page_size,
+                                 fields=fields)
+    return functools.partial(db.get_student_records_page,
+                             sort=view_args['sort'],
+                             descending=(view_args['order'] == 'desc'),
+                             subject=view_args.get('subject'),
+                             teacher_id=view_args.get('teacher'),
+                             after=request.args.get('after'),
+                             before=request.args.get('before'),
+                             page_size=page_size,
+                             fields=fields)
+
+# Fetches the page selected by view_args and the after/before cursor
+async def _fetch_records_page(view_args, fields=None):
+    return await async_db.run(_records_page_query(view_args, fields))
+
+# Awaitable for a value that needs no query (keeps asyncio.gather calls uniform)
+async def _resolved(value):
+    return value
+
+# Teacher whose records a view shows (None = every teacher)
+def _viewed_teacher_id(view_args):
+    if view_args.get('scope') == 'all':
+        return view_args.get('teacher')
+    return session['teacher_id']
 
 
 # -------------------------------------
 # Route: /home
 # Protected page that only logged-in users can access
 # - Renders:
-#     * List of all student records from the database
+#     * One page of student records (keyset-paginated, sorted and filtered in SQL)
 #     * CSRF-protected logout form
 #     * CSRF-protected add-student form
+# - Query parameters:
+#     * sort: name | subject | marks, order: asc | desc
+#     * scope: mine (default) | all (admins only)
+#     * subject, teacher: optional filters
+#     * q: search text (ranked full-text matches, prefix-matched)
+#     * after / before: page cursors produced by the pager links
+#     * per_page: page size (capped at MAX_PAGE_SIZE)
+# - When the records table isn't cached, the page streams: everything
+#   above the table is sent before the records query runs (see _streamed_home)
 # Uses LogoutForm for logout button CSRF safety
 # -------------------------------------
-@app.route('/home')
-def home():
+@ledger.route('/home')
+async def home():
     # If not logged in, redirect to login
     if 'teacher_id' not in session:
-        return redirect(url_for('teacher_login'))
-    
-    # Fetch all student records to display in the table
-    student_records = get_all_student_records()
+        return redirect(url_for('ledger.teacher_login'))
+
+    # Current view options, carried over by the pager and sort links
+    view_args = _record_view_args()
+
+    # Conditional GET: an unchanged page costs one version query and a 304
+    csrf_token = generate_csrf()
+    csrf_key = (session.get('csrf_token'), _csrf_token_bucket())
+    data_version = await get_data_version()
+    etag = make_etag('home', data_version, session['teacher_id'], session.get('is_admin'),
+                     request.full_path, csrf_key)
+    has_flashes = bool(session.get('_flashes'))
+    if not has_flashes and etag in request.if_none_match:
+        return not_modified(etag)
 
     # Create instances of forms for logout and adding a student
     logout_form = LogoutForm()   # CSRF-protected logout form
     student_form = StudentForm() # Add-student form with validation
+    import_form = ImportForm()   # CSV roster upload form
 
-    csrf_token = generate_csrf()
+    # Render the records table, or reuse the copy rendered for this
+    # data version, teacher, view and CSRF token
+    fragment_key = (data_version, _viewed_teacher_id(view_args), tuple(sorted(view_args.items())),
+                    request.args.get('after'), request.args.get('before'), csrf_key)
+    records_table = services().fragment_cache.get(fragment_key)
+    streamed = records_table is None and current_app.config['STREAM_HOME']
+
+    # The page (on a cache miss that isn't streamed), teacher list and
+    # subject list are independent reads, run in parallel on separate connections
+    page, teachers, subjects = await asyncio.gather(
+        _fetch_records_page(view_args) if records_table is None and not streamed else _resolved(None),
+        get_all_teachers() if 'scope' in view_args else _resolved(()),
+        get_teacher_subjects(session['teacher_id']))
+    if page is not None:
+        records_table = Markup(render_template('_records_table.html',
+                                               student_records=page.rows,
+                                               page=page,
+                                               view_args=view_args,
+                                               csrf_token=csrf_token))
+        services().fragment_cache.set(fragment_key, records_table)
 
-    # Render the home page with records and forms
-    return render_template('home.html',
+    # Render the home page with records and forms (when streamed, with a
+    # placeholder where the records table goes)
+    html = render_template('home.html',
                            logout_form=logout_form,
                            student_form=student_form,
-                           student_records=student_records,
+                           import_form=import_form,
+                           records_table=_RECORDS_TABLE_SLOT if streamed else records_table,
+                           view_args=view_args,
+                           is_admin=session.get('is_admin', False),
+                           teachers=teachers,
+                           subjects=subjects,
                            csrf_token=csrf_token)
+    if streamed:
+        chunks = _streamed_home(html, request_ctx.copy(), _records_page_query(view_args), fragment_key,
+                                view_args=view_args, csrf_token=csrf_token)
+        response = Response(chunks, mimetype='text/html')
+    else:
+        response = make_response(html)
+    # Pages showing flash messages are one-offs and never revalidated
+    if not has_flashes:
+        _set_revalidation_headers(response, etag)
+    return response
+
+# ---------------------------------------------------------
+# Streamed /home
+# - The page head (header, flash messages, filters, add form) is sent
+#   as soon as it is rendered; the records query runs after that, through
+#   the synchronous db.py helpers (the generator runs outside the event
+#   loop, like the /export one)
+# - The rest runs in a copy of the request context, with its own
+#   connection, closed when the copy is popped at the end of the stream
+# - The table is rendered with stream_template and sent in chunks of
+#   about TEMPLATE_FLUSH_CHARS, then stored in the fragment cache
+# - An error past the head cuts the page short: the 200 status has
+#   already been sent
+# ---------------------------------------------------------
+TEMPLATE_FLUSH_CHARS = 8 * 1024  # Rendered output buffered per chunk written to the client
+
+# Placeholder rendered where the records table goes, split on by _streamed_home()
+_RECORDS_TABLE_SLOT = Markup('<!-- records-table -->')
+
+def _streamed_home(html, context_copy, page_query, fragment_key, **context):
+    head, tail = html.split(_RECORDS_TABLE_SLOT, 1)
+    yield head
+
+    with context_copy:
+        page = page_query()
+        rendered = []
+        for chunk in _coalesced(stream_template('_records_table.html', student_records=page.rows,
+                                                page=page, **context)):
+            rendered.append(chunk)
+            yield chunk
+        services().fragment_cache.set(fragment_key, Markup(''.join(rendered)))
+    yield tail
 
+# Joins the small pieces Jinja yields into chunks of about `size` characters
+def _coalesced(pieces, size=TEMPLATE_FLUSH_CHARS):
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+# ---------------------------------------------------------
+# Partial updates for the single-record routes
+# - The dashboard script posts the add / edit / delete forms with
+#   fetch() and Accept: application/json; the answer carries just the
+#   affected row, rendered with _record_row.html, plus the messages
+#   the route flashed, so one edit doesn't re-query and re-render
+#   the whole table:
+#     {"messages": [{"category": ..., "message": ...}],
+#      "record": {...}, "row": "<tr ...>"}   (add / edit)
+#     {"messages": [...], "removed": <id>}   (delete)
+# - Failures answer 4xx with the messages only
+# - Plain form posts (no JS) keep the flash + redirect to /home flow
+# ---------------------------------------------------------
+def _wants_json():
+    return request.accept_mimetypes.best == 'application/json'
+
+def _record_response(wants_json, record=None, removed_id=None, status=200):
+    if not wants_json:
+        return redirect(url_for('ledger.home'))
+    payload = {'messages': [{'category': category, 'message': message}
+                            for category, message in get_flashed_messages(with_categories=True)]}
+    if record is not None:
+        payload['record'] = dict(record)
+        payload['row'] = render_template('_record_row.html', record=record, csrf_token=generate_csrf())
+    if removed_id is not None:
+        payload['removed'] = removed_id
+    return jsonify(payload), status
 
 # ---------------------------------------------------------
 # Route: /add_student
 # - Handles POST request from student form submission
 # - Validates input and inserts record into database if valid
 # - Uses flash messages for success or validation errors
+# - JSON callers get the new (or merged) row, see _record_response
 # ---------------------------------------------------------
-@app.route('/add_student', methods=['POST'])
-def add_student_record():
+@ledger.route('/add_student', methods=['POST'])
+async def add_student_record():
     form = StudentForm()
+    wants_json = _wants_json()
+    record = None
 
     # If all form fields are valid, insert the student record
     if form.validate_on_submit():
@@ -121,20 +682,25 @@ def add_student_record():
         subject = form.subject.data.strip()
         marks = form.marks.data
         teacher_id = session.get('teacher_id')
-        
-        existing = find_duplicate_record(student_name, subject)  # Check for an existing record with same name & subject
-
-        if existing:
-            total_marks = int(existing['marks']) + int(marks)  # Add marks of existing and new
-            if total_marks > 100:
-                flash(f"Cannot add with existing record, total marks exceeding 100", "error")
-                return redirect(url_for('home'))
-            update_student_record(existing['id'], student_name, subject, total_marks)  # Update existing record
-            flash(f"Merged with existing record. Total marks: {total_marks}", "success")  # Inform user of merge
+
+        # Insert, or add marks to an existing student/subject record, in one statement
+        result = await upsert_student_record(student_name, subject, marks, teacher_id)
+
+        if result is None:
+            flash(f"Cannot add with existing record, total marks exceeding 100", "error")
+        elif not result['inserted']:
+            services().audit_log.enqueue(audit_entry('merge', teacher_id, result['id'], student_name, subject,
+                                          old_marks=result['marks'] - marks, new_marks=result['marks']))
+            flash(f"Merged with existing record. Total marks: {result['marks']}", "success")  # Inform user of merge
         else:
-            insert_student_record(student_name, subject, marks, teacher_id)  # Insert as new record if no duplicate
+            services().audit_log.enqueue(audit_entry('create', teacher_id, result['id'], student_name, subject,
+                                          new_marks=marks))
             flash("Student record successfully added.", "success")  # Confirmation message
 
+        # The full row for a partial update (the request reads its own write)
+        if result is not None and wants_json:
+            record = await fetch_student_record_by_id(result['id'])
+
     else:
         # If validation fails, flash each error message
         for field, errors in form.errors.items():
@@ -142,7 +708,258 @@ def add_student_record():
                 flash(f"{getattr(form, field).label.text}: {error}", "error")
 
     # Redirect back to the home page regardless of form result
-    return redirect(url_for('home'))
+    return _record_response(wants_json, record=record, status=200 if record is not None else 400)
+
+# ---------------------------------------------------------
+# Route: /import_records
+# - Handles POST of a roster CSV (student_name, subject, marks)
+# - Streams the upload through import_roster(): rows are validated
+#   like the add form and merged/inserted in batched transactions
+# - Returns the full per-row report as JSON when the client asks for
+#   JSON, otherwise flashes a summary plus the first few row errors
+# ---------------------------------------------------------
+IMPORT_ERRORS_FLASHED = 10
+
+@ledger.route('/import_records', methods=['POST'])
+async def import_student_records():
+    # Redirect to login if user is not authenticated
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    form = ImportForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+
+    if not form.validate_on_submit():
+        if wants_json:
+            return jsonify(errors=form.errors), 400
+        for field, errors in form.errors.items():
+            for error in errors:
+                flash(f"{getattr(form, field).label.text}: {error}", "error")
+        return redirect(url_for('ledger.home'))
+
+    # Decode the upload as it is read instead of loading it into memory
+    csv_file = io.TextIOWrapper(form.roster.data.stream, encoding='utf-8-sig', newline='')
+    try:
+        report = await async_db.run(import_roster, csv_file, session['teacher_id'], write=True)
+    except UnicodeDecodeError:
+        if wants_json:
+            return jsonify(errors={'roster': ["File must be UTF-8 encoded"]}), 400
+        flash("Roster CSV: File must be UTF-8 encoded", "error")
+        return redirect(url_for('ledger.home'))
+
+    # One entry per import, not per row: a roster can hold thousands of rows
+    services().audit_log.enqueue(audit_entry('import', session['teacher_id'],
+                                  detail=f"Imported {report.imported_rows} of {report.total_rows} rows"))
+
+    if wants_json:
+        return jsonify(total_rows=report.total_rows,
+                       imported_rows=report.imported_rows,
+                       errors=[{'line': line, 'message': message} for line, message in report.errors])
+
+    flash(f"Imported {report.imported_rows} of {report.total_rows} rows.", "success")
+    for line, message in report.errors[:IMPORT_ERRORS_FLASHED]:
+        flash(f"Line {line}: {message}", "error")
+    if len(report.errors) > IMPORT_ERRORS_FLASHED:
+        flash(f"... and {len(report.errors) - IMPORT_ERRORS_FLASHED} more errors.", "warning")
+    return redirect(url_for('ledger.home'))
+
+# ---------------------------------------------------------
+# Route: /export
+# Streams student records as a download
+# - Query parameters:
+#     * format: csv (default) | jsonl
+#     * scope: mine (default, logged-in teacher's records) | all
+#       (admins only; others always get their own records)
+# - Rows come straight from a fetchmany() cursor through a generator,
+#   so memory stays flat and the header is sent immediately
+# ---------------------------------------------------------
+EXPORT_FLUSH_ROWS = 500  # Rows buffered per chunk written to the client
+
+@ledger.route('/export')
+async def export_student_records():
+    # Redirect to login if user is not authenticated
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'jsonl'):
+        return "Unsupported export format", 400
+    teacher_id = None if request.args.get('scope') == 'all' and session.get('is_admin') else session['teacher_id']
+
+    # Same data version and scope -> same file; let clients revalidate cheaply
+    etag = make_etag('export', await get_data_version(), export_format, teacher_id)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    records = iter_student_records(teacher_id=teacher_id, batch_size=EXPORT_FLUSH_ROWS)
+
+    if export_format == 'csv':
+        mimetype = 'text/csv'
+        chunks = _csv_chunks(records)
+    else:
+        mimetype = 'application/x-ndjson'
+        chunks = _jsonl_chunks(records)
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=student_records.{export_format}'
+    return _set_revalidation_headers(response, etag)
+
+# Yields the CSV header first, then rows in EXPORT_FLUSH_ROWS-sized chunks
+def _csv_chunks(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    count = 0
+    for record in records:
+        if count == 0:
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow(tuple(record))
+        count += 1
+        if count == EXPORT_FLUSH_ROWS:
+            yield buffer.getvalue()
+            count = 0
+    if count:
+        yield buffer.getvalue()
+
+# Yields one JSON object per line, in EXPORT_FLUSH_ROWS-sized chunks
+def _jsonl_chunks(records):
+    lines = []
+    for record in records:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, record))) + '\n')
+        if len(lines) == EXPORT_FLUSH_ROWS:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+# ---------------------------------------------------------
+# JSON API helpers
+# - _api_error(): JSON error body with a status code
+# - _requested_fields(): ?fields=a,b projection (all columns by default),
+#   raises ValueError for unknown names
+# - _negotiated_encoding(): gzip / deflate / None from Accept-Encoding
+# - _api_response(): compact JSON, compressed when large enough
+# ---------------------------------------------------------
+API_COMPRESS_MIN_BYTES = 512  # Smaller bodies aren't worth compressing
+
+def _api_error(message, status):
+    return jsonify(error=message), status
+
+def _requested_fields():
+    raw = request.args.get('fields')
+    if not raw:
+        return EXPORT_COLUMNS
+    return check_record_fields([field.strip() for field in raw.split(',') if field.strip()])
+
+def _negotiated_encoding():
+    return request.accept_encodings.best_match(['gzip', 'deflate'])
+
+def _api_response(payload, etag, encoding):
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = Response(mimetype='application/json')
+    if encoding and len(body) >= API_COMPRESS_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6) if encoding == 'gzip' else zlib.compress(body, 6)
+        response.headers['Content-Encoding'] = encoding
+    response.set_data(body)
+    response.vary.add('Accept-Encoding')
+    return _set_revalidation_headers(response, etag)
+
+# ---------------------------------------------------------
+# Route: /api/records
+# Machine-readable, keyset-paginated list of student records
+# - Accepts the same sort/order/subject/teacher/q/per_page/after/before
+#   parameters as /home, plus fields=id,marks,... (pushed into the SELECT)
+# - With q= it returns ranked search matches (used for type-ahead)
+# - Response: {"records": [...], "next_cursor": ..., "prev_cursor": ...}
+# - Supports ETag/If-None-Match and gzip/deflate
+# ---------------------------------------------------------
+@ledger.route('/api/records')
+async def api_list_records():
+    if 'teacher_id' not in session:
+        return _api_error("Authentication required", 401)
+    try:
+        fields = _requested_fields()
+    except ValueError as error:
+        return _api_error(str(error), 400)
+
+    encoding = _negotiated_encoding()
+    etag = make_etag('api-records', await get_data_version(), session['teacher_id'], session.get('is_admin'),
+                     request.full_path, encoding)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    page = await _fetch_records_page(_record_view_args(), fields=fields)
+    payload = {
+        'records': [dict(zip(fields, row)) for row in page.rows],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+    return _api_response(payload, etag, encoding)
+
+# ---------------------------------------------------------
+# Route: /api/records/<record_id>
+# Single student record, with the same fields= projection
+# - Only the owning teacher (or an admin) can read it; other
+#   teachers get the same 404 as for a missing record
+# ---------------------------------------------------------
+@ledger.route('/api/records/<int:record_id>')
+async def api_get_record(record_id):
+    if 'teacher_id' not in session:
+        return _api_error("Authentication required", 401)
+    try:
+        fields = _requested_fields()
+    except ValueError as error:
+        return _api_error(str(error), 400)
+
+    encoding = _negotiated_encoding()
+    etag = make_etag('api-record', await get_data_version(), session['teacher_id'], session.get('is_admin'),
+                     request.full_path, encoding)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+
+    record = await fetch_student_record_by_id(record_id)
+    if record is None or (record['teacher_id'] != session['teacher_id'] and not session.get('is_admin')):
+        return _api_error("Record not found", 404)
+    return _api_response({field: record[field] for field in fields}, etag, encoding)
+
+# ---------------------------------------------------------
+# Route: /analytics
+# Per-subject and school-wide statistics: mean, median, standard
+# deviation, percentiles, histogram, grade bands and top-ranked students
+# - Computed with NumPy and cached per data version (see analytics.py)
+# - Per-teacher totals come from the trigger-maintained teacher_summary
+# - Conditional GET on the same version token
+# ---------------------------------------------------------
+@ledger.route('/analytics')
+async def analytics_dashboard():
+    # Redirect to login if user is not authenticated
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    logout_form = LogoutForm()  # CSRF-protected logout form in the header
+    generate_csrf()
+    etag = make_etag('analytics', await get_data_version(), (session.get('csrf_token'), _csrf_token_bucket()))
+    has_flashes = bool(session.get('_flashes'))
+    if not has_flashes and etag in request.if_none_match:
+        return not_modified(etag)
+
+    (_, results), teachers, teacher_summaries = await asyncio.gather(
+        async_db.run(get_class_analytics, cache=services().analytics_cache), get_all_teachers(), get_teacher_summaries())
+    teacher_names = {teacher['id']: teacher['username'] for teacher in teachers}
+    response = make_response(render_template('analytics.html',
+                                             logout_form=logout_form,
+                                             results=results,
+                                             teacher_summaries=teacher_summaries,
+                                             teacher_names=teacher_names,
+                                             percentiles=PERCENTILES,
+                                             histogram_edges=list(HISTOGRAM_EDGES),
+                                             grade_bands=[label for label, _ in GRADE_BANDS]))
+    if not has_flashes:
+        _set_revalidation_headers(response, etag)
+    return response
 
 # ---------------------------------------------------------
 # Route: delete_student
@@ -150,21 +967,27 @@ def add_student_record():
 # Requires user to be logged in (session must contain teacher_id)
 # Calls helper function to perform deletion from DB
 # Shows success message and redirects to home page
+# (JSON callers get the removed id, see _record_response)
 # ---------------------------------------------------------
-@app.route('/remove_record/<int:record_id>', methods=['POST'])
-def remove_student_record(record_id):
+@ledger.route('/remove_record/<int:record_id>', methods=['POST'])
+async def remove_student_record(record_id):
     # Redirect to login if user is not authenticated
     if 'teacher_id' not in session:
-        return redirect(url_for('teacher_login'))
+        return redirect(url_for('ledger.teacher_login'))
     
-    # Delete the student record from the database
-    delete_student_record(record_id)
+    # Delete the student record, keeping what it held for the audit log
+    async with unit_of_work():
+        record = await fetch_student_record_by_id(record_id)
+        await delete_student_record(record_id)
+    if record is not None:
+        services().audit_log.enqueue(audit_entry('delete', session['teacher_id'], record_id, record['student_name'],
+                                      record['subject'], old_marks=record['marks']))
     
     # Show a confirmation message
     flash("Student record deleted.", "info")
     
     # Redirect to home page
-    return redirect(url_for('home'))
+    return _record_response(_wants_json(), removed_id=record_id)
 
 # ---------------------------------------------------------
 # Route: /edit_record/<record_id>
@@ -174,56 +997,292 @@ def remove_student_record(record_id):
 #   - Validates that all input fields are non-empty.
 #   - Ensures marks is a numeric value.
 #   - Updates the record in the database if validation passes.
-#   - Redirects back to the home page.
+#   - Redirects back to the home page (JSON callers get the updated
+#     row instead, see _record_response)
 # ---------------------------------------------------------
-@app.route('/edit_record/<int:record_id>', methods=['POST'])
-def edit_student_record(record_id):
-    # Get values from submitted form and remove surrounding whitespace
-
-    record = fetch_student_record_by_id(record_id)
+@ledger.route('/edit_record/<int:record_id>', methods=['POST'])
+async def edit_student_record(record_id):
+    wants_json = _wants_json()
 
+    # Get values from submitted form and remove surrounding whitespace
     name = request.form['name'].strip()
     subject = request.form['subject'].strip()
     marks = request.form['marks'].strip()  # ✅ FIX: call .strip()
-    
-
 
     # Basic validation: all fields must be filled, marks must be a digit
     if not name or not subject or not marks.isdigit():
         flash("Invalid input", "error")  # Flash error message to UI
-        return redirect(url_for('home'))  # Redirect back to home page
-    
-    existing = find_duplicate_record(name, subject)  # Check if a record with the same name and subject already exists
+        return _record_response(wants_json, status=400)  # Redirect back to home page
+
+    # Lookups, update and audit log run in one transaction with one commit
+    async with unit_of_work():
+        record = await fetch_student_record_by_id(record_id)
+        if record is None:
+            flash("Student record not found.", "error")
+            return _record_response(wants_json, status=404)
+
+        existing = await find_duplicate_record(name, subject)  # Check if a record with the same name and subject already exists
 
-    # If the duplicate exists but it's not the same record being edited
-    if existing and existing['id'] != record_id:
-        flash("Duplicate record with same name and subject already exists", "error")  # Show error
-        return redirect(url_for('home'))  # Redirect without updating
+        # If the duplicate exists but it's not the same record being edited
+        if existing and existing['id'] != record_id:
+            flash("Duplicate record with same name and subject already exists", "error")  # Show error
+            return _record_response(wants_json, status=400)  # Redirect without updating
 
-    # Convert marks to integer after validation
-    marks = int(marks)
+        # Convert marks to integer after validation
+        marks = int(marks)
 
-    # Call DB helper to update the student record
-    if record['teacher_id'] == session.get('teacher_id'):
-        update_student_record(record_id, name, subject, marks)
-        msg = f'{record['teacher_id']} updated {name}'
-        print(msg)
-        print(log_update_message_for_records(msg))
-    else :
-        flash("Teacher dont have access to edit this entry.", "error")
+        # Call DB helper to update the student record
+        if record['teacher_id'] == session.get('teacher_id'):
+            await update_student_record(record_id, name, subject, marks)
+            services().audit_log.enqueue(audit_entry('update', record['teacher_id'], record_id, name, subject,
+                                          old_marks=record['marks'], new_marks=marks))
+        else :
+            flash("Teacher dont have access to edit this entry.", "error")
+            return _record_response(wants_json, status=403)
 
     # Flash success message (optional)
     flash("Student record updated successfully.", "success")
 
     # Redirect back to the home/dashboard page
-    return redirect(url_for('home'))
+    return _record_response(wants_json, record=dict(record, student_name=name, subject=subject, marks=marks))
+
+# ---------------------------------------------------------
+# Bulk actions (multi-select on the dashboard)
+# - Accept either a form post (record_id=1&record_id=2..., plus
+#   name-<id>/subject-<id>/marks-<id> fields for edits) or JSON:
+#     /bulk_delete: {"ids": [1, 2, ...]}
+#     /bulk_edit:   {"records": [[id, name, subject, marks], ...]}
+# - All-or-nothing: existence, ownership and duplicate checks run as
+#   set-based queries first; if anything fails nothing is written
+# - Writes, and their audit log entries, are executemany batches in
+#   one transaction
+# - JSON requests get a JSON answer; form posts flash and redirect
+# ---------------------------------------------------------
+BULK_MAX_RECORDS = 1000  # Records accepted per bulk request
+BULK_ERRORS_FLASHED = 10  # Errors shown as flash messages, the rest are summarized
+
+def _bulk_payload():
+    if request.is_json:
+        return request.get_json(silent=True) or {}, True
+    return None, request.accept_mimetypes.best == 'application/json'
+
+# The list under `key` of a JSON payload; any other shape is a ValueError (400)
+def _bulk_payload_list(payload, key):
+    if not isinstance(payload, dict):
+        raise ValueError("The request body must be a JSON object.")
+    values = payload.get(key, [])
+    if not isinstance(values, list):
+        raise ValueError(f"'{key}' must be a list.")
+    return values
+
+def _parse_record_ids(values):
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid record id: {value!r}")
+    if not ids:
+        raise ValueError("No records selected.")
+    if len(ids) > BULK_MAX_RECORDS:
+        raise ValueError(f"At most {BULK_MAX_RECORDS} records can be changed at once.")
+    if len(set(ids)) != len(ids):
+        raise ValueError("Each record can only be selected once.")
+    return ids
+
+# Existence and ownership errors for the selected ids (records fetched in one go)
+def _check_bulk_ownership(ids, records):
+    errors = []
+    for record_id in ids:
+        record = records.get(record_id)
+        if record is None:
+            errors.append(f"Record {record_id}: not found.")
+        elif record['teacher_id'] != session['teacher_id']:
+            errors.append(f"Record {record_id}: Teacher dont have access to edit this entry.")
+    return errors
+
+def _bulk_response(wants_json, errors, message, count):
+    if wants_json:
+        if errors:
+            return jsonify(errors=errors), 400
+        return jsonify(count=count)
+    if errors:
+        for error in errors[:BULK_ERRORS_FLASHED]:
+            flash(error, "error")
+        if len(errors) > BULK_ERRORS_FLASHED:
+            flash(f"... and {len(errors) - BULK_ERRORS_FLASHED} more errors.", "warning")
+    else:
+        flash(message, "success")
+    return redirect(url_for('ledger.home'))
+
+@ledger.route('/bulk_delete', methods=['POST'])
+async def bulk_delete_student_records():
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    payload, wants_json = _bulk_payload()
+    try:
+        ids = _parse_record_ids(_bulk_payload_list(payload, 'ids') if payload is not None
+                                else request.form.getlist('record_id'))
+    except ValueError as error:
+        return _bulk_response(wants_json, [str(error)], None, 0)
+
+    async with unit_of_work():
+        records = await fetch_student_records_by_ids(ids)
+        errors = _check_bulk_ownership(ids, records)
+        if errors:
+            return _bulk_response(wants_json, errors, None, 0)
+
+        await delete_student_records_many(ids)
+        await insert_audit_entries([audit_entry('delete', session['teacher_id'], record_id,
+                                                records[record_id]['student_name'], records[record_id]['subject'],
+                                                old_marks=records[record_id]['marks'])
+                                    for record_id in ids])
+
+    return _bulk_response(wants_json, [], f"Deleted {len(ids)} student records.", len(ids))
 
-@app.route('/')
-def index():
-    return redirect(url_for('home'))
+@ledger.route('/bulk_edit', methods=['POST'])
+async def bulk_edit_student_records():
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    # Collect (id, name, subject, marks) tuples from JSON or the form
+    payload, wants_json = _bulk_payload()
+    try:
+        if payload is not None:
+            records = _bulk_payload_list(payload, 'records')
+            submitted = [tuple(row) for row in records if isinstance(row, list) and len(row) == 4]
+            if len(submitted) != len(records):
+                raise ValueError("Each record must be [id, name, subject, marks].")
+        else:
+            submitted = [(record_id, request.form.get(f'name-{record_id}'),
+                          request.form.get(f'subject-{record_id}'), request.form.get(f'marks-{record_id}'))
+                         for record_id in request.form.getlist('record_id')]
+        ids = _parse_record_ids([row[0] for row in submitted])
+    except ValueError as error:
+        return _bulk_response(wants_json, [str(error)], None, 0)
+
+    # Same field rules as the add form (JSON names and subjects must be strings;
+    # missing form fields are None, which the validator reports as required)
+    errors = []
+    rows = []
+    for record_id, (_, name, subject, marks) in zip(ids, submitted):
+        if not all(isinstance(value, (str, type(None))) for value in (name, subject)):
+            errors.append(f"Record {record_id}: Name and subject must be text.")
+            continue
+        cleaned, row_errors = validate_student_row(name, subject, None if marks is None else str(marks))
+        errors.extend(f"Record {record_id}: {error}" for error in row_errors)
+        if cleaned is not None:
+            rows.append((record_id,) + cleaned)
+    if errors:
+        return _bulk_response(wants_json, errors, None, 0)
+
+    async with unit_of_work():
+        records = await fetch_student_records_by_ids(ids)
+        errors = _check_bulk_ownership(ids, records)
+
+        # Duplicates against other records (one set-based query) and within the batch
+        for record_id, _ in await find_duplicate_records_many([(r[0], r[1], r[2]) for r in rows]):
+            errors.append(f"Record {record_id}: Duplicate record with same name and subject already exists")
+        seen = {}
+        for record_id, name, subject, _ in rows:
+            key = record_key(name, subject)
+            if key in seen:
+                errors.append(f"Record {record_id}: same name and subject as record {seen[key]}")
+            seen.setdefault(key, record_id)
+        if errors:
+            return _bulk_response(wants_json, errors, None, 0)
+
+        await update_student_records_many(rows)
+        await insert_audit_entries([audit_entry('update', session['teacher_id'], record_id, name, subject,
+                                                old_marks=records[record_id]['marks'], new_marks=marks)
+                                    for record_id, name, subject, marks in rows])
+
+    return _bulk_response(wants_json, [], f"Updated {len(rows)} student records.", len(rows))
+
+# ---------------------------------------------------------
+# Route: /records/<record_id>/history
+# Audit history of one record, newest first (keyset-paginated on the
+# (record_id, ts) index)
+# - Visible to the record's teacher and to admins; a deleted record's
+#   history stays visible, its owner taken from the entries
+# - archive=YYYY-MM browses that month's archive file instead; the
+#   months holding entries for the record are linked under the table
+# ---------------------------------------------------------
+AUDIT_HISTORY_PER_PAGE = 25
+
+# Audit timestamps (epoch seconds) as UTC date and time
+@ledger.app_template_filter('datetime')
+def format_timestamp(ts):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))
+
+@ledger.route('/records/<int:record_id>/history')
+async def record_history(record_id):
+    if 'teacher_id' not in session:
+        return redirect(url_for('ledger.teacher_login'))
+
+    month = request.args.get('archive')
+    after, before = request.args.get('after'), request.args.get('before')
+    if month:
+        try:
+            page = await asyncio.to_thread(services().audit_archiver.history, month, record_id, after=after,
+                                           before=before, page_size=AUDIT_HISTORY_PER_PAGE)
+        except LookupError:
+            abort(404)
+    else:
+        page = await get_audit_history(record_id, after=after, before=before,
+                                       page_size=AUDIT_HISTORY_PER_PAGE)
+    record, archive_months = await asyncio.gather(
+        fetch_student_record_by_id(record_id),
+        asyncio.to_thread(services().audit_archiver.archives_for_record, record_id))
+
+    if record is not None:
+        owner = record['teacher_id']
+    elif page.rows:
+        owner = page.rows[0]['teacher_id']
+    elif archive_months:
+        owner = None  # Only admins see history that exists in archives alone
+    else:
+        abort(404)
+    if owner != session['teacher_id'] and not session.get('is_admin'):
+        abort(403)
+
+    return render_template('record_history.html',
+                           logout_form=LogoutForm(),
+                           record_id=record_id,
+                           record=record,
+                           page=page,
+                           archive=month,
+                           archive_months=archive_months)
+
+@ledger.route('/')
+async def index():
+    return redirect(url_for('ledger.home'))
+
+# ---------------------------------------------------------
+# Route: /metrics
+# Method: GET
+# Description:
+#   Prometheus text exposition of request, SQL, template, login
+#   and audit-log metrics. Not found unless METRICS_ENABLED is set.
+# ---------------------------------------------------------
+@ledger.route('/metrics')
+async def metrics_endpoint():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
    
 # -------------------------------------
 # Run the Flask development server
 # -------------------------------------
 if __name__ == "__main__":
+    app = create_app()
+
+    # Bring the schema up to date (a single pragma read when current) and
+    # build any missing read indexes without delaying startup
+    # (PostgreSQL schemas are created with python models.py)
+    if app.config['STORAGE_BACKEND'] == 'sqlite':
+        models.migrate(app.config['DATABASE_PATH'], defer_indexes=True)
+        models.create_indexes_in_background(app.config['DATABASE_PATH'])
+        app.extensions['ledger'].storage.read_replica()  # Take the first copy now, not on the first request (no-op when off)
     app.run(debug=True)  # Set debug=True for development (not production)
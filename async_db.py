@@ -0,0 +1,232 @@
+import asyncio      # Awaiting executor futures
+import contextvars  # Request context (flask.g, metrics) inside executor threads
+import functools    # Wrapping the db.py helpers
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from flask import g, current_app  # Request-scoped connections, the app's settings
+
+import db  # The synchronous helpers (still the API for the CLI, scripts and tests)
+
+
+# ---------------------------------------------
+# Async settings
+# - max_read_connections: connections one request may read through
+#   at the same time (reads awaited together with asyncio.gather run
+#   in parallel up to this many; more queue behind the least busy)
+# configure() sets the default; init_app() can give an app its own
+# ---------------------------------------------
+class _Settings:
+    max_read_connections = 4
+
+settings = _Settings()
+
+def _checked_max_read_connections(max_read_connections):
+    if int(max_read_connections) < 1:
+        raise ValueError("max_read_connections must be at least 1")
+    return int(max_read_connections)
+
+def configure(max_read_connections=4):
+    settings.max_read_connections = _checked_max_read_connections(max_read_connections)
+
+
+# ---------------------------------------------------------
+# Class: AsyncConnection
+# One database connection with its own single-thread executor
+# - The connection is opened, used and closed on that thread only
+#   (sqlite3 connections belong to the thread that created them)
+# - Calls queue on the executor, so a connection never runs two
+#   statements at once and each connection costs exactly one thread
+# - run(helper, ...) awaits helper(..., conn=<connection>)
+# ---------------------------------------------------------
+class AsyncConnection:
+    def __init__(self, connect):
+        self._connect = connect
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ledger-db')
+        self.conn = None
+        self.pending = 0  # Calls queued or running
+
+    async def run(self, helper, *args, **kwargs):
+        context = contextvars.copy_context()  # Lets SQL timings reach this request's flask.g
+        self.pending += 1
+        try:
+            return await asyncio.wrap_future(
+                self._executor.submit(context.run, self._call, helper, args, kwargs))
+        finally:
+            self.pending -= 1
+
+    def _call(self, helper, args, kwargs):
+        if self.conn is None:
+            self.conn = self._connect()
+        return helper(*args, conn=self.conn, **kwargs)
+
+    # Blocks until queued calls are done, then closes on the owning thread
+    def close(self):
+        if self.conn is not None or self.pending:
+            self._executor.submit(self._close).result()
+        self._executor.shutdown(wait=False)
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# Read connections use the read replica when it is enabled and fresh
+def _open_read_connection():
+    replica = db.get_read_replica()
+    conn = replica.connect() if replica is not None else None
+    return conn if conn is not None else db.get_db_connection()
+
+
+# ---------------------------------------------------------
+# Per-request connections (on flask.g, closed at teardown)
+# - primary: writes, unit_of_work() and every read once the request
+#   has written (so the request reads its own writes)
+# - readers: up to max_read_connections, opened as concurrent reads
+#   need them
+# ---------------------------------------------------------
+class _RequestConnections:
+    def __init__(self):
+        self.primary = AsyncConnection(db.get_db_connection)
+        self.max_readers = current_app.extensions.get('ledger_max_read_connections',
+                                                      settings.max_read_connections)
+        self.readers = []
+        self.uow_depth = 0
+        self.wrote = False
+
+    def for_read(self):
+        if self.uow_depth or self.wrote:
+            return self.primary
+        for reader in self.readers:
+            if not reader.pending:
+                return reader
+        if len(self.readers) < self.max_readers:
+            self.readers.append(AsyncConnection(_open_read_connection))
+            return self.readers[-1]
+        return min(self.readers, key=lambda reader: reader.pending)
+
+    def close(self):
+        for conn in [self.primary] + self.readers:
+            conn.close()
+
+def _request_connections():
+    if 'async_db' not in g:
+        g.async_db = _RequestConnections()
+    return g.async_db
+
+# ---------------------------------------------
+# Function: close_request_connections
+# Teardown hook: closes the request's async connections
+# ---------------------------------------------
+def close_request_connections(exception=None):
+    connections = g.pop('async_db', None)
+    if connections is not None:
+        connections.close()
+
+# Registers the teardown; max_read_connections overrides the default for this app
+def init_app(app, max_read_connections=None):
+    app.teardown_appcontext(close_request_connections)
+    if max_read_connections is not None:
+        app.extensions['ledger_max_read_connections'] = _checked_max_read_connections(max_read_connections)
+
+# ---------------------------------------------
+# Function: run
+# Awaits any conn= taking function (a db.py helper, import_roster,
+# get_class_analytics, ...) on one of the request's connections
+# write=True: on the primary connection
+# ---------------------------------------------
+async def run(helper, *args, write=False, **kwargs):
+    connections = _request_connections()
+    if write:
+        connections.wrote = True
+        return await connections.primary.run(helper, *args, **kwargs)
+    return await connections.for_read().run(helper, *args, **kwargs)
+
+# ---------------------------------------------------------
+# Context manager: unit_of_work
+# async counterpart of db.unit_of_work(): helpers awaited inside the
+# block run on the primary connection in one transaction, committed
+# when the block exits cleanly and rolled back if it raises
+# Yields the primary AsyncConnection
+# Usage:
+#     async with async_db.unit_of_work():
+#         record = await async_db.fetch_student_record_by_id(record_id)
+#         await async_db.update_student_record(record_id, name, subject, marks)
+# ---------------------------------------------------------
+@asynccontextmanager
+async def unit_of_work():
+    connections = _request_connections()
+    primary = connections.primary
+    block = None
+
+    def enter(conn):
+        nonlocal block
+        block = db.unit_of_work(conn)
+        return block.__enter__()
+
+    def leave(exc_type, exc, traceback, conn):
+        return block.__exit__(exc_type, exc, traceback)
+
+    await primary.run(enter)
+    connections.uow_depth += 1
+    connections.wrote = True
+    try:
+        yield primary
+    except BaseException as error:
+        connections.uow_depth -= 1
+        if not await primary.run(leave, type(error), error, error.__traceback__):
+            raise
+    else:
+        connections.uow_depth -= 1
+        await primary.run(leave, None, None, None)
+
+
+# ---------------------------------------------------------
+# Async versions of the db.py helpers
+# Same arguments and results, without conn=: awaiting one runs the
+# synchronous helper on a request connection's thread
+# ---------------------------------------------------------
+def _reader(helper):
+    @functools.wraps(helper)
+    async def call(*args, **kwargs):
+        return await run(helper, *args, **kwargs)
+    return call
+
+# Reads of tables the read replica doesn't track (see db.get_audit_history):
+# on the primary connection, which never comes from the replica
+def _primary_reader(helper):
+    @functools.wraps(helper)
+    async def call(*args, **kwargs):
+        return await _request_connections().primary.run(helper, *args, **kwargs)
+    return call
+
+def _writer(helper):
+    @functools.wraps(helper)
+    async def call(*args, **kwargs):
+        return await run(helper, *args, write=True, **kwargs)
+    return call
+
+get_teacher_by_username = _reader(db.get_teacher_by_username)
+get_all_teachers = _reader(db.get_all_teachers)
+get_data_version = _reader(db.get_data_version)
+get_all_student_records = _reader(db.get_all_student_records)
+fetch_student_record_by_id = _reader(db.fetch_student_record_by_id)
+fetch_student_records_by_ids = _reader(db.fetch_student_records_by_ids)
+find_duplicate_record = _reader(db.find_duplicate_record)
+find_duplicate_records_many = _reader(db.find_duplicate_records_many)
+get_student_records_page = _reader(db.get_student_records_page)
+get_teacher_records_page = _reader(db.get_teacher_records_page)
+get_teacher_subjects = _reader(db.get_teacher_subjects)
+search_student_records = _reader(db.search_student_records)
+get_subject_summaries = _reader(db.get_subject_summaries)
+get_teacher_summaries = _reader(db.get_teacher_summaries)
+get_audit_history = _primary_reader(db.get_audit_history)
+
+insert_student_record = _writer(db.insert_student_record)
+upsert_student_record = _writer(db.upsert_student_record)
+update_student_record = _writer(db.update_student_record)
+delete_student_record = _writer(db.delete_student_record)
+update_student_records_many = _writer(db.update_student_records_many)
+delete_student_records_many = _writer(db.delete_student_records_many)
+insert_audit_entries = _writer(db.insert_audit_entries)
@@ -0,0 +1,165 @@
+import argparse  # Command-line arguments for the CLI entry point
+import os        # Archive directory and environment defaults
+import re        # Validating archive names taken from URLs
+import sqlite3   # Archive files are always SQLite
+import time      # Age cutoff and month of each entry
+
+import db
+import models
+
+# Defaults for the rotation policy (app.py and the CLI read the
+# AUDIT_ARCHIVE_DIR / AUDIT_MAX_AGE_DAYS / AUDIT_MAX_ROWS overrides)
+DEFAULT_ARCHIVE_DIR = 'audit-archive'
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_MAX_ROWS = 100000
+
+# Archive files are named audit-YYYY-MM.db after the (UTC) month of their entries
+_ARCHIVE_NAME = re.compile(r'^audit-(\d{4}-\d{2})\.db$')
+_MONTH = re.compile(r'^\d{4}-\d{2}$')
+
+
+# ---------------------------------------------------------
+# Class: AuditArchiver
+# Moves old audit_log entries out of the main database into one
+# SQLite file per month, so the hot database (and its page cache)
+# only holds recent history
+# - rotate() archives the oldest entries while they are older than
+#   max_age_days, or while the table holds more than max_rows
+#   (0 / None switches a limit off)
+# - Rows are copied to the archive and committed there first, then
+#   deleted from the main database, batch_size rows at a time: a crash
+#   in between leaves a row in both places (the copy is INSERT OR
+#   IGNORE by id, so the next rotation skips it), never in neither
+# - Works for either storage backend: only the archives are SQLite
+# - Archived history stays browsable: archives() lists the months and
+#   connect() opens one read-only for db.get_audit_history(conn=...)
+# ---------------------------------------------------------
+class AuditArchiver:
+    def __init__(self, archive_dir=DEFAULT_ARCHIVE_DIR, max_age_days=DEFAULT_MAX_AGE_DAYS,
+                 max_rows=DEFAULT_MAX_ROWS, batch_size=5000):
+        self.archive_dir = archive_dir
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.batch_size = batch_size
+
+    def archive_path(self, month):
+        return os.path.join(self.archive_dir, f'audit-{month}.db')
+
+    # Months with an archive file, newest first
+    def archives(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        months = [match.group(1) for match in map(_ARCHIVE_NAME.match, os.listdir(self.archive_dir)) if match]
+        return sorted(months, reverse=True)
+
+    # Read-only connection to one month's archive (month comes from
+    # user input, so it is checked before it touches the filesystem)
+    # Raises LookupError for an unknown month
+    def connect(self, month):
+        if not _MONTH.match(month or '') or not os.path.exists(self.archive_path(month)):
+            raise LookupError(f"No audit archive for {month!r}")
+        conn = sqlite3.connect(f'file:{self.archive_path(month)}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # One page of a record's history from a month's archive
+    # (see db.get_audit_history); raises LookupError like connect()
+    def history(self, month, record_id, after=None, before=None, page_size=db.DEFAULT_PAGE_SIZE):
+        conn = self.connect(month)
+        try:
+            return db.get_audit_history(record_id, after=after, before=before, page_size=page_size, conn=conn)
+        finally:
+            conn.close()
+
+    # Months whose archive holds entries for a record, newest first
+    def archives_for_record(self, record_id):
+        months = []
+        for month in self.archives():
+            conn = self.connect(month)
+            try:
+                if conn.execute("SELECT 1 FROM audit_log WHERE record_id = ? LIMIT 1", (record_id,)).fetchone():
+                    months.append(month)
+            finally:
+                conn.close()
+        return months
+
+    # ---------------------------------------------
+    # Function: rotate
+    # Archives what the policy says is due; returns the number of
+    # entries moved. conn: main database connection (default: a new one)
+    # ---------------------------------------------
+    def rotate(self, conn=None, now=None):
+        owns_conn = conn is None
+        if owns_conn:
+            conn = db.get_db_connection()
+        try:
+            now = time.time() if now is None else now
+            cutoff = now - self.max_age_days * 86400 if self.max_age_days else None
+            excess = max(0, db.count_audit_entries(conn=conn) - self.max_rows) if self.max_rows else 0
+
+            moved = 0
+            while True:
+                rows = db.get_oldest_audit_entries(self.batch_size, conn=conn)
+                due = []
+                for row in rows:
+                    if moved + len(due) < excess or (cutoff is not None and row['ts'] < cutoff):
+                        due.append(row)
+                    else:
+                        break
+                if not due:
+                    return moved
+                self._archive(due)
+                db.delete_audit_entries_through(due[-1]['id'], conn=conn)
+                moved += len(due)
+                if len(due) < len(rows):
+                    return moved  # Reached an entry that stays
+        finally:
+            if owns_conn:
+                conn.close()
+
+    # Copies rows into their monthly archive files, one transaction per file
+    def _archive(self, rows):
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(time.strftime('%Y-%m', time.gmtime(row['ts'])), []).append(row)
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        columns = ('id',) + db.AUDIT_COLUMNS
+        for month, month_rows in by_month.items():
+            archive = sqlite3.connect(self.archive_path(month), timeout=30)
+            try:
+                models.create_audit_log_table(archive.cursor())
+                archive.executemany(f"""
+                    INSERT OR IGNORE INTO audit_log ({', '.join(columns)})
+                    VALUES ({', '.join('?' * len(columns))})
+                """, [tuple(row[column] for column in columns) for row in month_rows])
+                archive.commit()
+            finally:
+                archive.close()
+
+
+# ---------------------------------------------
+# Rotate from the command line (e.g. from cron), using the same
+# environment settings as the app:
+#   python audit_archive.py rotate [--max-age-days N] [--max-rows N]
+#   python audit_archive.py list
+# ---------------------------------------------
+if __name__ == '__main__':
+    from app import config_from_env, storage_settings  # The app's settings (imported late: app imports this module)
+    config = config_from_env()
+
+    parser = argparse.ArgumentParser(description="Move old audit log entries into monthly archive files.")
+    parser.add_argument('command', choices=('rotate', 'list'))
+    parser.add_argument('--archive-dir', default=config['AUDIT_ARCHIVE_DIR'])
+    parser.add_argument('--max-age-days', type=float, default=config['AUDIT_MAX_AGE_DAYS'])
+    parser.add_argument('--max-rows', type=int, default=config['AUDIT_MAX_ROWS'])
+    args = parser.parse_args()
+
+    # Same database and connection settings (DATABASE_PATH, journal mode, busy timeout, ...) as the app
+    db.configure(**storage_settings(config))
+    archiver = AuditArchiver(args.archive_dir, max_age_days=args.max_age_days, max_rows=args.max_rows)
+    if args.command == 'rotate':
+        print(f"Archived {archiver.rotate()} audit log entries to {args.archive_dir}")
+    else:
+        for month in archiver.archives():
+            print(archiver.archive_path(month))
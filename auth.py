@@ -0,0 +1,86 @@
+import asyncio          # Awaiting verifications from async views
+import multiprocessing  # Process start method for the hashing pool
+import os               # CPU count for the default pool size
+import threading        # Bounds the number of verifications in flight
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+# For password hashing and verification
+from werkzeug.security import check_password_hash
+
+
+# ---------------------------------------------
+# Exception: VerifierBusy
+# Raised when a password check could not start or finish in time
+# because every verification slot is taken
+# ---------------------------------------------
+class VerifierBusy(Exception):
+    pass
+
+
+# ---------------------------------------------------------
+# Class: PasswordVerifier
+# Runs check_password_hash (deliberately CPU-expensive) in a bounded
+# process pool so logins use every core and don't hold the GIL
+# - max_workers: pool size (0 = verify inline in the calling thread)
+# - max_pending: verifications allowed in flight at once, queued ones
+#   included; further callers wait up to `timeout` seconds for a slot
+# - timeout: seconds to wait for a slot and again for the result
+# verify() blocks the calling thread; async views await verify_async(),
+# which waits for the slot and the result without blocking the event loop
+# The pool is created on first use and uses the "spawn" start method,
+# which is safe in a multi-threaded server process
+# ---------------------------------------------------------
+class PasswordVerifier:
+    def __init__(self, max_workers=None, max_pending=None, timeout=10.0):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_pending = max_pending or max(self.max_workers, 1) * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # True if `password` matches `password_hash`; may raise VerifierBusy
+    def verify(self, password_hash, password):
+        if self.max_workers == 0:
+            return check_password_hash(password_hash, password)
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise VerifierBusy()
+        try:
+            future = self._get_pool().submit(check_password_hash, password_hash, password)
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise VerifierBusy()
+        finally:
+            self._slots.release()
+
+    # verify() for coroutines; may raise VerifierBusy
+    async def verify_async(self, password_hash, password):
+        if self.max_workers == 0:
+            return await asyncio.to_thread(check_password_hash, password_hash, password)
+
+        # A free slot is taken right away; otherwise wait for one off the loop
+        if not (self._slots.acquire(blocking=False)
+                or await asyncio.to_thread(self._slots.acquire, timeout=self.timeout)):
+            raise VerifierBusy()
+        try:
+            future = self._get_pool().submit(check_password_hash, password_hash, password)
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise VerifierBusy()
+        finally:
+            self._slots.release()
+
+    # Stops the worker processes (a later verify() starts a new pool)
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
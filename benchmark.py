@@ -0,0 +1,638 @@
+import argparse   # Command-line interface (run / compare)
+import json       # Results are written and compared as JSON
+import math       # Nearest-rank percentiles
+import os         # Scratch directory handling and env defaults
+import platform   # Environment details recorded with each run
+import random     # Synthetic roster generation
+import re         # CSRF token extraction from rendered forms
+import shutil     # Scratch directory cleanup
+import sqlite3    # Direct seeding and version info
+import subprocess # One child process per /home streaming mode (separate peak RSS)
+import sys        # Exit codes
+import tempfile   # Scratch database directory
+import threading  # Concurrent request workers
+import time       # perf_counter timings
+import tracemalloc  # Peak Python allocations of one request
+from contextlib import contextmanager
+
+# Record counts benchmarked by default
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Relative change treated as a regression by compare mode
+DEFAULT_THRESHOLD = 0.20
+
+# Latency metrics compared against the baseline (higher = worse)
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+# ---------------------------------------------------------
+# Synthetic roster generation
+# - Every student gets `subjects_per_student` distinct subjects,
+#   drawn from `subjects` subjects with a Zipf-like skew
+#   (subject_skew=0 is uniform, larger values favour the first ones)
+# - Marks follow a normal distribution clipped to 1..100
+# - Names are letters only, so they pass the StudentForm rules
+# ---------------------------------------------------------
+def letters_for(index, width=5):
+    chars = []
+    for _ in range(width):
+        index, remainder = divmod(index, 26)
+        chars.append(chr(ord('a') + remainder))
+    return ''.join(reversed(chars)).capitalize()
+
+def generate_records(rows, subjects=20, subjects_per_student=5, subject_skew=1.0,
+                     marks_mean=65.0, marks_sd=15.0, teacher_ids=(1, 2), seed=42):
+    rng = random.Random(seed)
+    subject_names = [f"Subject {letters_for(i, 3)}" for i in range(subjects)]
+    weights = [1.0 / (rank + 1) ** subject_skew for rank in range(subjects)]
+    per_student = min(subjects_per_student, subjects)
+
+    produced = 0
+    student = 0
+    while produced < rows:
+        name = f"{letters_for(student)} {letters_for(student * 7919 + 13)}"
+        student += 1
+        chosen = set()
+        while len(chosen) < per_student:
+            chosen.add(rng.choices(range(subjects), weights)[0])
+        for subject_index in sorted(chosen):
+            if produced == rows:
+                break
+            marks = int(min(100, max(1, round(rng.gauss(marks_mean, marks_sd)))))
+            yield name, subject_names[subject_index], marks, rng.choice(teacher_ids)
+            produced += 1
+
+
+# ---------------------------------------------------------
+# Context manager: scratch_database
+# Runs the block against a throw-away database in a temp directory:
+#   1. creates the schema with models.create_tables()
+#   2. seeds `rows` synthetic records in one transaction
+# and removes the files afterwards.
+# Yields make_app(**config), which creates an app (app.create_app) with
+# DATABASE_PATH set to the scratch database; the apps' audit logs are
+# flushed on the way out. The db.py helpers (default storage) are
+# pointed at it too, and restored afterwards; their caches keyed by
+# data version are cleared, since versions repeat across scratch databases.
+# ---------------------------------------------------------
+@contextmanager
+def scratch_database(rows, **distribution):
+    os.environ.setdefault('TEACHER_USERNAME', 'teacher1')
+    os.environ.setdefault('TEACHER_PASSWORD', 'pass123')
+    os.environ.setdefault('TEACHER_USERNAME2', 'teacher2')
+    os.environ.setdefault('TEACHER_PASSWORD2', 'pass456')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    import db
+    import models
+    from app import create_app
+
+    scratch_dir = tempfile.mkdtemp(prefix='class-ledger-bench-')
+    database_path = os.path.join(scratch_dir, 'class-ledger.db')
+    previous_settings = dict(vars(db.settings))
+    apps = []
+
+    def make_app(**config):
+        apps.append(create_app({'TESTING': True, 'DATABASE_PATH': database_path, **config}))
+        return apps[-1]
+
+    try:
+        models.create_tables(database_path)
+
+        conn = sqlite3.connect(database_path)
+        teacher_ids = tuple(row[0] for row in conn.execute("SELECT id FROM teachers ORDER BY id"))
+        conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            generate_records(rows, teacher_ids=teacher_ids, **distribution))
+        conn.commit()
+        conn.close()
+
+        db.configure(database_path=database_path)
+        _reset_process_caches()
+        yield make_app
+    finally:
+        for app in apps:
+            app.extensions['ledger'].close()
+        db.configure(**previous_settings)
+        _reset_process_caches()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+def _reset_process_caches():
+    import analytics
+    import db
+    db.teacher_cache.invalidate()
+    analytics.invalidate_cache()
+
+
+# ---------------------------------------------------------
+# Function: measure
+# Calls fn() `iterations` times (or until max_seconds elapse) after a
+# few warm-up calls and summarizes the per-call latencies
+# ---------------------------------------------------------
+def measure(fn, iterations=200, max_seconds=10.0, warmup=3):
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+        if time.perf_counter() - started > max_seconds:
+            break
+    return summarize_latencies(latencies, time.perf_counter() - started)
+
+# Nearest-rank percentile of an already sorted list
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize_latencies(latencies, elapsed):
+    ordered = sorted(latencies)
+    to_ms = 1000.0
+    return {
+        'calls': len(ordered),
+        'throughput': len(ordered) / elapsed if elapsed else 0.0,  # calls per second
+        'mean_ms': (sum(ordered) / len(ordered)) * to_ms if ordered else 0.0,
+        'p50_ms': percentile(ordered, 50) * to_ms,
+        'p95_ms': percentile(ordered, 95) * to_ms,
+        'p99_ms': percentile(ordered, 99) * to_ms,
+        'max_ms': ordered[-1] * to_ms if ordered else 0.0,
+    }
+
+
+# ---------------------------------------------------------
+# Benchmark cases
+# Each factory receives the seeded context and returns {name: fn}
+# Route cases go through the Flask test client, logged in as teacher 1
+# and posting the session's CSRF token like a browser; helper cases call db.py / analytics.py directly on a
+# shared connection so connect cost doesn't hide query cost
+# ---------------------------------------------------------
+def _expect(response, *statuses):
+    if response.status_code not in statuses:
+        raise RuntimeError(f"Unexpected status {response.status_code} for {response.request.path}")
+    response.get_data()  # Drain streamed bodies so the timing covers the whole response
+    return response
+
+def _csrf_token_from(html):
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', html)
+    return match.group(1) if match else ''
+
+def route_cases(app, rng):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['teacher_id'] = 1
+
+    import db
+    conn = db.get_db_connection()
+    max_id = conn.execute("SELECT MAX(id) FROM student_records").fetchone()[0] or 1
+    own_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM student_records WHERE teacher_id = 1 LIMIT 1000")]
+    conn.close()
+
+    second_page = db.get_student_records_page(page_size=app.config['RECORDS_PER_PAGE']).next_cursor
+    home = _expect(client.get('/home'), 200)
+    etag = home.headers['ETag']
+    csrf_token = _csrf_token_from(home.get_data(as_text=True))
+    counter = iter(range(10 ** 9))
+
+    def add_student():
+        name = f"Bench {letters_for(next(counter), 6)}"
+        _expect(client.post('/add_student', data={'student_name': name, 'subject': 'Benchmark',
+                                                  'marks': rng.randint(1, 100),
+                                                  'csrf_token': csrf_token}), 302)
+
+    def edit_record():
+        record_id = rng.choice(own_ids) if own_ids else rng.randint(1, max_id)
+        record = db.fetch_student_record_by_id(record_id, conn=None)
+        if record is None:
+            return
+        _expect(client.post(f'/edit_record/{record_id}', data={
+            'name': record['student_name'], 'subject': record['subject'],
+            'marks': str(rng.randint(0, 100)), 'csrf_token': csrf_token}), 302)
+
+    # A fresh client per call, so this includes fetching the login form
+    def login():
+        anonymous = app.test_client()
+        token = _csrf_token_from(_expect(anonymous.get('/login'), 200).get_data(as_text=True))
+        _expect(anonymous.post('/login', data={'teacher_username': os.environ['TEACHER_USERNAME'],
+                                               'teacher_password': os.environ['TEACHER_PASSWORD'],
+                                               'csrf_token': token}), 302)
+
+    return {
+        'GET /home': lambda: _expect(client.get('/home'), 200),
+        'GET /home (sort=marks desc)': lambda: _expect(client.get('/home?sort=marks&order=desc'), 200),
+        'GET /home (page 2)': lambda: _expect(client.get(f'/home?after={second_page}' if second_page else '/home'), 200),
+        'GET /home (If-None-Match)': lambda: _expect(client.get('/home', headers={'If-None-Match': etag}), 200, 304),
+        'GET /api/records': lambda: _expect(client.get('/api/records'), 200),
+        'GET /api/records (fields=id,marks, gzip)': lambda: _expect(client.get(
+            '/api/records?fields=id,marks&per_page=100', headers={'Accept-Encoding': 'gzip'}), 200),
+        'GET /api/records/<id>': lambda: _expect(client.get(f'/api/records/{rng.randint(1, max_id)}'), 200, 404),
+        'GET /analytics': lambda: _expect(client.get('/analytics'), 200),
+        'GET /export (csv, all)': lambda: _expect(client.get('/export?format=csv&scope=all'), 200),
+        'POST /add_student': add_student,
+        'POST /edit_record': edit_record,
+        'GET + POST /login': login,
+    }
+
+def helper_cases(rng):
+    import db
+    import analytics
+    conn = db.get_db_connection()
+    max_id = conn.execute("SELECT MAX(id) FROM student_records").fetchone()[0] or 1
+    sample = conn.execute("SELECT student_name, subject FROM student_records LIMIT 500").fetchall()
+    subjects = db.get_distinct_subjects(conn=conn) or ['Benchmark']
+    counter = iter(range(10 ** 9))
+
+    def upsert():
+        db.upsert_student_record(f"Upsert {letters_for(next(counter), 6)}", 'Benchmark',
+                                 rng.randint(1, 100), 1, conn=conn)
+
+    return {
+        'db.get_student_records_page': lambda: db.get_student_records_page(conn=conn),
+        'db.get_student_records_page (sort=marks, subject)': lambda: db.get_student_records_page(
+            sort='marks', descending=True, subject=rng.choice(subjects), conn=conn),
+        'db.fetch_student_record_by_id': lambda: db.fetch_student_record_by_id(rng.randint(1, max_id), conn=conn),
+        'db.find_duplicate_record': lambda: db.find_duplicate_record(*rng.choice(sample), conn=conn) if sample else None,
+        'db.upsert_student_record': upsert,
+        'db.get_data_version': lambda: db.get_data_version(conn=conn),
+        'db.get_subject_summaries': lambda: db.get_subject_summaries(conn=conn),
+        'db.get_all_student_records': lambda: db.get_all_student_records(conn=conn),
+        'db.iter_student_records (full scan)': lambda: sum(1 for _ in db.iter_student_records(conn=conn)),
+        'analytics.compute_class_analytics': lambda: analytics.compute_class_analytics(conn=conn),
+    }
+
+
+# ---------------------------------------------------------
+# Function: run_benchmarks
+# Seeds one scratch database per size and measures every case
+# whose name contains one of `case_filters` (all when empty)
+# Returns the JSON-serializable report
+# ---------------------------------------------------------
+def run_benchmarks(sizes=DEFAULT_SIZES, iterations=200, max_seconds=10.0, case_filters=(),
+                   seed=42, **distribution):
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'max_seconds': max_seconds,
+            'seed': seed,
+            'distribution': distribution,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        rng = random.Random(seed)
+        with scratch_database(size, seed=seed, **distribution) as make_app:
+            cases = {}
+            cases.update(route_cases(make_app(), rng))
+            cases.update(helper_cases(rng))
+            results = {}
+            for name, fn in cases.items():
+                if case_filters and not any(f in name for f in case_filters):
+                    continue
+                results[name] = measure(fn, iterations=iterations, max_seconds=max_seconds)
+                print(f"[{size}] {name}: p50 {results[name]['p50_ms']:.2f} ms, "
+                      f"p95 {results[name]['p95_ms']:.2f} ms, "
+                      f"{results[name]['throughput']:.1f}/s", file=sys.stderr)
+            report['results'][str(size)] = results
+    return report
+
+
+# ---------------------------------------------------------
+# Concurrent request capacity
+# `workers` threads (a threaded WSGI server's worth) each send the
+# `paths` requests in a loop for `seconds`, against a disk made slow by
+# sleeping `disk_latency_ms` in every SQL statement. Measured twice at
+# the same worker count: reads serialized on one connection (what the
+# synchronous handlers did) and with up to `read_connections` parallel
+# read connections per request (async_db.py). The rendered-fragment
+# cache is off so every request runs its queries.
+# ---------------------------------------------------------
+CONCURRENCY_PATHS = ('/home', '/home?sort=marks&order=desc', '/analytics')
+
+@contextmanager
+def slow_disk(disk_latency_ms):
+    import db
+    connect = db.get_db_connection
+    delay = disk_latency_ms / 1000.0
+
+    def slow_connect():
+        conn = connect()
+        conn.set_trace_callback(lambda statement: time.sleep(delay))
+        return conn
+
+    db.get_db_connection = slow_connect
+    try:
+        yield
+    finally:
+        db.get_db_connection = connect
+
+def measure_concurrency(app, workers, seconds, paths=CONCURRENCY_PATHS):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['teacher_id'] = 1
+        mine = []
+        index = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                _expect(client.get(paths[index % len(paths)]), 200)
+            except RuntimeError as error:
+                with lock:
+                    failures.append(str(error))
+                return
+            mine.append(time.perf_counter() - started)
+            index += 1
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise RuntimeError(failures[0])
+    return summarize_latencies(latencies, time.perf_counter() - started)
+
+def run_concurrency(rows=10000, workers=8, seconds=5.0, disk_latency_ms=20.0, read_connections=4, seed=42):
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'rows': rows,
+            'workers': workers,
+            'seconds': seconds,
+            'disk_latency_ms': disk_latency_ms,
+            'paths': list(CONCURRENCY_PATHS),
+        },
+        'results': {},
+    }
+    with scratch_database(rows, seed=seed) as make_app, slow_disk(disk_latency_ms):
+        for name, connections in (('serial reads', 1), (f'{read_connections} read connections', read_connections)):
+            app = make_app(ASYNC_READ_CONNECTIONS=connections, FRAGMENT_CACHE_TTL=0)
+            result = measure_concurrency(app, workers, seconds)
+            report['results'][name] = result
+            print(f"[{workers} workers] {name}: {result['throughput']:.1f} req/s, "
+                  f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms", file=sys.stderr)
+    return report
+
+
+# ---------------------------------------------------------
+# Streamed vs fully rendered /home
+# - Time to the first and to the last byte of GET /home, rendered whole
+#   (STREAM_HOME=0) and streamed; each mode runs in a child process so
+#   peak RSS (ru_maxrss) is its own, and peak_alloc_kib is the largest
+#   Python heap growth during one request (tracemalloc)
+# - The fragment cache is off so every request renders the table, and
+#   every SQL statement sleeps disk_latency_ms as in `concurrency`
+# - Template load time for every template from a fresh environment:
+#   compiled from source vs read from a warm bytecode cache (what a
+#   new worker process pays)
+# ---------------------------------------------------------
+STREAMING_MODES = ('rendered', 'streamed')
+
+def _peak_rss_kib():
+    import resource  # Unix only
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+def measure_first_byte(app, path, requests):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['teacher_id'] = 1
+    _expect(client.get(path), 200)  # Warm-up: templates compiled, connections opened
+
+    first_byte = []
+    last_byte = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        response = client.get(path)
+        chunks = iter(response.response)
+        next(chunks, None)
+        first_byte.append(time.perf_counter() - request_started)
+        for _ in chunks:
+            pass
+        response.close()
+        last_byte.append(time.perf_counter() - request_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    _expect(client.get(path), 200)
+    peak_alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'first_byte': summarize_latencies(first_byte, elapsed),
+        'last_byte': summarize_latencies(last_byte, elapsed),
+        'peak_alloc_kib': peak_alloc / 1024.0,
+        'peak_rss_kib': _peak_rss_kib(),
+    }
+
+# One mode, in this process (what each child runs)
+def run_streaming_mode(mode, rows=100000, requests=200, disk_latency_ms=5.0, per_page=100, seed=42):
+    with scratch_database(rows, seed=seed) as make_app, slow_disk(disk_latency_ms):
+        app = make_app(STREAM_HOME=(mode == 'streamed'), FRAGMENT_CACHE_TTL=0)
+        return measure_first_byte(app, f'/home?per_page={per_page}', requests)
+
+def measure_template_load(iterations=50):
+    from jinja2 import FileSystemBytecodeCache
+    from app import create_app
+    app = create_app({'TESTING': True})
+    names = app.jinja_env.list_templates()
+    cache_dir = tempfile.mkdtemp(prefix='class-ledger-bytecode-')
+    try:
+        results = {}
+        for name, bytecode_cache in (('compiled', None), ('bytecode cache', FileSystemBytecodeCache(cache_dir))):
+            # cache_size=0: no in-memory template cache, every call loads every template
+            environment = app.jinja_env.overlay(cache_size=0, bytecode_cache=bytecode_cache)
+            results[name] = measure(lambda: [environment.get_template(template) for template in names],
+                                    iterations=iterations, max_seconds=30.0, warmup=1)
+        return results
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def run_streaming(rows=100000, requests=200, disk_latency_ms=5.0, per_page=100, seed=42):
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'rows': rows,
+            'requests': requests,
+            'disk_latency_ms': disk_latency_ms,
+            'per_page': per_page,
+        },
+        'results': {},
+    }
+    for mode in STREAMING_MODES:
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), 'streaming', '--child', mode,
+                                '--rows', str(rows), '--requests', str(requests),
+                                '--disk-latency-ms', str(disk_latency_ms), '--per-page', str(per_page),
+                                '--seed', str(seed)],
+                               stdout=subprocess.PIPE, text=True, check=True)
+        result = json.loads(child.stdout)
+        report['results'][mode] = result
+        print(f"{mode}: first byte p50 {result['first_byte']['p50_ms']:.2f} ms, "
+              f"last byte p50 {result['last_byte']['p50_ms']:.2f} ms, "
+              f"peak RSS {result['peak_rss_kib']:.0f} KiB, "
+              f"peak alloc {result['peak_alloc_kib']:.0f} KiB", file=sys.stderr)
+
+    report['results']['template load'] = measure_template_load()
+    for name, result in report['results']['template load'].items():
+        print(f"template load ({name}): p50 {result['p50_ms']:.2f} ms", file=sys.stderr)
+    return report
+
+
+# ---------------------------------------------------------
+# Function: compare_reports
+# Flags cases that got slower than the baseline by more than
+# `threshold` (relative): higher latency percentiles or lower throughput
+# Returns a list of regression dicts (empty when all is well)
+# ---------------------------------------------------------
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for size, cases in current.get('results', {}).items():
+        for name, stats in cases.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            for metric in LATENCY_METRICS:
+                if base[metric] > 0 and stats[metric] > base[metric] * (1 + threshold):
+                    regressions.append({'size': size, 'case': name, 'metric': metric,
+                                        'baseline': base[metric], 'current': stats[metric]})
+            if base['throughput'] > 0 and stats['throughput'] < base['throughput'] * (1 - threshold):
+                regressions.append({'size': size, 'case': name, 'metric': 'throughput',
+                                    'baseline': base['throughput'], 'current': stats['throughput']})
+    return regressions
+
+
+# ---------------------------------------------
+# CLI entry point
+# python benchmark.py run --sizes 1000,100000 --output bench.json [--baseline base.json]
+# python benchmark.py compare base.json bench.json [--threshold 0.2]
+# python benchmark.py concurrency --workers 8 --disk-latency-ms 20
+# python benchmark.py streaming --rows 100000 --disk-latency-ms 5
+# Exit status 1 when a regression is flagged
+# ---------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Class Ledger performance benchmarks.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Seed scratch databases and benchmark routes and helpers")
+    run.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                     help="Comma-separated record counts")
+    run.add_argument('--iterations', type=int, default=200, help="Calls per case")
+    run.add_argument('--max-seconds', type=float, default=10.0, help="Time budget per case")
+    run.add_argument('--cases', default='', help="Comma-separated substrings selecting cases")
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--subjects', type=int, default=20, help="Distinct subjects")
+    run.add_argument('--subjects-per-student', type=int, default=5)
+    run.add_argument('--subject-skew', type=float, default=1.0, help="0 = uniform, higher = more skewed")
+    run.add_argument('--marks-mean', type=float, default=65.0)
+    run.add_argument('--marks-sd', type=float, default=15.0)
+    run.add_argument('--output', help="Write the JSON report here (default: stdout)")
+    run.add_argument('--baseline', help="Compare against this saved report")
+    run.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    compare = commands.add_parser('compare', help="Compare two saved reports")
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+
+    concurrency = commands.add_parser('concurrency',
+                                      help="Requests per second at a fixed worker count, serial vs parallel reads")
+    concurrency.add_argument('--rows', type=int, default=10000, help="Records seeded")
+    concurrency.add_argument('--workers', type=int, default=8, help="Concurrent request threads")
+    concurrency.add_argument('--seconds', type=float, default=5.0, help="Duration of each measurement")
+    concurrency.add_argument('--disk-latency-ms', type=float, default=20.0,
+                             help="Simulated storage latency added to every SQL statement")
+    concurrency.add_argument('--read-connections', type=int, default=4,
+                             help="Parallel read connections per request (ASYNC_READ_CONNECTIONS)")
+    concurrency.add_argument('--output', help="Write the JSON report here (default: stdout)")
+
+    streaming = commands.add_parser('streaming',
+                                    help="Time to first byte and peak memory of /home, rendered whole vs streamed")
+    streaming.add_argument('--rows', type=int, default=100000, help="Records seeded")
+    streaming.add_argument('--requests', type=int, default=200, help="Requests per mode")
+    streaming.add_argument('--disk-latency-ms', type=float, default=5.0,
+                           help="Simulated storage latency added to every SQL statement")
+    streaming.add_argument('--per-page', type=int, default=100, help="Records per page (100 is the largest page)")
+    streaming.add_argument('--seed', type=int, default=42)
+    streaming.add_argument('--child', choices=STREAMING_MODES, help=argparse.SUPPRESS)
+    streaming.add_argument('--output', help="Write the JSON report here (default: stdout)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'streaming' and args.child:
+        print(json.dumps(run_streaming_mode(args.child, rows=args.rows, requests=args.requests,
+                                            disk_latency_ms=args.disk_latency_ms, per_page=args.per_page,
+                                            seed=args.seed)))
+        return 0
+
+    if args.command in ('concurrency', 'streaming'):
+        if args.command == 'concurrency':
+            report = run_concurrency(rows=args.rows, workers=args.workers, seconds=args.seconds,
+                                     disk_latency_ms=args.disk_latency_ms, read_connections=args.read_connections)
+        else:
+            report = run_streaming(rows=args.rows, requests=args.requests, disk_latency_ms=args.disk_latency_ms,
+                                   per_page=args.per_page, seed=args.seed)
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as handle:
+                handle.write(output)
+        else:
+            print(output)
+        return 0
+
+    if args.command == 'run':
+        report = run_benchmarks(
+            sizes=[int(size) for size in args.sizes.split(',') if size],
+            iterations=args.iterations,
+            max_seconds=args.max_seconds,
+            case_filters=[case for case in args.cases.split(',') if case],
+            seed=args.seed,
+            subjects=args.subjects,
+            subjects_per_student=args.subjects_per_student,
+            subject_skew=args.subject_skew,
+            marks_mean=args.marks_mean,
+            marks_sd=args.marks_sd,
+        )
+        output = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as handle:
+                handle.write(output)
+        else:
+            print(output)
+        if not args.baseline:
+            return 0
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        current = report
+    else:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        with open(args.current) as handle:
+            current = json.load(handle)
+
+    regressions = compare_reports(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION [{regression['size']}] {regression['case']} {regression['metric']}: "
+              f"{regression['baseline']:.2f} -> {regression['current']:.2f}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,26 +1,696 @@
 import sqlite3  # SQLite module to interact with the database
+import base64   # For URL-safe pagination cursors
+import json     # Cursor payload encoding
+import math     # Standard deviation for summary rows
+import random   # Jittered backoff between write-lock retries
+import re       # Word splitting for full-text search queries
+import threading  # Guards the in-process teacher cache
+import os       # Per-process read replica
+import time     # TTL bookkeeping for the teacher cache
+from collections import namedtuple  # Lightweight result type for paginated reads
+from contextlib import contextmanager  # For the unit-of-work context manager
+
+from flask import g, has_app_context, current_app  # Request-scoped connection, the app's storage
+
+import metrics  # SQL statement timing for /metrics and the slow-query log
+from read_replica import ReadReplica  # Optional in-memory copy for reads
+
+
+# ---------------------------------------------
+# Class: LedgerConnection
+# sqlite3 connection that remembers how deeply it is nested
+# inside unit_of_work() blocks, so helpers know whether they
+# should commit themselves or leave it to the enclosing unit
+# ---------------------------------------------
+class LedgerConnection(sqlite3.Connection):
+    uow_depth = 0
+
+
+# ---------------------------------------------------------
+# Class: TracedCursor
+# Cursor that times each statement - execute() plus every fetch -
+# and counts the rows it returns, then hands the totals to
+# metrics.record_sql() once the statement is finished (rows
+# exhausted, next execute(), close, or the cursor is dropped)
+# ---------------------------------------------------------
+class TracedCursor(sqlite3.Cursor):
+    _sql = None
+    _seconds = 0.0
+    _rows = 0
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._seconds += time.perf_counter() - started
+
+    def _finish(self):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            metrics.record_sql(sql, self._seconds, self._rows)
+
+    def _start(self, sql):
+        self._finish()
+        self._sql, self._seconds, self._rows = sql, 0.0, 0
+
+    def execute(self, sql, parameters=()):
+        self._start(sql)
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        self._start(sql_script)
+        self._timed(super().executescript, sql_script)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+# ---------------------------------------------
+# Class: TracedConnection
+# LedgerConnection whose cursors (including those created by the
+# execute() shortcuts) are TracedCursors
+# Only used while metrics / the slow-query log are switched on
+# ---------------------------------------------
+class TracedConnection(LedgerConnection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# ---------------------------------------------
+# Storage settings
+# - backend: 'sqlite' (default, the class-ledger.db file) or
+#   'postgres' (database_url, see postgres_backend.py)
+# SQLite settings applied to every connection. Several worker
+# processes share one database file, so by default:
+# - journal_mode WAL: readers and a writer don't block each other
+# - synchronous NORMAL: no fsync per commit (safe with WAL; a power
+#   loss can only drop the last commits, never corrupt the file)
+# - busy_timeout_ms: how long a statement waits for another
+#   connection's lock before failing with "database is locked"
+# - mmap_size: bytes of the file read through memory mapping (0 = off)
+# - cache_size_kib: page cache per connection
+# - write_retries / retry_backoff_ms: extra BEGIN IMMEDIATE attempts,
+#   with jittered exponential backoff, once the busy timeout runs out
+# PostgreSQL connection pool (per process):
+# - pool_min_size / pool_max_size: connections kept open / allowed
+# - pool_timeout: seconds to wait for a free connection
+# Read replica (SQLite only, see read_replica.py):
+# - read_replica: serve reads outside transactions from an in-memory
+#   copy of the file kept by each worker process
+# - replica_max_staleness_ms: reads never see data older than this;
+#   past it (or after this process writes) they go to the file
+# Each Storage (see below) has its own; configure() sets the default
+# storage's, used outside a Flask app (scripts, the CLI, tests)
+# ---------------------------------------------
+BACKENDS = ('sqlite', 'postgres')
+JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+class _Settings:
+    backend = 'sqlite'
+    database_url = None
+    database_path = "class-ledger.db"
+    journal_mode = 'WAL'
+    synchronous = 'NORMAL'
+    busy_timeout_ms = 5000
+    mmap_size = 256 * 1024 * 1024
+    cache_size_kib = 16 * 1024
+    write_retries = 5
+    retry_backoff_ms = 20
+    pool_min_size = 1
+    pool_max_size = 10
+    pool_timeout = 30.0
+    read_replica = False
+    replica_max_staleness_ms = 1000
+
+# sqlite3.connect() for a database file path or a 'file:' URI, e.g.
+# 'file:ledger?mode=memory&cache=shared' for an in-memory database
+# that stays alive while any connection to it is open
+def connect_sqlite(path, **kwargs):
+    return sqlite3.connect(path, uri=str(path).startswith('file:'), **kwargs)
+
+# Applies a storage's settings (default: the default storage's) to a
+# new connection (journal_mode is stored in the file; setting it again is a no-op)
+def _configure_connection(conn, settings=None):
+    settings = settings or _default_storage.settings
+    conn.execute(f"PRAGMA journal_mode = {settings.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {settings.synchronous}")
+    conn.execute(f"PRAGMA mmap_size = {settings.mmap_size:d}")
+    conn.execute(f"PRAGMA cache_size = {-settings.cache_size_kib:d}")  # Negative = KiB, not pages
 
 # ---------------------------------------------
 # Function: get_db_connection
-# Establishes and returns a connection to the SQLite database
-# Enables row access by column name (dictionary-like)
+# Returns a new connection from the current storage's backend
+# (see SQLiteBackend / postgres_backend.PostgresBackend); either
+# way it has the sqlite3 interface the helpers below rely on
 # ---------------------------------------------
 def get_db_connection():
-    # Connect to the SQLite database (creates file if it doesn't exist)
-    conn = sqlite3.connect("class-ledger.db")
+    return current_storage().connect()
+
+# ---------------------------------------------------------
+# Function: begin_write
+# Starts a write transaction in the way the connection's backend
+# needs (see SQLiteBackend.begin_write)
+# No-op when the connection is already inside a transaction
+# ---------------------------------------------------------
+def begin_write(conn):
+    if not conn.in_transaction:
+        backend_for(conn).begin_write(conn)
+
+# ---------------------------------------------------------
+# Storage backends
+# The helpers in this module are the storage interface app.py uses.
+# They speak portable SQL through a connection with sqlite3's
+# interface: '?' placeholders, rows readable by name and index,
+# commit / rollback / in_transaction / close. A backend supplies
+# the connections and the few things that differ:
+#   connect()                  new connection (pooled backends
+#                              return it to the pool on close())
+#   begin_write(conn)          start a write transaction
+#   stream(conn, sql, params, batch_size, plain)
+#                              iterate a large result in batches
+#   build_search_query(text), ranked_matches,
+#   unranked_matches           full-text search pieces
+#   join_in_order              join keyword that keeps a VALUES list
+#                              as the outer loop of a lookup
+#   upsert_inserted            RETURNING expression, true when an
+#                              upsert inserted its row (None: not
+#                              available, see upsert_student_record)
+#   Error                      base exception class of the driver
+# ---------------------------------------------------------
+def _is_lock_error(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+# ---------------------------------------------------------
+# Class: SQLiteBackend
+# The database file (settings.database_path), shared by the
+# processes on one machine
+# ---------------------------------------------------------
+class SQLiteBackend:
+    name = 'sqlite'
+    Error = sqlite3.Error
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    # CROSS JOIN stops SQLite from reordering the join, so each VALUES
+    # row becomes one index seek on student_records
+    join_in_order = 'CROSS JOIN'
+
+    # Nothing in an upsert's RETURNING row tells an insert from an update;
+    # upsert_student_record() looks the key up first instead (under the
+    # write lock begin_write() takes, so nothing can insert in between)
+    upsert_inserted = None
+
+    # Connects to the database file (created if missing), applies the
+    # SQLite settings and returns rows readable by column name
+    # Statements are timed when metrics or the slow-query log are enabled
+    def connect(self):
+        # timeout= is SQLite's busy timeout: wait for locks instead of failing
+        factory = TracedConnection if metrics.sql_tracing_enabled() else LedgerConnection
+        conn = connect_sqlite(self.settings.database_path, factory=factory,
+                              timeout=self.settings.busy_timeout_ms / 1000.0)
+        _configure_connection(conn, self.settings)
+        conn.storage_backend = self  # Writes retry with these settings (see begin_write)
+
+        # Configure connection to return rows as dictionary-like objects
+        conn.row_factory = sqlite3.Row
+
+        return conn
+
+    # -----------------------------------------------------
+    # BEGIN IMMEDIATE takes the database's write lock up front
+    # - A deferred transaction that reads first and writes later can
+    #   fail mid-way when another process wrote in between; IMMEDIATE
+    #   waits (busy timeout) before any work is done instead
+    # - If the lock is still busy after the timeout, retries up to
+    #   settings.write_retries times with jittered exponential
+    #   backoff, so competing processes don't retry in lockstep
+    # -----------------------------------------------------
+    def begin_write(self, conn):
+        attempt = 0
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as error:
+                if not _is_lock_error(error) or attempt >= self.settings.write_retries:
+                    raise
+            metrics.sql_write_lock_retries.inc()
+            # Full jitter: sleep a random time up to the exponential backoff
+            time.sleep(random.uniform(0, self.settings.retry_backoff_ms * (2 ** attempt)) / 1000.0)
+            attempt += 1
+
+    # fetchmany() batches keep memory flat for any result size;
+    # plain=True yields tuples instead of sqlite3.Row objects
+    def stream(self, conn, sql, params=(), batch_size=500, plain=False):
+        cur = conn.cursor()
+        if plain:
+            cur.row_factory = None
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def build_search_query(self, text):
+        return build_search_query(text)
+
+    # Relevance: name matches weigh twice as much as subject matches.
+    # bm25() is lower for better matches, so ascending order = best first
+    ranked_matches = '''(
+        SELECT r.*, bm25(student_records_fts, 2.0, 1.0) AS score
+        FROM student_records_fts
+        JOIN student_records r ON r.id = student_records_fts.rowid
+        WHERE student_records_fts MATCH ?
+    ) AS matches'''
+    unranked_matches = '''(
+        SELECT * FROM student_records
+        WHERE id IN (SELECT rowid FROM student_records_fts WHERE student_records_fts MATCH ?)
+    ) AS matches'''
+
+    def close(self):
+        pass  # Connections are closed by their users
+
+
+SQLITE_PATH = _Settings.database_path  # Default database file, relative to the working directory
+
+
+# ---------------------------------------------------------
+# Class: Storage
+# One database: its settings, backend (with PostgreSQL, a connection
+# pool), read replica and teacher cache
+# - The module's default storage, set up with configure(), serves
+#   everything running outside a Flask app (scripts, the CLI, tests)
+# - init_app(app, storage) gives an app its own (app.create_app builds
+#   one from the app's config), used while that app's context is
+#   active, so apps in one process can use different databases
+# ---------------------------------------------------------
+class Storage:
+    def __init__(self, **options):
+        self.settings = _Settings()
+        self.teacher_cache = TTLCache(ttl=60.0)
+        self._backend = None
+        self._replica = None
+        self._replica_lock = threading.Lock()
+        self.configure(**options)
+
+    def configure(self, backend='sqlite', database_url=None, database_path=SQLITE_PATH,
+                  journal_mode='WAL', synchronous='NORMAL',
+                  busy_timeout_ms=5000, mmap_size=256 * 1024 * 1024, cache_size_kib=16 * 1024,
+                  write_retries=5, retry_backoff_ms=20, pool_min_size=1, pool_max_size=10, pool_timeout=30.0,
+                  read_replica=False, replica_max_staleness_ms=1000):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported storage backend: {backend}")
+        # The modes are interpolated into PRAGMA statements, so only known values pass
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported journal_mode: {journal_mode}")
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Unsupported synchronous mode: {synchronous}")
+        settings = self.settings
+        settings.backend = backend
+        settings.database_url = database_url
+        settings.database_path = database_path
+        settings.journal_mode = journal_mode.upper()
+        settings.synchronous = synchronous.upper()
+        settings.busy_timeout_ms = int(busy_timeout_ms)
+        settings.mmap_size = int(mmap_size)
+        settings.cache_size_kib = int(cache_size_kib)
+        settings.write_retries = int(write_retries)
+        settings.retry_backoff_ms = float(retry_backoff_ms)
+        settings.pool_min_size = int(pool_min_size)
+        settings.pool_max_size = int(pool_max_size)
+        settings.pool_timeout = float(pool_timeout)
+        settings.read_replica = bool(read_replica) and backend == 'sqlite'
+        settings.replica_max_staleness_ms = float(replica_max_staleness_ms)
 
-    # Configure connection to return rows as dictionary-like objects
-    conn.row_factory = sqlite3.Row
+        # The next backend() call builds the backend from the new settings,
+        # and cached teachers may come from another database
+        self.close()
+        self.teacher_cache.invalidate()
 
+    # The storage backend, created on first use
+    # (the PostgreSQL driver is only imported when selected)
+    def backend(self):
+        if self._backend is None:
+            if self.settings.backend == 'postgres':
+                from postgres_backend import PostgresBackend
+                self._backend = PostgresBackend(self.settings.database_url, self.settings.pool_min_size,
+                                                self.settings.pool_max_size, self.settings.pool_timeout)
+            else:
+                self._backend = SQLiteBackend(self.settings)
+        return self._backend
+
+    def connect(self):
+        return self.backend().connect()
+
+    # This process's read replica, or None when disabled
+    # Started (one full copy) on first use; a forked worker gets its
+    # own, since the poller thread doesn't survive the fork
+    def read_replica(self):
+        if not self.settings.read_replica:
+            return None
+        with self._replica_lock:
+            if self._replica is None or self._replica.pid != os.getpid():
+                factory = TracedConnection if metrics.sql_tracing_enabled() else LedgerConnection
+                replica = ReadReplica(self.settings.database_path,
+                                      max_staleness=self.settings.replica_max_staleness_ms / 1000.0,
+                                      connection_factory=factory)
+                replica.start()
+                self._replica = replica
+            return self._replica
+
+    # Replica counters for /metrics (empty until the replica has started)
+    def replica_stats(self):
+        replica = self._replica
+        return replica.stats() if replica is not None else {}
+
+    # After a commit: reads must see it, so skip the replica until it
+    # has copied the write
+    def note_write(self):
+        if self._replica is not None:
+            self._replica.mark_stale()
+
+    # Closes the connection pool and stops the replica
+    def close(self):
+        if self._backend is not None:
+            self._backend.close()
+        self._backend = None
+        with self._replica_lock:
+            if self._replica is not None:
+                self._replica.stop()
+            self._replica = None
+
+# ---------------------------------------------
+# Function: current_storage
+# The storage of the active Flask app (see init_app), or the
+# default storage outside an app or for apps without their own
+# ---------------------------------------------
+def current_storage():
+    if has_app_context():
+        return current_app.extensions.get('ledger_storage', _default_storage)
+    return _default_storage
+
+# Settings of the default storage (see Storage.configure)
+def configure(**options):
+    _default_storage.configure(**options)
+
+# ---------------------------------------------
+# Function: get_backend
+# The current storage's backend
+# ---------------------------------------------
+def get_backend():
+    return current_storage().backend()
+
+# The backend a connection belongs to: pooled PostgreSQL connections
+# carry theirs; any sqlite3 connection (including ones tests open
+# directly) uses the SQLite dialect
+def backend_for(conn):
+    return getattr(conn, 'storage_backend', SQLITE_BACKEND)
+
+# ---------------------------------------------
+# Function: get_read_replica
+# The current storage's read replica, or None when disabled
+# (see Storage.read_replica)
+# ---------------------------------------------
+def get_read_replica():
+    return current_storage().read_replica()
+
+# Replica counters for /metrics (empty until the replica has started)
+def read_replica_stats():
+    return current_storage().replica_stats()
+
+def _note_write():
+    current_storage().note_write()
+
+# ---------------------------------------------
+# Function: get_replica_connection
+# A replica connection for the current request, or None when the
+# read should go to the primary: replica off or stale, or the request
+# connection has an open transaction (its reads must see its writes)
+# Reopened when the replica has swapped in a newer copy
+# ---------------------------------------------
+def get_replica_connection():
+    replica = get_read_replica()
+    if replica is None:
+        return None
+    primary = g.get('db_conn')
+    if primary is not None and (primary.uow_depth or primary.in_transaction):
+        return None
+    conn = g.get('replica_conn')
+    if conn is not None and (g.replica_uri != replica.uri or not replica.is_fresh()):
+        g.pop('replica_conn').close()
+        conn = None
+    if conn is None:
+        conn = replica.connect()
+        if conn is None:
+            return None
+        g.replica_conn, g.replica_uri = conn, replica.uri
     return conn
 
+# ---------------------------------------------
+# Function: get_request_connection
+# Returns the connection shared by the current request, opening
+# it on first use and storing it on flask.g
+# Closed by close_request_connection() at app-context teardown
+# ---------------------------------------------
+def get_request_connection():
+    if 'db_conn' not in g:
+        g.db_conn = get_db_connection()
+    return g.db_conn
+
+# ---------------------------------------------
+# Function: close_request_connection
+# Teardown hook: closes the request connection if one was opened
+# Anything not committed by then (e.g. after an error) is rolled back
+# ---------------------------------------------
+def close_request_connection(exception=None):
+    for name in ('db_conn', 'replica_conn'):
+        conn = g.pop(name, None)
+        if conn is not None:
+            conn.close()
+
+# ---------------------------------------------
+# Function: init_app
+# Registers the request connection teardown on the Flask app and,
+# when given, the Storage the app's requests use (otherwise the
+# default storage)
+# ---------------------------------------------
+def init_app(app, storage=None):
+    app.teardown_appcontext(close_request_connection)
+    if storage is not None:
+        app.extensions['ledger_storage'] = storage
+
+# ---------------------------------------------
+# Function: _acquire_connection
+# Picks the connection a helper should use:
+#   1. the one passed in explicitly
+#   2. inside Flask, for reads, the read replica when enabled and fresh
+#      (replica=False skips it: for tables the replica doesn't track)
+#   3. the request connection when running inside Flask
+#   4. a fresh connection otherwise (CLI, scripts)
+# Returns (conn, owns_conn) - owned connections are closed by the helper
+# write=True starts a write transaction (see begin_write) unless an
+# enclosing unit_of_work() already holds one
+# ---------------------------------------------
+def _acquire_connection(conn=None, write=False, replica=True):
+    if conn is not None:
+        owns_conn = False
+    elif has_app_context():
+        conn = get_replica_connection() if replica and not write else None
+        conn, owns_conn = conn or get_request_connection(), False
+    else:
+        conn, owns_conn = get_db_connection(), True
+    if write and getattr(conn, 'uow_depth', 0) == 0:
+        try:
+            begin_write(conn)
+        except BaseException:
+            if owns_conn:
+                conn.close()
+            raise
+    return conn, owns_conn
+
+# ---------------------------------------------
+# Function: _release_connection
+# Finishes a helper call: commits writes unless an enclosing
+# unit_of_work() will commit them, and closes owned connections
+# ---------------------------------------------
+def _release_connection(conn, owns_conn, write=False):
+    if write and getattr(conn, 'uow_depth', 0) == 0:
+        conn.commit()
+        _note_write()
+    if owns_conn:
+        conn.close()
+
+# ---------------------------------------------------------
+# Context manager: unit_of_work
+# Groups several helper calls into one transaction with one commit
+# - Helpers called inside the block skip their own commit
+# - Commits once when the outermost block exits cleanly
+# - Rolls back everything if the block raises
+# - The outermost block starts with begin_write(), so the whole unit
+#   runs under the write lock and its reads can't go stale
+# Usage:
+#     with unit_of_work():
+#         record = fetch_student_record_by_id(record_id)
+#         update_student_record(record_id, name, subject, marks)
+# ---------------------------------------------------------
+@contextmanager
+def unit_of_work(conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)  # Never the replica
+    depth = conn.uow_depth
+    conn.uow_depth = depth + 1
+    try:
+        yield conn
+        if depth == 0:
+            conn.commit()
+            _note_write()
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        raise
+    finally:
+        conn.uow_depth = depth
+        if owns_conn:
+            conn.close()
+
+# ---------------------------------------------------------
+# Class: TTLCache
+# Small thread-safe in-process cache whose entries expire after
+# `ttl` seconds; the oldest entry is evicted beyond max_entries
+# ---------------------------------------------------------
+class TTLCache:
+    def __init__(self, ttl=60.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (expires_at, value), in insertion order
+        self._lock = threading.Lock()
+
+    # Returns the cached value, or None if missing/expired
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    # Drops one key, or everything when key is None
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+# The storage used outside Flask apps, and its settings
+_default_storage = Storage()
+settings = _default_storage.settings
+
+# Dialect of sqlite3 connections opened outside a Storage (see backend_for)
+SQLITE_BACKEND = SQLiteBackend(settings)
+
+# Teacher rows keyed by username, so repeated logins skip the DB lookup
+# (one cache per Storage; this is the default storage's)
+# Invalidated by set_teacher_password(); changes made by another process
+# (e.g. re-running models.py) are picked up once the TTL expires
+teacher_cache = _default_storage.teacher_cache
+
+# ---------------------------------------------------------
+# Function: get_data_version
+# Cheap change token for the ledger data
+# - Reads the trigger-maintained data_versions counters in one query
+# - Changes whenever student_records or teachers are written, by any
+#   connection or process
+# Returns:
+#   - str such as "student_records:42,teachers:2"
+# ---------------------------------------------------------
+def get_data_version(conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    rows = conn.execute("SELECT name, version FROM data_versions ORDER BY name").fetchall()
+    _release_connection(conn, owns_conn)
+    return ','.join(f'{name}:{version}' for name, version in rows)
+
 # ---------------------------------------------
 # Function: get_teacher_by_username
 # Fetches a teacher record from the DB by username
 # Used during login to validate credentials
+# Served from teacher_cache while the cached row is fresh
 # ---------------------------------------------
-def get_teacher_by_username(username):
-    conn = get_db_connection()     # Get database connection
+def get_teacher_by_username(username, conn=None):
+    teacher_cache = current_storage().teacher_cache
+    teacher = teacher_cache.get(username)
+    if teacher is not None:
+        return teacher
+
+    conn, owns_conn = _acquire_connection(conn)  # Get database connection
     cur = conn.cursor()            # Create a cursor to execute queries
 
     # Use parameterized query to prevent SQL injection
@@ -29,11 +699,24 @@ def get_teacher_by_username(username):
     # Fetch one matching record (since username is unique)
     teacher = cur.fetchone()
 
-    # Close the database connection
-    conn.close()
+    _release_connection(conn, owns_conn)
+
+    # Only hits are cached, so newly created teachers can log in right away
+    if teacher is not None:
+        teacher_cache.set(username, teacher)
 
     return teacher  # Returns None if no match found
 
+# ---------------------------------------------
+# Function: set_teacher_password
+# Stores a new password hash for a teacher and drops the cached row
+# ---------------------------------------------
+def set_teacher_password(username, password_hash, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    conn.execute("UPDATE teachers SET password = ? WHERE username = ?", (password_hash, username))
+    _release_connection(conn, owns_conn, write=True)
+    current_storage().teacher_cache.invalidate(username)
+
 # ---------------------------------------------------------
 # insert_student_record:
 # Inserts a new student record into the student_records table
@@ -41,13 +724,10 @@ def get_teacher_by_username(username):
 #     * student_name (str): Name of the student
 #     * subject (str): Subject for which the marks are recorded
 #     * marks (int): Marks obtained by the student
-# - Establishes DB connection, executes INSERT query, commits and closes
+# - Executes INSERT query, commits unless inside a unit of work
 # ---------------------------------------------------------
 def insert_student_record(student_name, subject, marks, teacher_id, conn=None):
-    own_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        own_conn = True
+    conn, owns_conn = _acquire_connection(conn, write=True)
     cur = conn.cursor()         # Create a cursor object for executing SQL statements
 
     # Execute an INSERT SQL statement to add the student data
@@ -56,18 +736,129 @@ def insert_student_record(student_name, subject, marks, teacher_id, conn=None):
         (student_name, subject, marks, teacher_id)
     )
 
-    conn.commit()  # Commit the transaction to save changes
-    if own_conn:
-        conn.close()   # Close the database connection
+    _release_connection(conn, owns_conn, write=True)
+
+# ---------------------------------------------------------
+# upsert_student_record:
+# Adds marks for a student/subject in ONE atomic statement:
+#   - inserts a new record if the pair doesn't exist yet
+#   - otherwise adds the marks to the existing record (matched
+#     case-insensitively through the unique_student_subject index)
+#     and refreshes the name/subject spelling
+#   - leaves the record untouched if the total would exceed 100
+# No separate duplicate lookup, so concurrent adds can't race
+# (on SQLite the key is looked up first, only to report whether the
+# row was inserted; the write lock is already held)
+# Requires SQLite 3.35+ (UPSERT with RETURNING)
+# Returns:
+#   - row with the record's id, resulting marks total and inserted
+#     (true for a new record, false when the marks were merged)
+#   - None if the merge was refused by the 100-mark cap
+# ---------------------------------------------------------
+def upsert_student_record(student_name, subject, marks, teacher_id, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    cur = conn.cursor()
+
+    inserted = backend_for(conn).upsert_inserted
+    params = (student_name, subject, marks, teacher_id)
+    if inserted is None:
+        existing = cur.execute(
+            "SELECT 1 FROM student_records WHERE LOWER(student_name) = LOWER(?) AND LOWER(subject) = LOWER(?)",
+            (student_name, subject)).fetchone()
+        inserted, params = '?', params + (existing is None,)
+
+    cur.execute(f"""
+        INSERT INTO student_records (student_name, subject, marks, teacher_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (LOWER(student_name), LOWER(subject)) DO UPDATE
+        SET student_name = excluded.student_name,
+            subject = excluded.subject,
+            marks = student_records.marks + excluded.marks
+        WHERE student_records.marks + excluded.marks <= 100
+        RETURNING id, marks, {inserted} AS inserted
+    """, params)
+    result = cur.fetchone()
 
-def fetch_student_record_by_id(record_id):
-    conn = get_db_connection()
+    _release_connection(conn, owns_conn, write=True)
+    return result
+
+# ---------------------------------------------------------
+# Bulk helpers used by the roster import
+# ---------------------------------------------------------
+# SQLite's LOWER() only folds ASCII letters; record_key() mirrors that
+# so keys built in Python match the unique_student_subject index
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+# Keys per lookup query - keeps bound parameters under SQLite's limit
+_KEY_LOOKUP_CHUNK = 400
+
+# ---------------------------------------------------------
+# Function: record_key
+# Case-insensitive (student_name, subject) key, as seen by the unique index
+# ---------------------------------------------------------
+def record_key(student_name, subject):
+    return student_name.translate(_ASCII_LOWER), subject.translate(_ASCII_LOWER)
+
+# ---------------------------------------------------------
+# Function: get_marks_for_record_keys
+# Looks up current marks for many (student_name, subject) keys at once
+# - Each key is an index seek on unique_student_subject
+# - Parameters: keys - iterable of record_key() tuples
+# Returns:
+#   - dict mapping record_key -> marks for the keys that exist
+# ---------------------------------------------------------
+def get_marks_for_record_keys(keys, conn=None):
+    keys = list(keys)
+    conn, owns_conn = _acquire_connection(conn)
+    marks = {}
+    for start in range(0, len(keys), _KEY_LOOKUP_CHUNK):
+        chunk = keys[start:start + _KEY_LOOKUP_CHUNK]
+        values = ", ".join(["(?, ?)"] * len(chunk))
+        params = [part for key in chunk for part in key]
+        rows = conn.execute(f"""
+            WITH k(name_key, subject_key) AS (VALUES {values})
+            SELECT k.name_key, k.subject_key, r.marks
+            FROM k {backend_for(conn).join_in_order} student_records r
+              ON LOWER(r.student_name) = k.name_key AND LOWER(r.subject) = k.subject_key
+        """, params)
+        for name_key, subject_key, row_marks in rows:
+            marks[(name_key, subject_key)] = row_marks
+    _release_connection(conn, owns_conn)
+    return marks
+
+# ---------------------------------------------------------
+# Function: upsert_student_records_many
+# Batched version of upsert_student_record using executemany
+# - Parameters: rows - iterable of (student_name, subject, marks, teacher_id)
+# - Same insert-or-add-marks semantics and 100-mark cap; rows refused by
+#   the cap are skipped (callers pre-check totals to report them)
+# ---------------------------------------------------------
+def upsert_student_records_many(rows, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    conn.executemany("""
+        INSERT INTO student_records (student_name, subject, marks, teacher_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (LOWER(student_name), LOWER(subject)) DO UPDATE
+        SET student_name = excluded.student_name,
+            subject = excluded.subject,
+            marks = student_records.marks + excluded.marks
+        WHERE student_records.marks + excluded.marks <= 100
+    """, rows)
+    _release_connection(conn, owns_conn, write=True)
+
+# ---------------------------------------------------------
+# fetch_student_record_by_id:
+# Returns a single student record (sqlite3.Row) by ID, or None
+# - fields (tuple): optional projection, validated by check_record_fields
+# ---------------------------------------------------------
+def fetch_student_record_by_id(record_id, fields=None, conn=None):
+    columns = '*' if fields is None else ', '.join(check_record_fields(fields))
+    conn, owns_conn = _acquire_connection(conn)
     cur = conn.cursor()
-    record_id = str(record_id)
 
-    student_record = cur.execute('SELECT * FROM student_records WHERE id=?', (record_id)).fetchone()
+    student_record = cur.execute(f'SELECT {columns} FROM student_records WHERE id=?', (record_id,)).fetchone()
 
-    conn.close()
+    _release_connection(conn, owns_conn)
 
     return student_record
 
@@ -77,38 +868,407 @@ def fetch_student_record_by_id(record_id):
 # Retrieves all student records from the student_records table
 # - Returns:
 #     * List of sqlite3.Row objects representing student records
-# - Establishes DB connection, executes SELECT query, fetches all rows
+# - Executes SELECT query, fetches all rows
 # ---------------------------------------------------------
 def get_all_student_records(conn=None):
-    own_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        own_conn = True
+    conn, owns_conn = _acquire_connection(conn)
     cur = conn.cursor()         # Create a cursor object
 
     # Execute a SELECT SQL statement to fetch all records
     cur.execute('SELECT * FROM student_records')
     students = cur.fetchall()   # Retrieve all rows from the query result
 
-    if own_conn:
-        conn.close()            # Close the database connection
+    _release_connection(conn, owns_conn)
     return students             # Return the list of student records
 
+# ---------------------------------------------------------
+# Keyset (cursor-based) pagination
+# Instead of OFFSET, each page remembers the sort value and id of
+# its first/last row and the next query continues from there:
+#     WHERE (sort_col, id) > (last_value, last_id) ORDER BY sort_col, id
+# so every page is an index range scan, however deep the user pages.
+# ---------------------------------------------------------
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Every student_records column, in table order (also the projection whitelist)
+RECORD_COLUMNS = ('id', 'student_name', 'subject', 'marks', 'teacher_id')
+
+# Public sort keys accepted from the UI -> student_records columns
+RECORD_SORT_COLUMNS = {
+    'name': 'student_name',
+    'subject': 'subject',
+    'marks': 'marks',
+}
+
+# One page of results plus the cursors for the neighbouring pages
+# (a cursor is None when there is no page in that direction)
+Page = namedtuple('Page', ['rows', 'next_cursor', 'prev_cursor'])
+
+# ---------------------------------------------------------
+# Function: encode_cursor / decode_cursor
+# Turn a keyset position (sort value, id) into an opaque URL-safe
+# token and back. decode_cursor returns None for malformed tokens,
+# including any whose values couldn't be bound as a sort value
+# (text, number or NULL) and an integer id
+# ---------------------------------------------------------
+def encode_cursor(values):
+    payload = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    sort_value, record_id = values
+    if isinstance(sort_value, bool) or not isinstance(sort_value, (str, int, float, type(None))):
+        return None
+    if isinstance(record_id, bool) or not isinstance(record_id, int):
+        return None
+    return sort_value, record_id
+
+# ---------------------------------------------------------
+# Function: fetch_keyset_page
+# Reusable keyset paginator for any table with an integer id
+# Parameters:
+#   - table (str): table to read (trusted, never user input)
+#   - sort_column (str): column to order by (trusted; id breaks ties)
+#   - filters (dict): column -> value equality filters (trusted columns)
+#   - after / before (str): cursor from a previous Page; at most one
+#   - page_size (int): rows per page, clamped to 1..MAX_PAGE_SIZE
+#   - descending (bool): sort direction
+#   - columns (str): SELECT list, must include the sort column and id
+#   - table_params (tuple): parameters for placeholders inside `table`
+#     when it is a subquery
+#   - replica (bool): False reads the primary even when the read
+#     replica is on (see _acquire_connection)
+# Returns:
+#   - Page(rows, next_cursor, prev_cursor)
+# ---------------------------------------------------------
+def fetch_keyset_page(table, sort_column, filters=None, after=None, before=None,
+                      page_size=DEFAULT_PAGE_SIZE, descending=False, columns='*',
+                      table_params=(), replica=True, conn=None):
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    backwards = before_key is not None
+
+    conditions = []
+    params = list(table_params)
+    for column, value in (filters or {}).items():
+        conditions.append(f"{column} = ?")
+        params.append(value)
+
+    # Walking backwards flips both the comparison and the ORDER BY;
+    # the rows are reversed again below so pages always read top-down
+    scan_descending = descending != backwards
+    key = after_key or before_key
+    if key is not None:
+        conditions.append(f"({sort_column}, id) {'<' if scan_descending else '>'} (?, ?)")
+        params.extend(key)
+
+    direction = 'DESC' if scan_descending else 'ASC'
+    sql = f"SELECT {columns} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {sort_column} {direction}, id {direction} LIMIT ?"
+    params.append(page_size + 1)  # One extra row tells us whether more pages exist
+
+    conn, owns_conn = _acquire_connection(conn, replica=replica)
+    rows = conn.execute(sql, params).fetchall()
+    _release_connection(conn, owns_conn)
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return Page(rows, None, None)
+
+    first = encode_cursor((rows[0][sort_column], rows[0]['id']))
+    last = encode_cursor((rows[-1][sort_column], rows[-1]['id']))
+    if backwards:
+        return Page(rows, last, first if has_more else None)
+    return Page(rows, last if has_more else None, first if key is not None else None)
+
+# ---------------------------------------------------------
+# Function: check_record_fields
+# Validates a requested column projection against RECORD_COLUMNS
+# Raises ValueError naming any unknown fields
+# ---------------------------------------------------------
+def check_record_fields(fields):
+    unknown = [field for field in fields if field not in RECORD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return tuple(fields)
+
+# ---------------------------------------------------------
+# Function: get_student_records_page
+# Dashboard read: one page of student_records, sorted and filtered in SQL
+# Parameters:
+#   - sort (str): key of RECORD_SORT_COLUMNS (unknown keys fall back to name)
+#   - subject (str) / teacher_id (int): optional equality filters
+#   - fields (tuple): optional projection; only these columns (plus the
+#     keyset columns) are selected and rows come back as plain tuples
+#     in `fields` order
+#   - remaining parameters as in fetch_keyset_page
+# ---------------------------------------------------------
+def get_student_records_page(sort='name', descending=False, subject=None, teacher_id=None,
+                             after=None, before=None, page_size=DEFAULT_PAGE_SIZE,
+                             fields=None, conn=None):
+    sort_column = RECORD_SORT_COLUMNS.get(sort, RECORD_SORT_COLUMNS['name'])
+    filters = {}
+    if subject:
+        filters['subject'] = subject
+    if teacher_id is not None:
+        filters['teacher_id'] = teacher_id
+
+    page = fetch_keyset_page('student_records', sort_column, filters=filters,
+                             after=after, before=before, page_size=page_size,
+                             descending=descending, columns=_projection(fields, sort_column),
+                             conn=conn)
+    return _project_page(page, fields)
+
+# SELECT list for an optional `fields` projection (keyset columns always included)
+def _projection(fields, sort_column):
+    if fields is None:
+        return '*'
+    fields = check_record_fields(fields)
+    return ', '.join(list(fields) + [c for c in (sort_column, 'id') if c not in fields])
+
+# Trims projected rows back to plain tuples in `fields` order
+def _project_page(page, fields):
+    if fields is None:
+        return page
+    width = len(fields)
+    return Page([tuple(row)[:width] for row in page.rows], page.next_cursor, page.prev_cursor)
+
+# ---------------------------------------------------------
+# Function: get_teacher_records_page
+# "My records": one page of a single teacher's records
+# - Same options as get_student_records_page
+# - Served by the (teacher_id, ...) composite indexes, so a page is an
+#   index range scan already in sort order, however big the school is
+# ---------------------------------------------------------
+def get_teacher_records_page(teacher_id, sort='name', descending=False, subject=None,
+                             after=None, before=None, page_size=DEFAULT_PAGE_SIZE,
+                             fields=None, conn=None):
+    return get_student_records_page(sort=sort, descending=descending, subject=subject,
+                                    teacher_id=teacher_id, after=after, before=before,
+                                    page_size=page_size, fields=fields, conn=conn)
+
+# ---------------------------------------------------------
+# Function: get_teacher_subjects
+# Distinct subjects a teacher has records in, alphabetically
+# (read from the teacher/subject index without touching the table)
+# ---------------------------------------------------------
+def get_teacher_subjects(teacher_id, conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    subjects = [row[0] for row in conn.execute(
+        "SELECT DISTINCT subject FROM student_records WHERE teacher_id = ? ORDER BY subject",
+        (teacher_id,))]
+    _release_connection(conn, owns_conn)
+    return subjects
+
+# ---------------------------------------------------------
+# Function: build_search_query
+# Turns free text typed by a teacher into an FTS5 MATCH expression:
+# every word becomes a quoted term and words of two or more characters
+# are prefix-matched ("jo"* "sm"*), so partial words match while
+# typing and FTS5 syntax in the input is inert
+# Returns None when the text contains no searchable words
+# ---------------------------------------------------------
+def build_search_query(text):
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
+
+# Queries matching more rows than this are listed in id order instead
+# of by relevance: scoring every match of a very broad prefix costs far
+# more than it is worth for type-ahead
+SEARCH_RANK_LIMIT = 1000
+
+# ---------------------------------------------------------
+# Function: search_student_records
+# Ranked full-text search over student names and subjects
+# (SQLite: student_records_fts, kept in sync by triggers in models.py;
+# PostgreSQL: a GIN index on a weighted tsvector)
+# Parameters:
+#   - query (str): free text, prefix-matched word by word
+#   - subject / teacher_id / fields / after / before / page_size:
+#     as in get_student_records_page; cursors page through the
+#     ranking (score, id)
+# Returns:
+#   - Page(rows, next_cursor, prev_cursor), best matches first
+#     (id order when more than SEARCH_RANK_LIMIT records match)
+# ---------------------------------------------------------
+def search_student_records(query, subject=None, teacher_id=None, after=None, before=None,
+                           page_size=DEFAULT_PAGE_SIZE, fields=None, conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    backend = backend_for(conn)
+    match = backend.build_search_query(query)
+    if match is None:
+        _release_connection(conn, owns_conn)
+        return Page([], None, None)
+
+    filters = {}
+    if subject:
+        filters['subject'] = subject
+    if teacher_id is not None:
+        filters['teacher_id'] = teacher_id
+
+    # Matches this search lists (same filters as the page), counted only
+    # one past the limit, so broad queries stay cheap
+    where = " WHERE " + " AND ".join(f"{column} = ?" for column in filters) if filters else ""
+    matches = conn.execute(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {backend.unranked_matches}{where} LIMIT ?) AS counted",
+        (match, *filters.values(), SEARCH_RANK_LIMIT + 1)).fetchone()[0]
+    table, sort_column = ((backend.ranked_matches, 'score') if matches <= SEARCH_RANK_LIMIT
+                          else (backend.unranked_matches, 'id'))
+
+    page = fetch_keyset_page(table, sort_column, filters=filters,
+                             after=after, before=before, page_size=page_size,
+                             columns=_projection(fields, sort_column),
+                             table_params=(match,), conn=conn)
+    _release_connection(conn, owns_conn)
+    return _project_page(page, fields)
+
+# ---------------------------------------------------------
+# Function: get_all_teachers
+# Returns (id, username) for every teacher, used by the dashboard filter
+# ---------------------------------------------------------
+def get_all_teachers(conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    teachers = conn.execute('SELECT id, username FROM teachers ORDER BY username').fetchall()
+    _release_connection(conn, owns_conn)
+    return teachers
+
+# ---------------------------------------------------------
+# Function: iter_student_records
+# Generator over student_records for streaming exports
+# - Reads in batches (fetchmany() on SQLite, a server-side cursor on
+#   PostgreSQL) so memory stays flat for any table size
+# - Parameters:
+#     * teacher_id (int): only this teacher's records (None = all)
+#     * batch_size (int): rows fetched per round trip
+# - Without an explicit conn it opens (and finally closes) its own
+#   connection, since a streamed response outlives the request
+# ---------------------------------------------------------
+EXPORT_COLUMNS = RECORD_COLUMNS
+
+def iter_student_records(teacher_id=None, batch_size=500, conn=None):
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
+    try:
+        sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM student_records"
+        params = ()
+        if teacher_id is not None:
+            sql += " WHERE teacher_id = ?"
+            params = (teacher_id,)
+        yield from backend_for(conn).stream(conn, sql + " ORDER BY id", params, batch_size)
+    finally:
+        if owns_conn:
+            conn.close()
+
+# ---------------------------------------------------------
+# Function: get_distinct_subjects
+# Sorted list of every subject with at least one record
+# (served from idx_student_records_subject)
+# ---------------------------------------------------------
+def get_distinct_subjects(conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    subjects = [row[0] for row in conn.execute(
+        "SELECT DISTINCT subject FROM student_records ORDER BY subject")]
+    _release_connection(conn, owns_conn)
+    return subjects
+
+# ---------------------------------------------------------
+# Summary-table reads (tables and triggers are created in models.py)
+# Each row is returned as a dict with the stored aggregates plus the
+# derived mean and (population) standard deviation:
+#   key, record_count, marks_sum, marks_min, marks_max, marks_sum_sq,
+#   mean, std
+# Cost is O(number of subjects / teachers), not O(records)
+# ---------------------------------------------------------
+def _read_summary(table, column, key=None, conn=None):
+    sql = f"""
+        SELECT {column} AS key, record_count, marks_sum, marks_min, marks_max, marks_sum_sq
+        FROM {table}
+    """
+    params = ()
+    if key is not None:
+        sql += f" WHERE {column} = ?"
+        params = (key,)
+    conn, owns_conn = _acquire_connection(conn)
+    rows = conn.execute(sql + f" ORDER BY {column}", params).fetchall()
+    _release_connection(conn, owns_conn)
+
+    summaries = []
+    for row in rows:
+        summary = dict(row)
+        count = summary['record_count']
+        mean = summary['marks_sum'] / count
+        summary['mean'] = mean
+        # max() guards against tiny negative values from float rounding
+        summary['std'] = math.sqrt(max(summary['marks_sum_sq'] / count - mean * mean, 0.0))
+        summaries.append(summary)
+    return summaries
+
+# Per-subject aggregates; pass subject to read a single row
+def get_subject_summaries(subject=None, conn=None):
+    return _read_summary('subject_summary', 'subject', subject, conn=conn)
+
+# Per-teacher aggregates; pass teacher_id to read a single row
+def get_teacher_summaries(teacher_id=None, conn=None):
+    return _read_summary('teacher_summary', 'teacher_id', teacher_id, conn=conn)
+
+# ---------------------------------------------------------
+# Function: get_student_names_by_ids
+# Returns {id: student_name} for the given record ids (one query)
+# ---------------------------------------------------------
+def get_student_names_by_ids(ids, conn=None):
+    ids = list(ids)
+    if not ids:
+        return {}
+    conn, owns_conn = _acquire_connection(conn)
+    placeholders = ", ".join(["?"] * len(ids))
+    names = dict(conn.execute(
+        f"SELECT id, student_name FROM student_records WHERE id IN ({placeholders})", ids).fetchall())
+    _release_connection(conn, owns_conn)
+    return names
+
+# ---------------------------------------------------------
+# Function: iter_subject_marks
+# Generator of plain (id, marks) tuples for one subject, in fetchmany
+# batches - meant to be fed straight into np.fromiter by analytics.py
+# ---------------------------------------------------------
+def iter_subject_marks(subject, batch_size=5000, conn=None):
+    conn, owns_conn = _acquire_connection(conn)
+    try:
+        # plain=True: tuples, no Row object per record
+        yield from backend_for(conn).stream(conn, "SELECT id, marks FROM student_records WHERE subject = ?",
+                                            (subject,), batch_size, plain=True)
+    finally:
+        _release_connection(conn, owns_conn)
+
 # ---------------------------------------------------------
 # Function: delete_student_record
 # Deletes a student record from the database based on the ID
 # Parameter: record_id (int) - ID of the student to delete
 # ---------------------------------------------------------
 def delete_student_record(record_id, conn=None):
-    own_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        own_conn = True
+    conn, owns_conn = _acquire_connection(conn, write=True)
     cur = conn.cursor()
     cur.execute("DELETE FROM student_records WHERE id=?", (record_id,))
-    conn.commit()
-    if own_conn:
-        conn.close()
+    _release_connection(conn, owns_conn, write=True)
 
 # ---------------------------------------------------------
 # Function: update_student_record
@@ -122,24 +1282,19 @@ def delete_student_record(record_id, conn=None):
 #
 # Steps:
 #   1. Prepare an UPDATE SQL query using parameterized values
-#   2. Execute the query to update the student record by ID   
+#   2. Execute the query to update the student record by ID
 # ---------------------------------------------------------
 def update_student_record(student_id, name, subject, marks, conn=None):
-    own_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        own_conn = True
-    cur = conn.cursor()    
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    cur = conn.cursor()
 
     cur.execute("""
-        UPDATE student_records 
-        SET student_name = ?, subject = ?, marks = ? 
+        UPDATE student_records
+        SET student_name = ?, subject = ?, marks = ?
         WHERE id = ?
     """, (name, subject, marks, student_id))
 
-    conn.commit()  
-    if own_conn:
-        conn.close()   
+    _release_connection(conn, owns_conn, write=True)
 
 # ---------------------------------------------------------
 # Function: find_duplicate_record
@@ -152,26 +1307,154 @@ def update_student_record(student_id, name, subject, marks, conn=None):
 #   - Matching record (sqlite3.Row) if found, else None
 # ---------------------------------------------------------
 def find_duplicate_record(student_name, subject, conn=None):
-    own_conn = False
-    if conn is None:
-        conn = get_db_connection()
-        own_conn = True
+    conn, owns_conn = _acquire_connection(conn)
     cur = conn.cursor()
     cur.execute("""
         SELECT * FROM student_records
         WHERE LOWER(student_name) = LOWER(?) AND LOWER(subject) = LOWER(?)
     """, (student_name, subject))
     row = cur.fetchone()
-    if own_conn:
-        conn.close()
+    _release_connection(conn, owns_conn)
     return row
 
-def log_update_message_for_records(log_msg):
-    conn = get_db_connection()
-    cur = conn.cursor()
+# ---------------------------------------------------------
+# Bulk edit / delete helpers
+# Set-based counterparts of the single-record helpers above, used by
+# the dashboard's multi-select actions inside one unit_of_work()
+# ---------------------------------------------------------
+
+# Returns {id: sqlite3.Row} for the given record ids that exist
+def fetch_student_records_by_ids(ids, conn=None):
+    ids = list(ids)
+    conn, owns_conn = _acquire_connection(conn)
+    records = {}
+    for start in range(0, len(ids), _KEY_LOOKUP_CHUNK):
+        chunk = ids[start:start + _KEY_LOOKUP_CHUNK]
+        placeholders = ", ".join(["?"] * len(chunk))
+        for row in conn.execute(f"SELECT * FROM student_records WHERE id IN ({placeholders})", chunk):
+            records[row['id']] = row
+    _release_connection(conn, owns_conn)
+    return records
+
+# ---------------------------------------------------------
+# Function: find_duplicate_records_many
+# Duplicate check for many edits at once
+# - Parameters: edits - iterable of (record_id, student_name, subject)
+# - Each edit is an index seek on unique_student_subject
+# Returns:
+#   - list of (record_id, conflicting_id) for edits whose new
+#     name/subject already belongs to a different record
+# ---------------------------------------------------------
+def find_duplicate_records_many(edits, conn=None):
+    edits = [(record_id,) + record_key(name, subject) for record_id, name, subject in edits]
+    conn, owns_conn = _acquire_connection(conn)
+    conflicts = []
+    for start in range(0, len(edits), _KEY_LOOKUP_CHUNK):
+        chunk = edits[start:start + _KEY_LOOKUP_CHUNK]
+        values = ", ".join(["(?, ?, ?)"] * len(chunk))
+        params = [part for edit in chunk for part in edit]
+        conflicts.extend(tuple(row) for row in conn.execute(f"""
+            WITH e(id, name_key, subject_key) AS (VALUES {values})
+            SELECT e.id, r.id
+            FROM e {backend_for(conn).join_in_order} student_records r
+              ON LOWER(r.student_name) = e.name_key AND LOWER(r.subject) = e.subject_key
+            WHERE r.id != e.id
+        """, params))
+    _release_connection(conn, owns_conn)
+    return conflicts
+
+# Updates many records with executemany; rows are (id, name, subject, marks)
+def update_student_records_many(rows, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    conn.executemany("""
+        UPDATE student_records
+        SET student_name = ?, subject = ?, marks = ?
+        WHERE id = ?
+    """, [(name, subject, marks, record_id) for record_id, name, subject, marks in rows])
+    _release_connection(conn, owns_conn, write=True)
+
+# Deletes many records with executemany
+def delete_student_records_many(record_ids, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    conn.executemany("DELETE FROM student_records WHERE id = ?", [(record_id,) for record_id in record_ids])
+    _release_connection(conn, owns_conn, write=True)
+
+# ---------------------------------------------------------
+# Audit log
+# One row per change to a student record (see models.create_audit_log_table)
+# Entries are built with audit_entry() and written in batches by
+# insert_audit_entries(), usually from the background LogWriter.
+# Old entries are moved to archive files by audit_archive.py.
+# ---------------------------------------------------------
+AUDIT_COLUMNS = ('ts', 'teacher_id', 'record_id', 'action', 'student_name', 'subject',
+                 'old_marks', 'new_marks', 'detail')
+
+AuditEntry = namedtuple('AuditEntry', AUDIT_COLUMNS)
+
+# Builds an AuditEntry stamped with the current time (unless ts is given)
+def audit_entry(action, teacher_id, record_id=None, student_name=None, subject=None,
+                old_marks=None, new_marks=None, detail=None, ts=None):
+    return AuditEntry(time.time() if ts is None else ts, teacher_id, record_id, action,
+                      student_name, subject, old_marks, new_marks, detail)
+
+# ---------------------------------------------------------
+# Function: insert_audit_entries
+# Appends many AuditEntry rows with one executemany and (outside a
+# unit of work) a single commit
+# ---------------------------------------------------------
+def insert_audit_entries(entries, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    conn.executemany(f"""
+        INSERT INTO audit_log ({', '.join(AUDIT_COLUMNS)})
+        VALUES ({', '.join('?' * len(AUDIT_COLUMNS))})
+    """, [tuple(entry) for entry in entries])
+    _release_connection(conn, owns_conn, write=True)
+
+# ---------------------------------------------------------
+# Function: get_audit_history
+# One page of audit entries, newest first
+# - record_id: a record's history, read off the (record_id, ts) index
+# - teacher_id: a teacher's activity, off the (teacher_id, ts) index
+# - Always reads the primary: the read replica only refreshes for
+#   student_records/teachers changes, so it may lack recent entries
+# Pass conn= to read an archive file instead (see audit_archive.py)
+# Returns Page(rows, next_cursor, prev_cursor), cursors as in
+# fetch_keyset_page (next = older entries)
+# ---------------------------------------------------------
+def get_audit_history(record_id=None, teacher_id=None, after=None, before=None,
+                      page_size=DEFAULT_PAGE_SIZE, conn=None):
+    filters = {}
+    if record_id is not None:
+        filters['record_id'] = record_id
+    if teacher_id is not None:
+        filters['teacher_id'] = teacher_id
+    return fetch_keyset_page('audit_log', 'ts', filters=filters, after=after, before=before,
+                             page_size=page_size, descending=True, replica=False, conn=conn)
+
+# ---------------------------------------------------------
+# Rotation helpers (used by audit_archive.AuditArchiver)
+# Rotation always moves the oldest entries by id, so "everything up
+# to id N" describes exactly the rows that were archived
+# ---------------------------------------------------------
+
+# The oldest `limit` entries, in id order
+def get_oldest_audit_entries(limit, conn=None):
+    conn, owns_conn = _acquire_connection(conn, replica=False)
+    rows = conn.execute(f"SELECT id, {', '.join(AUDIT_COLUMNS)} FROM audit_log ORDER BY id LIMIT ?",
+                        (int(limit),)).fetchall()
+    _release_connection(conn, owns_conn)
+    return rows
 
-    cur.execute('INSERT INTO logs (log_msg) VALUES (?)', [log_msg])
+# Number of entries still in the main database
+def count_audit_entries(conn=None):
+    conn, owns_conn = _acquire_connection(conn, replica=False)
+    count = conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
+    _release_connection(conn, owns_conn)
+    return count
 
-    conn.commit()
-    conn.close()
-    return log_msg
+# Deletes every entry with id <= last_id; returns the number deleted
+def delete_audit_entries_through(last_id, conn=None):
+    conn, owns_conn = _acquire_connection(conn, write=True)
+    deleted = conn.execute("DELETE FROM audit_log WHERE id <= ?", (last_id,)).rowcount
+    _release_connection(conn, owns_conn, write=True)
+    return deleted
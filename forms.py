@@ -7,6 +7,23 @@ from wtforms import StringField, PasswordField, SubmitField, IntegerField
 # Import validators to enforce field requirements
 from wtforms.validators import DataRequired, NumberRange, Length, Regexp
 
+# File upload field and validators for the roster import
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+
+import re
+
+# ---------------------------------------------
+# Student record rules
+# Shared by StudentForm and validate_student_row() so the
+# add form and the bulk import accept exactly the same data
+# ---------------------------------------------
+NAME_MIN_LENGTH = 2
+NAME_PATTERN = r'^[A-Za-z\s]+$'
+NAME_PATTERN_MESSAGE = "Name must contain only letters"
+MARKS_MIN = 0
+MARKS_MAX = 100
+MARKS_RANGE_MESSAGE = "Marks must be a positive number between 0-100"
+
 # ---------------------------------------------
 # LoginForm: Used to handle teacher login input
 # Includes CSRF protection automatically via FlaskForm
@@ -44,8 +61,8 @@ class StudentForm(FlaskForm):
         'Name',
         validators=[
             DataRequired(),  # Ensures the field is not left empty
-            Length(min=2),   # Requires at least 2 characters
-            Regexp(r'^[A-Za-z\s]+$', message="Name must contain only letters")  # Enforces letters and spaces only
+            Length(min=NAME_MIN_LENGTH),   # Requires at least 2 characters
+            Regexp(NAME_PATTERN, message=NAME_PATTERN_MESSAGE)  # Enforces letters and spaces only
         ]
     )
 
@@ -60,9 +77,67 @@ class StudentForm(FlaskForm):
         'Marks',
         validators=[
             DataRequired(),  # Ensures the field is not left empty
-            NumberRange(min=0, max=100, message="Marks must be a positive number between 0-100")  # Validates range
+            NumberRange(min=MARKS_MIN, max=MARKS_MAX, message=MARKS_RANGE_MESSAGE)  # Validates range
         ]
     )
 
     # Submit button for the form
     submit = SubmitField("Add Record")
+
+# ---------------------------------------------------------
+# ImportForm: CSV upload for bulk-adding student records
+# - File must be present and have a .csv extension
+# - CSRF token is automatically included for security
+# ---------------------------------------------------------
+class ImportForm(FlaskForm):
+    # CSV file with student_name, subject and marks columns
+    roster = FileField(
+        'Roster CSV',
+        validators=[
+            FileRequired(),                                # A file must be uploaded
+            FileAllowed(['csv'], "Only .csv files are allowed")  # Extension check
+        ]
+    )
+
+    # Submit button for the form
+    submit = SubmitField("Import")
+
+# ---------------------------------------------------------
+# validate_student_row:
+# Applies the StudentForm rules to one raw row without the
+# per-instance cost of a form (used by the bulk CSV import)
+# - Parameters: raw student_name, subject and marks strings
+# - Returns:
+#     * (cleaned_row, []) when valid - row is (name, subject, marks)
+#     * (None, errors) otherwise - errors read like the form's flashes
+# ---------------------------------------------------------
+_name_re = re.compile(NAME_PATTERN)
+
+def validate_student_row(student_name, subject, marks):
+    errors = []
+    student_name = student_name or ''
+    subject = subject or ''
+
+    if not student_name.strip():
+        errors.append("Name: This field is required.")
+    elif len(student_name) < NAME_MIN_LENGTH:
+        errors.append(f"Name: Field must be at least {NAME_MIN_LENGTH} characters long.")
+    elif not _name_re.match(student_name):
+        errors.append(f"Name: {NAME_PATTERN_MESSAGE}")
+
+    if not subject.strip():
+        errors.append("Subject: This field is required.")
+
+    try:
+        marks = int((marks or '').strip())
+    except ValueError:
+        errors.append("Marks: Not a valid integer value.")
+    else:
+        if not marks:
+            errors.append("Marks: This field is required.")
+        elif not MARKS_MIN <= marks <= MARKS_MAX:
+            errors.append(f"Marks: {MARKS_RANGE_MESSAGE}")
+
+    if errors:
+        return None, errors
+    return (student_name.strip(), subject.strip(), marks), []
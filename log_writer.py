@@ -0,0 +1,168 @@
+import atexit     # Flush pending entries when the process exits
+import logging    # Report write failures without crashing the worker
+import queue      # Bounded hand-off between request threads and the worker
+import sqlite3    # Archive file errors during rotation
+import threading  # Background worker thread
+import time       # Flush deadlines
+
+from db import get_db_connection, insert_audit_entries, backend_for
+
+logger = logging.getLogger(__name__)
+
+# Sentinel placed on the queue to tell the worker to finish
+_STOP = object()
+
+
+# ---------------------------------------------------------
+# Class: LogWriter
+# Background writer for the audit log
+# - Request threads call enqueue() with a db.AuditEntry, which only
+#   puts it on a bounded in-process queue (no DB work, no fsync in
+#   the request)
+# - A single worker thread drains the queue into the audit_log table
+#   with group commits: one transaction per batch
+# - A batch is written once it holds batch_size entries or
+#   flush_interval seconds after its first entry, whichever is first
+# - When the queue is full, enqueue() waits up to put_timeout seconds
+#   (counted as backpressured); if still full the entry is dropped
+#   (counted as dropped)
+# - rotate: optional callable(conn), e.g. AuditArchiver.rotate, run by
+#   the worker after a write at most every rotate_interval seconds,
+#   so old entries are archived off the request path
+# - stop() (also registered with atexit) drains and writes everything
+#   still queued before the worker exits
+# ---------------------------------------------------------
+class LogWriter:
+    def __init__(self, connect=get_db_connection, max_queue=10000, batch_size=200,
+                 flush_interval=0.5, put_timeout=0.05, rotate=None, rotate_interval=3600.0):
+        self._connect = connect
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.rotate = rotate
+        self.rotate_interval = rotate_interval
+        self._next_rotation = 0.0  # First write of the process checks right away
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._atexit_registered = False
+        self._counters = {'written': 0, 'dropped': 0, 'backpressured': 0, 'failed': 0, 'archived': 0}
+
+    # Starts the worker thread on first use (safe to call repeatedly)
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    # Queues one entry; returns False if it had to be dropped
+    def enqueue(self, entry):
+        self.start()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self._count('backpressured')
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self._count('dropped')
+            return False
+
+    # Blocks until every entry queued so far has been written (or failed)
+    def flush(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    # Writes what is left, then stops the worker
+    def stop(self, timeout=5.0):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # Snapshot of the counters plus the current queue depth
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    # Worker loop: wait for a first entry, gather a batch, write it
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping or not self._queue.empty():
+                first = self._queue.get()
+                batch = []
+                if first is _STOP:
+                    stopping = True
+                else:
+                    batch.append(first)
+
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        if stopping:
+                            # Once stopping, only drain what is already queued
+                            item = self._queue.get_nowait()
+                        else:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                break
+                            item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        self._queue.task_done()
+                        continue
+                    batch.append(item)
+
+                self._write(conn, batch)
+                if batch:
+                    self._maybe_rotate(conn)
+                for _ in range(len(batch) + (first is _STOP)):
+                    self._queue.task_done()
+        finally:
+            conn.close()
+
+    # One transaction (one commit) per batch
+    def _write(self, conn, batch):
+        if not batch:
+            return
+        try:
+            insert_audit_entries(batch, conn=conn)
+            self._count('written', len(batch))
+        except backend_for(conn).Error:  # sqlite3.Error / psycopg.Error
+            conn.rollback()
+            self._count('failed', len(batch))
+            logger.exception("Failed to write %d audit log entries", len(batch))
+
+    # Runs the rotate hook when it is due; a failed rotation is logged
+    # and retried at the next interval (nothing is lost: see audit_archive.py)
+    def _maybe_rotate(self, conn):
+        if self.rotate is None or time.monotonic() < self._next_rotation:
+            return
+        self._next_rotation = time.monotonic() + self.rotate_interval
+        try:
+            self._count('archived', self.rotate(conn))
+        except (backend_for(conn).Error, sqlite3.Error, OSError):
+            logger.exception("Audit log rotation failed")
+        finally:
+            if conn.in_transaction:
+                conn.rollback()  # Don't hold a read snapshot until the next batch
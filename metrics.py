@@ -0,0 +1,207 @@
+import bisect     # Bucket lookup for histograms
+import logging    # Slow-query log
+import threading  # Guards metric updates from concurrent requests
+
+from flask import g, has_app_context  # Per-request SQL time accumulation
+
+slow_query_logger = logging.getLogger('class_ledger.slow_queries')
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ---------------------------------------------
+# Settings shared by the instrumentation
+# - enabled: collect metrics and trace SQL (off = no hooks at all)
+# - slow_query_seconds: statements at least this slow are logged
+#   (None = no slow-query log)
+# Set through configure(), normally from app.py
+# ---------------------------------------------
+class _Settings:
+    enabled = False
+    slow_query_seconds = None
+
+settings = _Settings()
+
+def configure(enabled=False, slow_query_ms=None):
+    settings.enabled = enabled
+    settings.slow_query_seconds = slow_query_ms / 1000.0 if slow_query_ms else None
+
+# True when SQL statements need to be timed (metrics or slow-query log)
+def sql_tracing_enabled():
+    return settings.enabled or settings.slow_query_seconds is not None
+
+
+# ---------------------------------------------------------
+# Metric types (Prometheus text exposition format)
+# Each metric keeps one series per tuple of label values
+# ---------------------------------------------------------
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield (self.name + '_bucket',
+                       _format_labels(self.labelnames, labels, [('le', le)]), cumulative)
+            yield self.name + '_sum', _format_labels(self.labelnames, labels), series[-1]
+            yield self.name + '_count', _format_labels(self.labelnames, labels), cumulative
+
+
+# Values read from elsewhere at scrape time, e.g. LogWriter.stats()
+# fn() returns a number, or a dict of label-values tuple -> number
+class CallbackMetric:
+    def __init__(self, name, help_text, fn, kind='gauge', labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+# ---------------------------------------------
+# Class: MetricsRegistry
+# Holds every metric and renders them for /metrics
+# ---------------------------------------------
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, fn, kind='gauge', labelnames=()):
+        return self.register(CallbackMetric(name, help_text, fn, kind, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    'ledger_http_request_duration_seconds', 'Time spent handling HTTP requests.',
+    ('method', 'endpoint', 'status'))
+http_request_sql_seconds = registry.histogram(
+    'ledger_http_request_sql_seconds', 'Time spent in SQL statements per HTTP request.',
+    ('endpoint',))
+template_render_seconds = registry.histogram(
+    'ledger_template_render_seconds', 'Time spent rendering Jinja templates.', ('template',))
+password_verify_seconds = registry.histogram(
+    'ledger_password_verify_seconds', 'Time spent verifying login passwords.')
+sql_statement_seconds = registry.histogram(
+    'ledger_sql_statement_duration_seconds',
+    'Time spent executing SQL statements and fetching their rows.', ('statement',))
+sql_rows_returned = registry.counter(
+    'ledger_sql_rows_returned_total', 'Rows fetched from SQL statements.', ('statement',))
+sql_slow_queries = registry.counter(
+    'ledger_sql_slow_queries_total', 'SQL statements slower than the slow-query threshold.')
+replica_refresh_seconds = registry.histogram(
+    'ledger_replica_refresh_duration_seconds', 'Time spent copying the database into the read replica.')
+sql_write_lock_retries = registry.counter(
+    'ledger_sql_write_lock_retries_total', 'BEGIN IMMEDIATE retries after the busy timeout expired.')
+
+
+# ---------------------------------------------------------
+# Function: record_sql
+# Called once per finished statement by db.TracedCursor
+# - statement label is the leading keyword (select, insert, ...)
+#   so the number of series stays small
+# - time also counts towards the current request's SQL total
+# ---------------------------------------------------------
+def record_sql(sql, seconds, rows):
+    statement = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else 'empty'
+
+    if settings.enabled:
+        sql_statement_seconds.observe(seconds, statement)
+        if rows:
+            sql_rows_returned.inc(statement, amount=rows)
+        if has_app_context():
+            g.sql_seconds = g.get('sql_seconds', 0.0) + seconds
+
+    threshold = settings.slow_query_seconds
+    if threshold is not None and seconds >= threshold:
+        sql_slow_queries.inc()
+        slow_query_logger.warning("Slow query (%.1f ms, %d rows): %s",
+                                  seconds * 1000.0, rows, ' '.join(sql.split())[:500])
@@ -1,28 +1,33 @@
 import sqlite3  # SQLite module to interact with the database
 import os       # For accessing environment variables
+import argparse # Command-line options (e.g. --rebuild-summaries)
+import re       # Parsing legacy audit log messages
+import threading  # Optional background index builds
+import time     # Timestamps for migrated audit entries
 from dotenv import load_dotenv  # To load variables from a .env file
 from werkzeug.security import generate_password_hash  # To securely hash passwords
 
 # Load environment variables from .env file
 load_dotenv()
 
-# ---------------------------------------------
-# Function: create_tables
-# - Creates required tables if they don't exist
-# - Inserts default teacher with hashed password
-# ---------------------------------------------
-def create_tables():
-    # Get teacher credentials from environment variables
-    teacher_username = os.environ.get('TEACHER_USERNAME')
-    teacher_password = os.environ.get('TEACHER_PASSWORD')
+# Database file used by the app (see db.get_db_connection); DATABASE_PATH
+# points both at another file, or at a 'file:' URI
+DB_PATH = os.environ.get('DATABASE_PATH') or 'class-ledger.db'
 
-    teacher_username2 = os.environ.get('TEACHER_USERNAME2')
-    teacher_password2 = os.environ.get('TEACHER_PASSWORD2')
+# Connection for schema work (a 'file:' path is opened as a URI; an
+# in-memory database only lives while the caller keeps a connection open)
+def _connect(db_path):
+    return sqlite3.connect(db_path, uri=str(db_path).startswith('file:'), timeout=30)
 
-    # Connect to SQLite database (creates file if it doesn't exist)
-    conn = sqlite3.connect('class-ledger.db')
-    cur = conn.cursor()
 
+# ---------------------------------------------
+# Schema migrations
+# Ordered (version, description, step) entries; PRAGMA user_version
+# records the last one applied. Steps use IF NOT EXISTS so databases
+# created before versioning (user_version 0) upgrade cleanly.
+# Append new steps at the end - never edit or reorder applied ones.
+# ---------------------------------------------
+def _create_base_tables(cur):
     # Create 'teachers' table if it doesn't already exist
     cur.execute('''
         CREATE TABLE IF NOT EXISTS teachers (
@@ -44,6 +49,7 @@ def create_tables():
     ''')
 
     # Add unique index on student_name + subject (case-insensitive)
+    # Part of the schema, not a deferrable index: upserts rely on it
     cur.execute("""
         CREATE UNIQUE INDEX IF NOT EXISTS unique_student_subject
         ON student_records (LOWER(student_name), LOWER(subject));
@@ -54,26 +60,389 @@ def create_tables():
                 log_msg TEXT NOT NULL
                 )''')
 
+# Change counters: one row per table, bumped by triggers on every write
+# Readers compare versions (one tiny query) to detect changes, e.g. for ETags
+def _create_data_versions(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in ('student_records', 'teachers'):
+        cur.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            ''')
+
+# Summary tables: per-subject and per-teacher aggregates kept up to
+# date by triggers, so dashboards read O(#groups) rows instead of
+# aggregating the whole of student_records
+def _create_summaries(cur):
+    create_summary_tables(cur)
+    rebuild_summaries(cur)  # Backfill from existing records
+
+# Full-text index over names and subjects for the dashboard search
+def _create_search(cur):
+    create_search_index(cur)
+    rebuild_search_index(cur)  # Index existing records
+
+# Structured audit log replacing the free-text logs table
+# Legacy "<teacher id> <verb> <student name>" messages are carried over
+# (stamped with the migration time, since they never had one), then
+# logs is dropped; step 1 still creates it on new databases
+def _create_audit_log(cur):
+    create_audit_log_table(cur)
+    if cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs'").fetchone():
+        now = time.time()
+        legacy = [(now,) + parse_legacy_log_msg(log_msg) + (log_msg,)
+                  for log_msg, in cur.execute('SELECT log_msg FROM logs ORDER BY id').fetchall()]
+        cur.executemany('''
+            INSERT INTO audit_log (ts, teacher_id, action, student_name, detail)
+            VALUES (?, ?, ?, ?, ?)
+        ''', legacy)
+        cur.execute('DROP TABLE logs')
+
+MIGRATIONS = (
+    (1, 'teachers, student_records and logs tables', _create_base_tables),
+    (2, 'data version counters', _create_data_versions),
+    (3, 'subject and teacher summary tables', _create_summaries),
+    (4, 'full-text search index', _create_search),
+    (5, 'structured audit log', _create_audit_log),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------------------------------------
+# Secondary indexes (name, table, columns)
+# Kept apart from the migrations: they only speed up reads, so on a
+# large existing table they can be built after startup (in the
+# background) instead of holding up the app. Add new ones here.
+# ---------------------------------------------
+INDEXES = (
+    # Dashboard keyset pagination: each index also carries the rowid,
+    # so (column, id) ordering is a plain range scan
+    ('idx_student_records_name', 'student_records', 'student_name'),
+    ('idx_student_records_subject', 'student_records', 'subject'),
+    ('idx_student_records_marks', 'student_records', 'marks'),
+    ('idx_student_records_teacher', 'student_records', 'teacher_id'),
+    # "My records" views: a teacher's page, sorted by name or marks and
+    # optionally filtered by subject, is one range scan already in order
+    ('idx_student_records_teacher_subject_name', 'student_records', 'teacher_id, subject, student_name'),
+    ('idx_student_records_teacher_name', 'student_records', 'teacher_id, student_name'),
+    ('idx_student_records_teacher_marks', 'student_records', 'teacher_id, marks'),
+)
+
+# Names of INDEXES entries that don't exist yet
+def missing_indexes(conn):
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return [name for name, _, _ in INDEXES if name not in existing]
 
-    # Hash the teacher's password securely using Werkzeug
-    hashed_password = generate_password_hash(teacher_password)
-    hashed_password2 = generate_password_hash(teacher_password2)
+# ---------------------------------------------
+# Function: create_indexes
+# - Builds the missing INDEXES, each in its own short transaction so
+#   other connections can write between builds
+# - Returns the names of the indexes it created
+# ---------------------------------------------
+def create_indexes(db_path=DB_PATH):
+    conn = _connect(db_path)
+    created = []
+    for name, table, columns in INDEXES:
+        if name in missing_indexes(conn):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            conn.commit()
+            created.append(name)
+    conn.close()
+    return created
+
+# Runs create_indexes() on a daemon thread; returns the thread
+def create_indexes_in_background(db_path=DB_PATH):
+    thread = threading.Thread(target=create_indexes, args=(db_path,), name='index-builder', daemon=True)
+    thread.start()
+    return thread
+
+
+# ---------------------------------------------
+# Function: seed_teachers
+# - Inserts the teachers configured in the environment
+#   (TEACHER_USERNAME/TEACHER_PASSWORD, ..._2) that don't exist yet
+# - Passwords are hashed (deliberately slow) only for missing rows
+# ---------------------------------------------
+def configured_teachers():
+    teachers = []
+    for suffix in ('', '2'):
+        username = os.environ.get(f'TEACHER_USERNAME{suffix}')
+        password = os.environ.get(f'TEACHER_PASSWORD{suffix}')
+        if username and password:
+            teachers.append((username, password))
+    return teachers
+
+def seed_teachers(conn):
+    for username, password in configured_teachers():
+        if conn.execute('SELECT 1 FROM teachers WHERE username = ?', (username,)).fetchone() is None:
+            # Hash the teacher's password securely using Werkzeug
+            # ON CONFLICT DO NOTHING (not INSERT OR IGNORE): also valid on PostgreSQL
+            conn.execute('INSERT INTO teachers (username, password) VALUES (?, ?) ON CONFLICT (username) DO NOTHING',
+                         (username, generate_password_hash(password)))
 
-    # Insert default teacher into the teachers table
-    # 'INSERT OR IGNORE' ensures it won't add duplicate if username already exists
-    cur.execute(
-        'INSERT OR IGNORE INTO teachers (username, password) VALUES (?, ?)',
-        (teacher_username, hashed_password)
-    )
 
-    cur.execute('INSERT OR IGNORE INTO teachers (username, password) VALUES (?,?)', (teacher_username2, hashed_password2))
+# ---------------------------------------------
+# Function: migrate
+# - Applies the pending MIGRATIONS in order, each in its own
+#   transaction together with its user_version bump
+# - Seeds missing teachers, then builds missing INDEXES unless
+#   defer_indexes is set (the caller then runs create_indexes later)
+# - When everything is current this is one status query plus the
+#   teacher lookup; nothing is written and nothing is hashed
+# Returns the versions applied
+# ---------------------------------------------
+def migrate(db_path=DB_PATH, defer_indexes=False):
+    conn = _connect(db_path)
+    conn.isolation_level = None  # Transactions are explicit below
+
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    applied = []
+    for step_version, _, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        try:
+            step(cur)
+            cur.execute(f'PRAGMA user_version = {int(step_version)}')
+            cur.execute('COMMIT')
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+        applied.append(step_version)
 
-    # Commit changes and close the connection
-    conn.commit()
+    conn.execute('BEGIN')
+    seed_teachers(conn)
+    conn.execute('COMMIT')
     conn.close()
 
+    if not defer_indexes:
+        create_indexes(db_path)
+    return applied
+
 # ---------------------------------------------
-# Run create_tables() when this script is run directly
+# Function: create_tables
+# - Brings the database up to date (see migrate) and builds any
+#   missing indexes right away
+# ---------------------------------------------
+def create_tables(db_path=DB_PATH):
+    migrate(db_path)
+
+# ---------------------------------------------
+# Summary tables: (summary table, student_records column it groups by)
+# ---------------------------------------------
+SUMMARY_TABLES = (
+    ('subject_summary', 'subject'),
+    ('teacher_summary', 'teacher_id'),
+)
+
+# ---------------------------------------------
+# Function: create_summary_tables
+# - Creates subject_summary and teacher_summary with count, sum,
+#   min, max and sum of squares of marks per group
+# - Creates the triggers that maintain them incrementally:
+#     * INSERT adds the new row to its group (upsert)
+#     * DELETE subtracts the old row; min/max are only recomputed
+#       (from the remaining rows of that group) when the deleted
+#       mark was the group's extreme; empty groups are removed
+#     * UPDATE does both, so moves between groups are handled
+# ---------------------------------------------
+def create_summary_tables(cur):
+    for table, column in SUMMARY_TABLES:
+        key_type = 'TEXT' if column == 'subject' else 'INTEGER'
+        cur.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {column} {key_type} PRIMARY KEY,
+                record_count INTEGER NOT NULL,
+                marks_sum INTEGER NOT NULL,
+                marks_min INTEGER,
+                marks_max INTEGER,
+                marks_sum_sq INTEGER NOT NULL
+            )
+        ''')
+
+        add_new = f'''
+            INSERT INTO {table} ({column}, record_count, marks_sum, marks_min, marks_max, marks_sum_sq)
+            VALUES (NEW.{column}, 1, NEW.marks, NEW.marks, NEW.marks, NEW.marks * NEW.marks)
+            ON CONFLICT ({column}) DO UPDATE SET
+                record_count = record_count + 1,
+                marks_sum = marks_sum + excluded.marks_sum,
+                marks_min = MIN(marks_min, excluded.marks_min),
+                marks_max = MAX(marks_max, excluded.marks_max),
+                marks_sum_sq = marks_sum_sq + excluded.marks_sum_sq;
+        '''
+        remove_old = f'''
+            UPDATE {table} SET
+                record_count = record_count - 1,
+                marks_sum = marks_sum - OLD.marks,
+                marks_sum_sq = marks_sum_sq - OLD.marks * OLD.marks,
+                marks_min = CASE WHEN OLD.marks > marks_min THEN marks_min
+                    ELSE (SELECT MIN(marks) FROM student_records WHERE {column} = OLD.{column}) END,
+                marks_max = CASE WHEN OLD.marks < marks_max THEN marks_max
+                    ELSE (SELECT MAX(marks) FROM student_records WHERE {column} = OLD.{column}) END
+            WHERE {column} = OLD.{column};
+            DELETE FROM {table} WHERE {column} = OLD.{column} AND record_count <= 0;
+        '''
+
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_insert AFTER INSERT ON student_records
+            BEGIN {add_new} END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_delete AFTER DELETE ON student_records
+            BEGIN {remove_old} END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_update
+            AFTER UPDATE OF {column}, marks ON student_records
+            BEGIN {remove_old} {add_new} END
+        ''')
+
+# ---------------------------------------------
+# Function: rebuild_summaries
+# - Recomputes every summary table from student_records in one
+#   GROUP BY pass (backfill, or repair after manual edits)
+# ---------------------------------------------
+def rebuild_summaries(cur):
+    for table, column in SUMMARY_TABLES:
+        cur.execute(f"DELETE FROM {table}")
+        cur.execute(f'''
+            INSERT INTO {table} ({column}, record_count, marks_sum, marks_min, marks_max, marks_sum_sq)
+            SELECT {column}, COUNT(*), SUM(marks), MIN(marks), MAX(marks), SUM(marks * marks)
+            FROM student_records
+            GROUP BY {column}
+        ''')
+
+# ---------------------------------------------
+# Function: create_search_index
+# - Creates student_records_fts, an FTS5 index over student_name
+#   and subject that stores no text of its own (external content:
+#   rows are read back from student_records by id)
+# - prefix='2 3' keeps short type-ahead prefixes to one index lookup
+# - Triggers mirror every insert, delete and name/subject update
+# ---------------------------------------------
+def create_search_index(cur):
+    cur.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS student_records_fts USING fts5(
+            student_name, subject,
+            content='student_records', content_rowid='id',
+            tokenize='unicode61', prefix='2 3'
+        )
+    ''')
+
+    add_new = '''
+        INSERT INTO student_records_fts (rowid, student_name, subject)
+        VALUES (NEW.id, NEW.student_name, NEW.subject);
+    '''
+    remove_old = '''
+        INSERT INTO student_records_fts (student_records_fts, rowid, student_name, subject)
+        VALUES ('delete', OLD.id, OLD.student_name, OLD.subject);
+    '''
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_records_fts_insert AFTER INSERT ON student_records
+        BEGIN {add_new} END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_records_fts_delete AFTER DELETE ON student_records
+        BEGIN {remove_old} END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS student_records_fts_update
+        AFTER UPDATE OF student_name, subject ON student_records
+        BEGIN {remove_old} {add_new} END
+    ''')
+
+# ---------------------------------------------
+# Function: rebuild_search_index
+# - Re-indexes every student record (backfill, or repair)
+# ---------------------------------------------
+def rebuild_search_index(cur):
+    cur.execute("INSERT INTO student_records_fts (student_records_fts) VALUES ('rebuild')")
+
+# ---------------------------------------------
+# Function: create_audit_log_table
+# - Creates audit_log: one row per change to a student record, with
+#   the time (epoch seconds), acting teacher, record, action and the
+#   marks before/after
+# - Indexed by (record_id, ts) for per-record history and by
+#   (teacher_id, ts) for per-teacher activity; created with the table
+#   (it starts empty), not deferred like INDEXES
+# - Also creates the same table in archive files (audit_archive.py)
+# ---------------------------------------------
+def create_audit_log_table(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            teacher_id INTEGER,
+            record_id INTEGER,
+            action TEXT NOT NULL,   -- create, merge, update, delete or legacy
+            student_name TEXT,
+            subject TEXT,
+            old_marks INTEGER,
+            new_marks INTEGER,
+            detail TEXT
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_record_ts ON audit_log (record_id, ts)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_teacher_ts ON audit_log (teacher_id, ts)")
+
+# Splits a legacy log message ("3 updated John Smith") into
+# (teacher_id, action, student_name); other text becomes
+# (None, 'legacy', None)
+_LEGACY_LOG_MSG = re.compile(r'^(\d+) (updated|deleted) (.+)$')
+
+def parse_legacy_log_msg(log_msg):
+    match = _LEGACY_LOG_MSG.match(log_msg)
+    if match is None:
+        return None, 'legacy', None
+    teacher_id, verb, student_name = match.groups()
+    return int(teacher_id), {'updated': 'update', 'deleted': 'delete'}[verb], student_name
+
+# ---------------------------------------------
+# Run the migrations when this script is run directly
+# python models.py --defer-indexes skips the secondary index builds
+#   (run python models.py again later, or let app.py build them)
+# python models.py --rebuild-summaries also recomputes the summary tables
+# python models.py --rebuild-search also re-indexes the full-text search
+# STORAGE_BACKEND=postgres DATABASE_URL=... python models.py creates the
+#   PostgreSQL schema instead (see postgres_backend.py)
 # ---------------------------------------------
 if __name__ == '__main__':
-    create_tables()
+    parser = argparse.ArgumentParser(description="Create or upgrade the Class Ledger database.")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="Apply schema migrations only; build secondary indexes later")
+    parser.add_argument('--rebuild-summaries', action='store_true',
+                        help="Recompute subject/teacher summary tables from student_records")
+    parser.add_argument('--rebuild-search', action='store_true',
+                        help="Re-index student names and subjects for full-text search")
+    args = parser.parse_args()
+
+    if os.environ.get('STORAGE_BACKEND', 'sqlite') == 'postgres':
+        import postgres_backend
+        postgres_backend.create_schema(os.environ.get('DATABASE_URL'))
+        print("PostgreSQL schema is up to date")
+        raise SystemExit(0)
+
+    applied = migrate(defer_indexes=args.defer_indexes)
+    print(f"Schema version {SCHEMA_VERSION}" + (f" (applied {applied})" if applied else " (up to date)"))
+
+    if args.rebuild_summaries or args.rebuild_search:
+        conn = _connect(DB_PATH)
+        if args.rebuild_summaries:
+            rebuild_summaries(conn.cursor())
+        if args.rebuild_search:
+            rebuild_search_index(conn.cursor())
+        conn.commit()
+        conn.close()
@@ -0,0 +1,350 @@
+import functools  # Caches placeholder translation per SQL string
+import itertools  # Unique names for server-side cursors
+import re         # Word splitting for full-text search queries
+
+import psycopg                                  # PostgreSQL driver (psycopg 3)
+from psycopg import pq                          # Transaction status constants
+from psycopg.rows import tuple_row              # Plain tuples for numeric streams
+from psycopg_pool import ConnectionPool         # Bounded, thread-safe connection pool
+
+
+# ---------------------------------------------
+# Function: to_postgres_sql
+# The shared helpers in db.py use sqlite3's '?' placeholders;
+# psycopg expects '%s' (and a literal '%' must be written '%%')
+# ---------------------------------------------
+@functools.lru_cache(maxsize=512)
+def to_postgres_sql(sql):
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+# ---------------------------------------------------------
+# Class: LedgerRow
+# Row type matching sqlite3.Row: readable by index and by column
+# name, and dict(row) / row.keys() work. One subclass is made per
+# result shape so each row is just a tuple plus a shared name index.
+# ---------------------------------------------------------
+class LedgerRow(tuple):
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._index)
+
+def ledger_row(cursor):
+    if cursor.description is None:
+        return tuple
+    index = {column.name: position for position, column in enumerate(cursor.description)}
+    row_class = type('LedgerRow', (LedgerRow,), {'_index': index})
+    return row_class
+
+
+# ---------------------------------------------------------
+# Class: LedgerCursor
+# psycopg cursor that accepts the '?' placeholder SQL of db.py
+# (params are always passed, so '%%' is unescaped consistently)
+# ---------------------------------------------------------
+class LedgerCursor(psycopg.Cursor):
+    def execute(self, query, params=None, **kwargs):
+        return super().execute(to_postgres_sql(query), params if params is not None else (), **kwargs)
+
+    def executemany(self, query, params_seq, **kwargs):
+        return super().executemany(to_postgres_sql(query), params_seq, **kwargs)
+
+
+# ---------------------------------------------------------
+# Class: PostgresConnection
+# What db.py helpers see: the sqlite3 connection interface on top
+# of a pooled psycopg connection
+# - close() hands the connection back to the pool (after rolling
+#   back anything left uncommitted) instead of disconnecting
+# - uow_depth is tracked here, as on db.LedgerConnection
+# ---------------------------------------------------------
+class PostgresConnection:
+    uow_depth = 0
+
+    def __init__(self, backend, raw):
+        self.storage_backend = backend
+        self._raw = raw
+
+    # The psycopg connection; like sqlite3, using a closed connection raises
+    @property
+    def raw(self):
+        if self._raw is None:
+            raise psycopg.OperationalError("the connection is closed")
+        return self._raw
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    def execute(self, sql, parameters=()):
+        return self.raw.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        cur = self.raw.cursor()
+        cur.executemany(sql, seq_of_parameters)
+        return cur
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != pq.TransactionStatus.IDLE
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is None:
+            return
+        if raw.info.transaction_status != pq.TransactionStatus.IDLE:
+            raw.rollback()
+        self.storage_backend.pool.putconn(raw)
+
+
+# ---------------------------------------------------------
+# Full-text search
+# Names weigh more than subjects (weights A and B). The expression
+# matches the GIN index created by create_schema(), so matching is
+# an index lookup; ts_rank is negated so ascending order = best first
+# ---------------------------------------------------------
+_SEARCH_VECTOR = ("(setweight(to_tsvector('simple', student_name), 'A') || "
+                  "setweight(to_tsvector('simple', subject), 'B'))")
+
+_MATCHES = f"student_records, to_tsquery('simple', ?) AS query WHERE {_SEARCH_VECTOR} @@ query"
+
+
+# ---------------------------------------------------------
+# Class: PostgresBackend
+# Storage backend for several app servers sharing one database
+# (see db.SQLiteBackend for the interface)
+# - Connections come from a bounded pool: at most pool_max_size
+#   per process; callers wait up to pool_timeout seconds for one
+# - MVCC means readers and writers never block each other and
+#   writers only contend on the rows they touch, so begin_write()
+#   needs no up-front lock
+# - Large reads stream through server-side (named) cursors
+# ---------------------------------------------------------
+class PostgresBackend:
+    name = 'postgres'
+    Error = psycopg.Error
+
+    # Plain JOIN: PostgreSQL's planner picks the loop order itself
+    join_in_order = 'JOIN'
+
+    # A row this statement inserted has no updating transaction yet
+    upsert_inserted = '(xmax = 0)'
+
+    def __init__(self, database_url, pool_min_size=1, pool_max_size=10, pool_timeout=30.0):
+        if not database_url:
+            raise ValueError("The postgres storage backend needs a database URL")
+        self.pool = ConnectionPool(
+            database_url, min_size=pool_min_size, max_size=pool_max_size, timeout=pool_timeout,
+            kwargs={'cursor_factory': LedgerCursor, 'row_factory': ledger_row},
+            name='class-ledger', open=True)
+        self._cursor_names = itertools.count()
+
+    def connect(self):
+        return PostgresConnection(self, self.pool.getconn())
+
+    def begin_write(self, conn):
+        pass  # Transactions start implicitly; row locks are taken by the writes themselves
+
+    def stream(self, conn, sql, params=(), batch_size=500, plain=False):
+        cur = conn.raw.cursor(name=f'ledger_stream_{next(self._cursor_names)}',
+                              row_factory=tuple_row if plain else ledger_row)
+        cur.itersize = batch_size
+        try:
+            cur.execute(to_postgres_sql(sql), params)
+            yield from cur
+        finally:
+            cur.close()
+
+    # Every word becomes a lexeme; words of two or more characters are
+    # prefix-matched ('jo':* & 'sm':*). Only \w characters survive, so
+    # tsquery syntax in the input is inert.
+    def build_search_query(self, text):
+        words = re.findall(r'\w+', text or '')
+        if not words:
+            return None
+        return ' & '.join(f"'{word}':*" if len(word) > 1 else f"'{word}'" for word in words)
+
+    # Scores are cast to float8: a float4 doesn't survive the round trip
+    # through a page cursor exactly, which would break (score, id) paging
+    ranked_matches = (f"(SELECT student_records.*, "
+                      f"CAST(-ts_rank({_SEARCH_VECTOR}, query) AS DOUBLE PRECISION) AS score "
+                      f"FROM {_MATCHES}) AS matches")
+    unranked_matches = f"(SELECT student_records.* FROM {_MATCHES}) AS matches"
+
+    def close(self):
+        self.pool.close()
+
+
+# ---------------------------------------------------------
+# PostgreSQL schema
+# The same tables, unique index and read indexes as models.py, plus:
+# - data_versions bumped by a statement-level trigger
+# - subject/teacher summaries maintained incrementally by a row
+#   trigger, mirroring the SQLite triggers (min/max are recomputed
+#   only when an extreme mark leaves a group)
+# - a GIN index on the weighted tsvector used by the search
+# Every statement is idempotent, so create_schema() can run at
+# every deploy
+# ---------------------------------------------------------
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS teachers (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        password TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS student_records (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        student_name TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        marks INTEGER NOT NULL,
+        teacher_id BIGINT NOT NULL
+    )''',
+    '''CREATE UNIQUE INDEX IF NOT EXISTS unique_student_subject
+        ON student_records (LOWER(student_name), LOWER(subject))''',
+    '''CREATE TABLE IF NOT EXISTS audit_log (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        ts DOUBLE PRECISION NOT NULL,
+        teacher_id BIGINT,
+        record_id BIGINT,
+        action TEXT NOT NULL,
+        student_name TEXT,
+        subject TEXT,
+        old_marks INTEGER,
+        new_marks INTEGER,
+        detail TEXT
+    )''',
+    '''CREATE INDEX IF NOT EXISTS idx_audit_log_record_ts ON audit_log (record_id, ts)''',
+    '''CREATE INDEX IF NOT EXISTS idx_audit_log_teacher_ts ON audit_log (teacher_id, ts)''',
+    # Carries a legacy free-text logs table over (see models._create_audit_log)
+    r'''DO $$
+    BEGIN
+        IF to_regclass('logs') IS NOT NULL THEN
+            INSERT INTO audit_log (ts, teacher_id, action, student_name, detail)
+            SELECT extract(epoch FROM now()), parts[1]::BIGINT,
+                   CASE parts[2] WHEN 'updated' THEN 'update' WHEN 'deleted' THEN 'delete' ELSE 'legacy' END,
+                   parts[3], log_msg
+            FROM (SELECT id, log_msg, regexp_match(log_msg, '^(\d+) (updated|deleted) (.+)$') AS parts
+                  FROM logs) AS legacy
+            ORDER BY id;
+            DROP TABLE logs;
+        END IF;
+    END $$''',
+
+    '''CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )''',
+    '''INSERT INTO data_versions (name, version)
+        VALUES ('student_records', 0), ('teachers', 0) ON CONFLICT DO NOTHING''',
+    '''CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE data_versions SET version = version + 1 WHERE name = TG_TABLE_NAME;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER student_records_version
+        AFTER INSERT OR UPDATE OR DELETE ON student_records
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()''',
+    '''CREATE OR REPLACE TRIGGER teachers_version
+        AFTER INSERT OR UPDATE OR DELETE ON teachers
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()''',
+
+    '''CREATE TABLE IF NOT EXISTS subject_summary (
+        subject TEXT PRIMARY KEY,
+        record_count BIGINT NOT NULL,
+        marks_sum BIGINT NOT NULL,
+        marks_min INTEGER,
+        marks_max INTEGER,
+        marks_sum_sq BIGINT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS teacher_summary (
+        teacher_id BIGINT PRIMARY KEY,
+        record_count BIGINT NOT NULL,
+        marks_sum BIGINT NOT NULL,
+        marks_min INTEGER,
+        marks_max INTEGER,
+        marks_sum_sq BIGINT NOT NULL
+    )''',
+    '''CREATE OR REPLACE FUNCTION maintain_record_summaries() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            UPDATE subject_summary SET
+                record_count = record_count - 1,
+                marks_sum = marks_sum - OLD.marks,
+                marks_sum_sq = marks_sum_sq - OLD.marks * OLD.marks,
+                marks_min = CASE WHEN OLD.marks > marks_min THEN marks_min
+                    ELSE (SELECT MIN(marks) FROM student_records WHERE subject = OLD.subject) END,
+                marks_max = CASE WHEN OLD.marks < marks_max THEN marks_max
+                    ELSE (SELECT MAX(marks) FROM student_records WHERE subject = OLD.subject) END
+            WHERE subject = OLD.subject;
+            DELETE FROM subject_summary WHERE subject = OLD.subject AND record_count <= 0;
+
+            UPDATE teacher_summary SET
+                record_count = record_count - 1,
+                marks_sum = marks_sum - OLD.marks,
+                marks_sum_sq = marks_sum_sq - OLD.marks * OLD.marks,
+                marks_min = CASE WHEN OLD.marks > marks_min THEN marks_min
+                    ELSE (SELECT MIN(marks) FROM student_records WHERE teacher_id = OLD.teacher_id) END,
+                marks_max = CASE WHEN OLD.marks < marks_max THEN marks_max
+                    ELSE (SELECT MAX(marks) FROM student_records WHERE teacher_id = OLD.teacher_id) END
+            WHERE teacher_id = OLD.teacher_id;
+            DELETE FROM teacher_summary WHERE teacher_id = OLD.teacher_id AND record_count <= 0;
+        END IF;
+
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            INSERT INTO subject_summary AS s
+                (subject, record_count, marks_sum, marks_min, marks_max, marks_sum_sq)
+            VALUES (NEW.subject, 1, NEW.marks, NEW.marks, NEW.marks, NEW.marks * NEW.marks)
+            ON CONFLICT (subject) DO UPDATE SET
+                record_count = s.record_count + 1,
+                marks_sum = s.marks_sum + excluded.marks_sum,
+                marks_min = LEAST(s.marks_min, excluded.marks_min),
+                marks_max = GREATEST(s.marks_max, excluded.marks_max),
+                marks_sum_sq = s.marks_sum_sq + excluded.marks_sum_sq;
+
+            INSERT INTO teacher_summary AS s
+                (teacher_id, record_count, marks_sum, marks_min, marks_max, marks_sum_sq)
+            VALUES (NEW.teacher_id, 1, NEW.marks, NEW.marks, NEW.marks, NEW.marks * NEW.marks)
+            ON CONFLICT (teacher_id) DO UPDATE SET
+                record_count = s.record_count + 1,
+                marks_sum = s.marks_sum + excluded.marks_sum,
+                marks_min = LEAST(s.marks_min, excluded.marks_min),
+                marks_max = GREATEST(s.marks_max, excluded.marks_max),
+                marks_sum_sq = s.marks_sum_sq + excluded.marks_sum_sq;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql''',
+    '''CREATE OR REPLACE TRIGGER student_records_summaries
+        AFTER INSERT OR DELETE OR UPDATE OF subject, teacher_id, marks ON student_records
+        FOR EACH ROW EXECUTE FUNCTION maintain_record_summaries()''',
+
+    f'''CREATE INDEX IF NOT EXISTS idx_student_records_search
+        ON student_records USING GIN ({_SEARCH_VECTOR})''',
+)
+
+# ---------------------------------------------
+# Function: create_schema
+# - Creates (or completes) the schema on the database at
+#   database_url, builds models.INDEXES and seeds missing teachers
+# - Run with: STORAGE_BACKEND=postgres DATABASE_URL=... python models.py
+# ---------------------------------------------
+def create_schema(database_url):
+    import models  # Shared index list and teacher seeding
+
+    with psycopg.connect(database_url, cursor_factory=LedgerCursor, row_factory=ledger_row) as conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for name, table, columns in models.INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        models.seed_teachers(conn)
+        conn.commit()
@@ -0,0 +1,210 @@
+import itertools  # Unique names for in-memory generations
+import logging    # Report refresh failures without crashing the worker
+import os         # Process id in generation names
+import sqlite3    # Backup API and in-memory databases
+import threading  # Background poller and swap lock
+import time       # Staleness bookkeeping
+
+import metrics  # Refresh timings for /metrics
+
+logger = logging.getLogger(__name__)
+
+_generation_ids = itertools.count(1)
+
+
+# ---------------------------------------------------------
+# Class: ReadReplica
+# In-memory copy of the SQLite database for read-heavy traffic
+# - start() copies the file into a shared-cache in-memory database
+#   with the sqlite3 backup API; read connections open that copy
+#   (no disk I/O, no file locks)
+# - A poller thread reads PRAGMA data_version on the file every
+#   poll_interval seconds; it only changes when another connection
+#   commits, so an unchanged value confirms the copy is current.
+#   On a change it compares the data_versions table (bumped by
+#   triggers on student_records / teachers): commits that only touched
+#   the audit log don't cost a copy. Otherwise the file is copied again
+#   in the background and swapped in when complete (readers never see
+#   a half-copied database; old copies live until their readers close)
+# - connect() only hands out a connection while the copy is fresh:
+#   confirmed current within max_staleness seconds, and no write
+#   from this process since (mark_stale()). Otherwise it returns
+#   None and the caller reads the primary instead, so reads are never
+#   older than the staleness bound and a process sees its own writes
+# - pages_per_step: pages copied per backup step (-1 = the whole
+#   file in one step, i.e. one consistent read of the WAL snapshot,
+#   which never blocks writers)
+# ---------------------------------------------------------
+class ReadReplica:
+    def __init__(self, source_path, max_staleness=1.0, poll_interval=None, pages_per_step=-1,
+                 connection_factory=sqlite3.Connection):
+        self.source_path = source_path
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval if poll_interval is not None else max(max_staleness / 2, 0.01)
+        self.pages_per_step = pages_per_step
+        self.pid = os.getpid()
+        self._factory = connection_factory
+
+        self._lock = threading.Lock()          # Guards the current generation and counters
+        self._refresh_lock = threading.Lock()  # One check / copy at a time
+        self._uri = None
+        self._keeper = None       # Keeps the current in-memory copy alive
+        self._monitor = None      # Idle connection to the file, for PRAGMA data_version
+        self._version = None      # PRAGMA data_version last checked against the copy
+        self._tables = None       # data_versions rows in the copy
+        self._confirmed_at = None  # monotonic time the copy was last known current
+        self._write_seq = 0       # Bumped by mark_stale() after local writes
+        self._clean_seq = 0       # Writes already covered by the copy
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {'refreshes': 0, 'replica': 0, 'primary': 0, 'failed': 0}
+        self._last_refresh_seconds = 0.0
+
+    # Makes the first copy (synchronously) and starts the poller
+    def start(self):
+        self._monitor = self._connect_source(check_same_thread=False)
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='read-replica-poller', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        with self._refresh_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+        with self._lock:
+            if self._keeper is not None:
+                self._keeper.close()
+            self._uri = self._keeper = None
+
+    # Connection to the primary (source_path may be a 'file:' URI)
+    def _connect_source(self, **kwargs):
+        return sqlite3.connect(self.source_path, uri=str(self.source_path).startswith('file:'), **kwargs)
+
+    # Called after this process commits a write: read the primary
+    # until a copy including the write is in place
+    def mark_stale(self):
+        with self._lock:
+            self._write_seq += 1
+
+    def is_fresh(self):
+        with self._lock:
+            return self._is_fresh()
+
+    def _is_fresh(self):
+        return (self._uri is not None and self._clean_seq == self._write_seq
+                and time.monotonic() - self._confirmed_at <= self.max_staleness)
+
+    # Name of the in-memory database currently served
+    @property
+    def uri(self):
+        return self._uri
+
+    # -----------------------------------------------------
+    # Function: connect
+    # New read-only connection to the current copy, or None when the
+    # copy may be stale (the caller should read the primary)
+    # -----------------------------------------------------
+    def connect(self):
+        with self._lock:
+            if not self._is_fresh():
+                self._counters['primary'] += 1
+                return None
+            uri = self._uri
+            self._counters['replica'] += 1
+        conn = sqlite3.connect(uri, uri=True, factory=self._factory)
+        conn.execute("PRAGMA query_only = ON")  # Writes belong on the primary
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -----------------------------------------------------
+    # Function: poll
+    # One staleness check: confirms the copy when the file is
+    # unchanged, refreshes it otherwise. Returns True on refresh.
+    # -----------------------------------------------------
+    def poll(self):
+        with self._refresh_lock:
+            with self._lock:
+                seq = self._write_seq
+            checked = time.monotonic()
+            version = self._data_version()
+            if version == self._version or (
+                    self._tables is not None and _table_versions(self._monitor) == self._tables):
+                with self._lock:
+                    self._version = version
+                    self._confirmed_at = checked
+                    self._clean_seq = max(self._clean_seq, seq)
+                return False
+        self.refresh()
+        return True
+
+    # -----------------------------------------------------
+    # Function: refresh
+    # Copies the file into a new in-memory database and swaps it in.
+    # The version is read before copying, so a commit racing with the
+    # copy is caught (and copied) by the next poll.
+    # -----------------------------------------------------
+    def refresh(self):
+        with self._refresh_lock:
+            with self._lock:
+                seq = self._write_seq
+            checked = time.monotonic()
+            version = self._data_version()
+
+            started = time.perf_counter()
+            uri = f"file:class-ledger-replica-{self.pid}-{next(_generation_ids)}?mode=memory&cache=shared"
+            copy = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            source = self._connect_source()
+            try:
+                source.backup(copy, pages=self.pages_per_step, sleep=0)
+            except BaseException:
+                copy.close()
+                raise
+            finally:
+                source.close()
+            elapsed = time.perf_counter() - started
+            tables = _table_versions(copy)
+
+            with self._lock:
+                old = self._keeper
+                self._uri, self._keeper, self._version, self._tables = uri, copy, version, tables
+                self._confirmed_at = checked
+                self._clean_seq = seq
+                self._counters['refreshes'] += 1
+                self._last_refresh_seconds = elapsed
+            if old is not None:
+                old.close()  # Freed once its last reader closes too
+        metrics.replica_refresh_seconds.observe(elapsed)
+
+    def _data_version(self):
+        return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                with self._lock:
+                    self._counters['failed'] += 1
+                logger.exception("Read replica refresh failed")
+
+    # Counters plus lag: seconds since the copy was last known current
+    # (an upper bound on how far behind the file it can be)
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['lag_seconds'] = time.monotonic() - self._confirmed_at if self._confirmed_at is not None else 0.0
+            stats['last_refresh_seconds'] = self._last_refresh_seconds
+            stats['fresh'] = int(self._is_fresh())
+        return stats
+
+
+# Row versions of the tables reads depend on, or None before the
+# data_versions migration (then every commit means a refresh)
+def _table_versions(conn):
+    try:
+        return conn.execute("SELECT name, version FROM data_versions ORDER BY name").fetchall()
+    except sqlite3.OperationalError:
+        return None
@@ -0,0 +1,127 @@
+import csv       # Streaming CSV parsing
+import sys       # For CLI exit codes and stderr
+import argparse  # Command-line arguments for the CLI entry point
+from collections import namedtuple  # Lightweight result type for the import report
+
+from db import (get_db_connection, get_teacher_by_username, unit_of_work, record_key,
+                get_marks_for_record_keys, upsert_student_records_many)
+from forms import validate_student_row, MARKS_MAX
+
+# Columns every roster CSV must provide (extra columns are ignored)
+REQUIRED_COLUMNS = ('student_name', 'subject', 'marks')
+
+# Rows written per transaction
+DEFAULT_BATCH_SIZE = 5000
+
+# Outcome of an import:
+#   - total_rows: data rows read from the file
+#   - imported_rows: rows inserted or merged into student_records
+#   - errors: list of (line_number, message) for every rejected row
+ImportReport = namedtuple('ImportReport', ['total_rows', 'imported_rows', 'errors'])
+
+
+# ---------------------------------------------------------
+# Function: import_roster
+# Streams a roster CSV into student_records
+# - Each row is checked with the StudentForm rules (validate_student_row)
+# - Valid rows get the /add_student semantics: a new record, or marks
+#   added to the existing student/subject record (max 100 in total)
+# - Rows are written with executemany, one transaction per batch
+# Parameters:
+#   - csv_file: text file object opened with newline=''
+#   - teacher_id (int): owner of newly created records
+#   - batch_size (int): rows per transaction
+# Returns:
+#   - ImportReport
+# ---------------------------------------------------------
+def import_roster(csv_file, teacher_id, batch_size=DEFAULT_BATCH_SIZE, conn=None):
+    reader = csv.DictReader(csv_file)
+
+    # Reject the whole file up front if a required column is missing
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        return ImportReport(0, 0, [(1, f"Missing column(s): {', '.join(missing)}")])
+
+    total_rows = 0
+    imported_rows = 0
+    errors = []
+    batch = []  # (line_number, student_name, subject, marks)
+
+    for row in reader:
+        total_rows += 1
+        cleaned, row_errors = validate_student_row(row['student_name'], row['subject'], row['marks'])
+        if row_errors:
+            errors.extend((reader.line_num, error) for error in row_errors)
+            continue
+
+        batch.append((reader.line_num,) + cleaned)
+        if len(batch) >= batch_size:
+            imported_rows += _apply_batch(batch, teacher_id, errors, conn)
+            batch = []
+
+    if batch:
+        imported_rows += _apply_batch(batch, teacher_id, errors, conn)
+
+    return ImportReport(total_rows, imported_rows, errors)
+
+
+# ---------------------------------------------------------
+# Function: _apply_batch
+# Writes one batch of validated rows in a single transaction
+# - Fetches current totals for every student/subject in the batch
+#   with one set-based query
+# - Replays the batch in file order to find rows whose merge would
+#   exceed the mark cap (reported as errors, not written)
+# - Upserts the remaining rows with executemany
+# Returns the number of rows written
+# ---------------------------------------------------------
+def _apply_batch(batch, teacher_id, errors, conn=None):
+    with unit_of_work(conn) as conn:
+        keys = {record_key(student_name, subject) for _, student_name, subject, _ in batch}
+        totals = get_marks_for_record_keys(keys, conn=conn)
+
+        accepted = []
+        for line_number, student_name, subject, marks in batch:
+            key = record_key(student_name, subject)
+            if key in totals and totals[key] + marks > MARKS_MAX:
+                errors.append((line_number, f"Cannot add with existing record, total marks exceeding {MARKS_MAX}"))
+                continue
+            totals[key] = totals.get(key, 0) + marks
+            accepted.append((student_name, subject, marks, teacher_id))
+
+        upsert_student_records_many(accepted, conn=conn)
+    return len(accepted)
+
+
+# ---------------------------------------------
+# CLI entry point
+# Usage: python roster_import.py roster.csv --teacher teacher1
+# ---------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import student records from a CSV file.")
+    parser.add_argument('csv_path', help="CSV file with student_name, subject and marks columns")
+    parser.add_argument('--teacher', required=True, help="Username of the teacher who owns new records")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per transaction")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        teacher = get_teacher_by_username(args.teacher, conn=conn)
+        if teacher is None:
+            print(f"Unknown teacher: {args.teacher}", file=sys.stderr)
+            return 2
+
+        # utf-8-sig also accepts files saved by spreadsheet tools with a BOM
+        with open(args.csv_path, newline='', encoding='utf-8-sig') as csv_file:
+            report = import_roster(csv_file, teacher['id'], batch_size=args.batch_size, conn=conn)
+    finally:
+        conn.close()
+
+    for line_number, message in report.errors:
+        print(f"line {line_number}: {message}", file=sys.stderr)
+    print(f"Imported {report.imported_rows} of {report.total_rows} rows ({len(report.errors)} errors)")
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
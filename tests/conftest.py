@@ -0,0 +1,56 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+from app import create_app, config_from_env, storage_settings
+
+
+# ---------------------------------------------------------
+# Per-test databases
+# - The schema (migrations, indexes, configured teachers) is built
+#   once per session in a template file; pytest-xdist workers are
+#   separate sessions, so each builds its own
+# - Every test then gets a copy of it in its own tmp_path; the db.py
+#   helpers (default storage) use it, and so does the test's app
+#   (see app.create_app), so tests neither see each other's rows nor
+#   touch class-ledger.db
+# - With STORAGE_BACKEND=postgres everything keeps DATABASE_URL: the
+#   PostgreSQL runs share that database, and aren't parallel-safe
+# ---------------------------------------------------------
+def _uses_sqlite():
+    return config_from_env()['STORAGE_BACKEND'] == 'sqlite'
+
+@pytest.fixture(scope='session')
+def template_database(tmp_path_factory):
+    if not _uses_sqlite():
+        return None
+    path = str(tmp_path_factory.mktemp('template') / 'class-ledger.db')
+    models.migrate(path)
+    return path
+
+@pytest.fixture(autouse=True)
+def app_config(template_database, tmp_path):
+    config = config_from_env()
+    config.update(TESTING=True, AUDIT_ARCHIVE_DIR=str(tmp_path / 'audit-archive'))
+    if template_database is not None:
+        config['DATABASE_PATH'] = str(tmp_path / 'class-ledger.db')
+        shutil.copyfile(template_database, config['DATABASE_PATH'])
+    db.configure(**storage_settings(config))
+    return config
+
+@pytest.fixture
+def app(app_config):
+    test_app = create_app(app_config)
+    yield test_app
+    test_app.extensions['ledger'].close()  # Write what the test queued while its database is still there
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,84 @@
+import os
+import re
+import sqlite3
+import sys
+import unittest
+
+import numpy as np
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import analytics
+import pytest
+
+
+class SummaryTests(unittest.TestCase):
+    def test_statistics(self):
+        marks = np.array([95, 80, 80, 60, 30], dtype=np.int16)
+        ids = np.arange(1, 6)
+        summary = analytics.summarize_marks(ids, marks)
+        self.assertEqual(summary['count'], 5)
+        self.assertAlmostEqual(summary['mean'], 69.0)
+        self.assertEqual(summary['median'], 80.0)
+        self.assertEqual(summary['grades'], {'A': 1, 'B': 2, 'C': 1, 'D': 0, 'F': 1})
+        self.assertEqual(sum(summary['histogram']), 5)
+        self.assertEqual([(s['id'], s['rank']) for s in summary['top']],
+                         [(1, 1), (2, 2), (3, 2), (4, 4), (5, 5)])
+
+    def test_competition_ranks(self):
+        ranks = analytics.competition_ranks(np.array([50, 70, 50, 100]))
+        self.assertEqual(list(ranks), [3, 2, 3, 1])
+
+    def test_empty(self):
+        self.assertEqual(analytics.summarize_marks(np.array([]), np.array([], dtype=np.int16)), {'count': 0})
+
+
+class ComputeTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, 1)",
+            [("Alice", "Math", 90), ("Bob", "Math", 70), ("Carl", "Art", 40)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_per_subject_and_overall(self):
+        results = dict(analytics.compute_class_analytics(conn=self.conn))
+        self.assertEqual(results[analytics.ALL_SUBJECTS]['count'], 3)
+        self.assertEqual(results['Math']['mean'], 80.0)
+        self.assertEqual(results['Math']['top'][0]['student_name'], 'Alice')
+        self.assertEqual(results['Art']['max'], 40)
+
+
+class AnalyticsRouteTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, client):
+        self.client = client
+
+    def test_page_renders(self):
+        with self.client as c:
+            login_page = c.get('/login')
+            csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                             login_page.get_data(as_text=True)).group(1)
+            c.post('/login', data={
+                'teacher_username': os.getenv("TEACHER_USERNAME"),
+                'teacher_password': os.getenv("TEACHER_PASSWORD"),
+                'csrf_token': csrf
+            })
+            response = c.get('/analytics')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Class Analytics', response.data)
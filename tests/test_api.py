@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import re
+import unittest
+
+import pytest
+
+
+class RecordsApiTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def login(self, c):
+        login_page = c.get('/login')
+        csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                         login_page.get_data(as_text=True)).group(1)
+        c.post('/login', data={
+            'teacher_username': os.getenv("TEACHER_USERNAME"),
+            'teacher_password': os.getenv("TEACHER_PASSWORD"),
+            'csrf_token': csrf
+        })
+        return csrf
+
+    def test_requires_login(self):
+        response = self.client.get('/api/records')
+        self.assertEqual(response.status_code, 401)
+
+    def test_projection_and_single_record(self):
+        with self.client as c:
+            csrf = self.login(c)
+            c.post('/add_student', data={
+                'student_name': 'Api Student', 'subject': 'Api', 'marks': 12, 'csrf_token': csrf
+            })
+
+            response = c.get('/api/records?fields=id,student_name&subject=Api')
+            self.assertEqual(response.status_code, 200)
+            records = response.json['records']
+            self.assertEqual(records[0]['student_name'], 'Api Student')
+            self.assertEqual(set(records[0]), {'id', 'student_name'})
+
+            single = c.get(f"/api/records/{records[0]['id']}?fields=marks")
+            self.assertEqual(single.json, {'marks': 12})
+
+            self.assertEqual(c.get('/api/records?fields=password').status_code, 400)
+            self.assertEqual(c.get('/api/records/999999').status_code, 404)
+
+    def test_single_record_is_scoped_to_its_teacher(self):
+        from db import upsert_student_record
+        record_id = upsert_student_record('Other Teachers Pupil', 'Api', 30, 999)['id']
+
+        self.app.config['ADMIN_USERNAMES'] = set()
+        with self.client as c:
+            self.login(c)
+            self.assertEqual(c.get(f'/api/records/{record_id}').status_code, 404)
+
+        self.app.config['ADMIN_USERNAMES'] = {os.getenv("TEACHER_USERNAME")}
+        with self.app.test_client() as c:
+            self.login(c)
+            response = c.get(f'/api/records/{record_id}?fields=student_name')
+            self.assertEqual(response.json, {'student_name': 'Other Teachers Pupil'})
+
+    def test_crafted_cursors_are_ignored(self):
+        import db
+        with self.client as c:
+            self.login(c)
+            for values in ([{"a": 1}, 1], [[1], 1]):
+                crafted = db.encode_cursor(values)
+                self.assertEqual(c.get(f'/api/records?after={crafted}').status_code, 200)
+                self.assertEqual(c.get(f'/home?before={crafted}').status_code, 200)
+
+    def test_gzip_and_etag(self):
+        with self.client as c:
+            self.login(c)
+            response = c.get('/api/records?per_page=100', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.status_code, 200)
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = json.loads(gzip.decompress(response.data))
+            else:
+                body = response.json
+            self.assertIn('records', body)
+
+            etag = response.headers['ETag']
+            cached = c.get('/api/records?per_page=100',
+                           headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+            self.assertEqual(cached.status_code, 304)
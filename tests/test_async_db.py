@@ -0,0 +1,104 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import async_db
+import db
+import models
+
+
+# A conn= taking helper that reports the thread and connection it ran on
+def where(delay=0.0, conn=None):
+    time.sleep(delay)
+    return threading.current_thread().name, id(conn)
+
+
+class AsyncDBTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'class-ledger.db')
+        self.addCleanup(db.configure, **vars(db.settings))
+        db.configure(database_path=path)  # A scratch SQLite file, whatever backend the suite runs against
+        models.migrate(path)
+        db.insert_student_record('John Smith', 'Math', 70, 1)  # Sync façade, as used by the CLI
+
+        self.app = Flask(__name__)
+        db.init_app(self.app)
+        async_db.init_app(self.app)
+
+    # Runs a coroutine inside an app context, like an async Flask view
+    def run_in_request(self, coroutine_fn):
+        with self.app.app_context():
+            return asyncio.run(coroutine_fn())
+
+    def test_helpers_return_what_the_sync_ones_do(self):
+        async def view():
+            record = await async_db.find_duplicate_record('john smith', 'MATH')
+            page = await async_db.get_student_records_page()
+            return record['marks'], [row['student_name'] for row in page.rows]
+        self.assertEqual(self.run_in_request(view), (70, ['John Smith']))
+
+    def test_gathered_reads_run_in_parallel_on_separate_connections(self):
+        async def view():
+            started = time.perf_counter()
+            places = await asyncio.gather(*(async_db.run(where, 0.2) for _ in range(3)))
+            return places, time.perf_counter() - started
+        places, elapsed = self.run_in_request(view)
+        self.assertEqual(len(set(places)), 3)  # Three threads, three connections
+        self.assertLess(elapsed, 0.5)
+
+    def test_read_connections_are_bounded(self):
+        async_db.configure(max_read_connections=2)
+        self.addCleanup(async_db.configure)
+
+        async def view():
+            places = await asyncio.gather(*(async_db.run(where, 0.05) for _ in range(5)))
+            return places, len(async_db.g.async_db.readers)
+        places, readers = self.run_in_request(view)
+        self.assertEqual((len(set(places)), readers), (2, 2))
+        with self.assertRaises(ValueError):
+            async_db.configure(max_read_connections=0)
+
+    def test_reads_after_a_write_use_the_writing_connection(self):
+        async def view():
+            await async_db.upsert_student_record('Mary Jones', 'Art', 80, 2)
+            primary = await async_db.run(where, write=True)
+            after = await async_db.run(where)
+            record = await async_db.find_duplicate_record('Mary Jones', 'Art')
+            return primary, after, record['marks']
+        primary, after, marks = self.run_in_request(view)
+        self.assertEqual((after, marks), (primary, 80))
+
+    def test_unit_of_work_commits_or_rolls_back(self):
+        async def view():
+            async with async_db.unit_of_work():
+                record_id = (await async_db.find_duplicate_record('John Smith', 'Math'))['id']
+                await async_db.update_student_record(record_id, 'John Smith', 'Math', 75)
+            with self.assertRaises(RuntimeError):
+                async with async_db.unit_of_work():
+                    await async_db.insert_student_record('Ghost', 'Art', 1, 1)
+                    raise RuntimeError
+        self.run_in_request(view)
+        self.assertEqual(db.find_duplicate_record('John Smith', 'Math')['marks'], 75)
+        self.assertIsNone(db.find_duplicate_record('Ghost', 'Art'))
+
+    def test_connections_are_closed_at_teardown(self):
+        async def view():
+            await asyncio.gather(async_db.get_data_version(), async_db.get_all_teachers())
+            return async_db.g.async_db
+        connections = self.run_in_request(view)
+        self.assertTrue(all(conn.conn is None for conn in [connections.primary] + connections.readers))
+
+
+if __name__ == '__main__':
+    unittest.main()
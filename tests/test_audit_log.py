@@ -0,0 +1,152 @@
+import calendar
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+from audit_archive import AuditArchiver
+import pytest
+
+DAY = 86400
+NOW = calendar.timegm((2026, 10, 15, 12, 0, 0))  # 2026-10-15 12:00 UTC
+
+
+class AuditLogTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(tmp.name, 'ledger.db')
+        models.migrate(self.path)
+        self.conn = self.connect()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, factory=db.LedgerConnection)
+        conn.row_factory = sqlite3.Row
+        self.addCleanup(conn.close)
+        return conn
+
+    def log(self, *entries):
+        db.insert_audit_entries([db.audit_entry(*entry[:-1], ts=entry[-1]) for entry in entries], conn=self.conn)
+
+    def test_legacy_messages_are_migrated(self):
+        path = os.path.join(self.dir, 'legacy.db')
+        conn = sqlite3.connect(path)
+        conn.isolation_level = None
+        for version, _, step in models.MIGRATIONS[:4]:  # A database from before the audit log
+            step(conn.cursor())
+        conn.execute('PRAGMA user_version = 4')
+        conn.executemany('INSERT INTO logs (log_msg) VALUES (?)', [('3 updated John Smith',), ('free text',)])
+        conn.close()
+
+        self.assertEqual(models.migrate(path), [5])
+        conn = sqlite3.connect(path)
+        rows = conn.execute('SELECT teacher_id, action, student_name, detail FROM audit_log ORDER BY id').fetchall()
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        self.assertEqual(rows, [(3, 'update', 'John Smith', '3 updated John Smith'),
+                                (None, 'legacy', None, 'free text')])
+        self.assertNotIn('logs', tables)
+
+    def test_history_is_paginated_newest_first(self):
+        self.log(*[('update', 1, 7, 'John', 'Math', i, i + 1, NOW + i) for i in range(5)],
+                 ('update', 1, 8, 'Mary', 'Art', 1, 2, NOW + 10))
+        page = db.get_audit_history(7, page_size=2, conn=self.conn)
+        self.assertEqual([row['new_marks'] for row in page.rows], [5, 4])
+        self.assertIsNone(page.prev_cursor)
+        older = db.get_audit_history(7, after=page.next_cursor, page_size=2, conn=self.conn)
+        self.assertEqual([row['new_marks'] for row in older.rows], [3, 2])
+        newer = db.get_audit_history(7, before=older.prev_cursor, page_size=2, conn=self.conn)
+        self.assertEqual([row['new_marks'] for row in newer.rows], [5, 4])
+        mine = db.get_audit_history(teacher_id=1, page_size=10, conn=self.conn)
+        self.assertEqual(len(mine.rows), 6)
+
+    def test_history_uses_the_record_index(self):
+        plan = ' '.join(row[3] for row in self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM audit_log WHERE record_id = ? ORDER BY ts DESC, id DESC", (7,)))
+        self.assertIn('idx_audit_log_record_ts', plan)
+
+    def test_rotation_by_age_moves_old_entries_to_monthly_archives(self):
+        self.log(('update', 1, 7, 'John', 'Math', 50, 60, NOW - 70 * DAY),  # August
+                 ('update', 1, 7, 'John', 'Math', 60, 70, NOW - 40 * DAY),  # September
+                 ('update', 1, 7, 'John', 'Math', 70, 80, NOW - 1 * DAY))
+        archiver = AuditArchiver(os.path.join(self.dir, 'archive'), max_age_days=30, max_rows=0)
+
+        self.assertEqual(archiver.rotate(self.conn, now=NOW), 2)
+        self.assertEqual(archiver.archives(), ['2026-09', '2026-08'])
+        self.assertEqual(db.count_audit_entries(conn=self.conn), 1)
+        self.assertEqual(archiver.archives_for_record(7), ['2026-09', '2026-08'])
+        archived = archiver.history('2026-08', 7)
+        self.assertEqual([(row['old_marks'], row['new_marks']) for row in archived.rows], [(50, 60)])
+        self.assertEqual(archiver.rotate(self.conn, now=NOW), 0)  # Nothing more is due
+
+    def test_rotation_by_size_keeps_the_newest_entries(self):
+        self.log(*[('update', 1, 7, 'John', 'Math', i, i + 1, NOW + i) for i in range(10)])
+        archiver = AuditArchiver(os.path.join(self.dir, 'archive'), max_age_days=0, max_rows=4, batch_size=3)
+        self.assertEqual(archiver.rotate(self.conn, now=NOW), 6)
+        kept = db.get_audit_history(7, page_size=10, conn=self.conn)
+        self.assertEqual([row['new_marks'] for row in kept.rows], [10, 9, 8, 7])
+        self.assertEqual(len(archiver.history('2026-10', 7, page_size=10).rows), 6)
+
+    def test_an_interrupted_rotation_copies_again_without_duplicates(self):
+        self.log(('update', 1, 7, 'John', 'Math', 50, 60, NOW - 70 * DAY))
+        archiver = AuditArchiver(os.path.join(self.dir, 'archive'), max_age_days=30, max_rows=0)
+        archiver._archive(db.get_oldest_audit_entries(10, conn=self.conn))  # Crash before the delete
+        self.assertEqual(archiver.rotate(self.conn, now=NOW), 1)
+        self.assertEqual(len(archiver.history('2026-08', 7).rows), 1)
+
+    def test_unknown_archive_months_are_rejected(self):
+        archiver = AuditArchiver(os.path.join(self.dir, 'archive'))
+        for month in ('2026-01', '../ledger', None):
+            with self.assertRaises(LookupError):
+                archiver.connect(month)
+
+
+class AuditHistoryRouteTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def login(self, c, suffix=''):
+        login_page = c.get('/login')
+        csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                         login_page.get_data(as_text=True)).group(1)
+        c.post('/login', data={
+            'teacher_username': os.getenv(f"TEACHER_USERNAME{suffix}"),
+            'teacher_password': os.getenv(f"TEACHER_PASSWORD{suffix}"),
+            'csrf_token': csrf
+        })
+        return csrf
+
+    def test_history_of_an_edited_record(self):
+        with self.client as c:
+            csrf = self.login(c)
+            c.post('/add_student', data={'student_name': 'History Pupil', 'subject': 'Audit',
+                                         'marks': 60, 'csrf_token': csrf})
+            record_id = db.find_duplicate_record('History Pupil', 'Audit')['id']
+            self.addCleanup(db.delete_student_record, record_id)
+            c.post(f'/edit_record/{record_id}', data={'name': 'History Pupil', 'subject': 'Audit',
+                                                      'marks': '75', 'csrf_token': csrf})
+            self.app.extensions['ledger'].audit_log.flush()
+
+            page = c.get(f'/records/{record_id}/history').get_data(as_text=True)
+            self.assertIn('60 &rarr; 75', page)
+            self.assertLess(page.index('update'), page.index('create'))  # Newest first
+            self.assertEqual(c.get('/records/999999999/history').status_code, 404)
+
+        if os.getenv('TEACHER_USERNAME2') and os.getenv('TEACHER_PASSWORD2'):
+            with self.app.test_client() as other:
+                self.login(other, '2')
+                self.assertEqual(other.get(f'/records/{record_id}/history').status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
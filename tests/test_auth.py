@@ -1,5 +1,5 @@
 import unittest
-from app import app
+import pytest
 from flask import session
 import sys
 import os
@@ -15,10 +15,10 @@ class AuthTests(unittest.TestCase):
         match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', html)
         return match.group(1) if match else None
 
-    def setUp(self):
-        """Configure the test client before each test."""
-        app.config['TESTING'] = True
-        self.client = app.test_client()
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
 
     def test_login_page_loads(self):
         """Test if login page loads with all necessary fields."""
@@ -118,3 +118,50 @@ class AuthTests(unittest.TestCase):
             home_after_logout = c.get('/home', follow_redirects=True)
             self.assertEqual(home_after_logout.status_code, 200)
             self.assertIn(b'Login', home_after_logout.data)
+
+
+class PasswordVerifierTests(unittest.TestCase):
+    def setUp(self):
+        from werkzeug.security import generate_password_hash
+        self.password_hash = generate_password_hash("secret")
+
+    def test_inline_verification(self):
+        from auth import PasswordVerifier
+        verifier = PasswordVerifier(max_workers=0)
+        self.assertTrue(verifier.verify(self.password_hash, "secret"))
+        self.assertFalse(verifier.verify(self.password_hash, "wrong"))
+
+    def test_pool_verification(self):
+        from auth import PasswordVerifier
+        verifier = PasswordVerifier(max_workers=1, max_pending=2)
+        try:
+            self.assertTrue(verifier.verify(self.password_hash, "secret"))
+            self.assertFalse(verifier.verify(self.password_hash, "wrong"))
+        finally:
+            verifier.shutdown()
+
+    def test_async_verification(self):
+        import asyncio
+        from auth import PasswordVerifier
+        for workers in (0, 1):
+            verifier = PasswordVerifier(max_workers=workers, max_pending=2)
+            try:
+                self.assertTrue(asyncio.run(verifier.verify_async(self.password_hash, "secret")))
+                self.assertFalse(asyncio.run(verifier.verify_async(self.password_hash, "wrong")))
+            finally:
+                verifier.shutdown()
+
+    def test_async_busy_when_no_slot_frees_up(self):
+        import asyncio
+        from auth import PasswordVerifier, VerifierBusy
+        verifier = PasswordVerifier(max_workers=1, max_pending=1, timeout=0.01)
+        verifier._slots.acquire()  # Simulate a verification already in flight
+        with self.assertRaises(VerifierBusy):
+            asyncio.run(verifier.verify_async(self.password_hash, "secret"))
+
+    def test_busy_when_no_slot_frees_up(self):
+        from auth import PasswordVerifier, VerifierBusy
+        verifier = PasswordVerifier(max_workers=1, max_pending=1, timeout=0.01)
+        verifier._slots.acquire()  # Simulate a verification already in flight
+        with self.assertRaises(VerifierBusy):
+            verifier.verify(self.password_hash, "secret")
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark import compare_reports, generate_records, percentile, summarize_latencies
+from forms import validate_student_row
+
+
+class GenerateRecordsTests(unittest.TestCase):
+    def test_rows_are_unique_and_valid(self):
+        rows = list(generate_records(500, subjects=8, subjects_per_student=3, seed=1))
+        self.assertEqual(len(rows), 500)
+
+        keys = {(name.lower(), subject.lower()) for name, subject, _, _ in rows}
+        self.assertEqual(len(keys), 500)
+        for name, subject, marks, teacher_id in rows:
+            cleaned, errors = validate_student_row(name, subject, str(marks))
+            self.assertEqual(errors, [])
+            self.assertIn(teacher_id, (1, 2))
+
+    def test_same_seed_gives_same_rows(self):
+        self.assertEqual(list(generate_records(50, seed=7)), list(generate_records(50, seed=7)))
+
+    def test_skew_favours_first_subjects(self):
+        rows = list(generate_records(2000, subjects=10, subjects_per_student=1, subject_skew=2.0))
+        counts = {}
+        for _, subject, _, _ in rows:
+            counts[subject] = counts.get(subject, 0) + 1
+        self.assertEqual(max(counts, key=counts.get), 'Subject Aaa')
+
+
+class LatencySummaryTests(unittest.TestCase):
+    def test_percentiles(self):
+        values = [i / 1000.0 for i in range(1, 101)]  # 1..100 ms
+        self.assertEqual(percentile(values, 50), 0.05)
+        self.assertEqual(percentile(values, 99), 0.099)
+        self.assertEqual(percentile([], 50), 0.0)
+
+        stats = summarize_latencies(values, elapsed=2.0)
+        self.assertEqual(stats['calls'], 100)
+        self.assertAlmostEqual(stats['throughput'], 50.0)
+        self.assertAlmostEqual(stats['p95_ms'], 95.0)
+
+
+class CompareReportsTests(unittest.TestCase):
+    @staticmethod
+    def report(p50, throughput):
+        stats = {'p50_ms': p50, 'p95_ms': p50 * 2, 'p99_ms': p50 * 3, 'throughput': throughput}
+        return {'results': {'1000': {'GET /home': stats}}}
+
+    def test_within_threshold_passes(self):
+        self.assertEqual(compare_reports(self.report(10, 100), self.report(11, 95), threshold=0.2), [])
+
+    def test_slower_case_is_flagged(self):
+        regressions = compare_reports(self.report(10, 100), self.report(15, 60), threshold=0.2)
+        metrics = {r['metric'] for r in regressions}
+        self.assertEqual(metrics, {'p50_ms', 'p95_ms', 'p99_ms', 'throughput'})
+        self.assertEqual(regressions[0]['case'], 'GET /home')
+
+    def test_new_cases_are_ignored(self):
+        current = self.report(10, 100)
+        current['results']['1000']['GET /analytics'] = current['results']['1000']['GET /home']
+        self.assertEqual(compare_reports(self.report(10, 100), current), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
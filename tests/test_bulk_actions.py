@@ -0,0 +1,178 @@
+import os
+import re
+import sqlite3
+import sys
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import pytest
+
+
+class BulkHelperTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE UNIQUE INDEX unique_student_subject
+            ON student_records (LOWER(student_name), LOWER(subject))
+        ''')
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            [("Alice", "Math", 90, 1), ("Bob", "Math", 80, 1), ("Carl", "Art", 60, 2)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_fetch_by_ids(self):
+        records = db.fetch_student_records_by_ids([1, 3, 42], conn=self.conn)
+        self.assertEqual(sorted(records), [1, 3])
+        self.assertEqual(records[3]["teacher_id"], 2)
+
+    def test_duplicates_ignore_the_record_itself(self):
+        conflicts = db.find_duplicate_records_many(
+            [(1, "ALICE", "math"),      # Unchanged except for case -> fine
+             (2, "alice", "Math"),      # Clashes with record 1
+             (3, "Zed", "Art")], conn=self.conn)
+        self.assertEqual(conflicts, [(2, 1)])
+
+    def test_update_and_delete_many(self):
+        db.update_student_records_many([(1, "Alicia", "Math", 91), (2, "Bob", "Science", 81)], conn=self.conn)
+        db.delete_student_records_many([3], conn=self.conn)
+        rows = self.conn.execute("SELECT student_name, subject, marks FROM student_records ORDER BY id").fetchall()
+        self.assertEqual([tuple(row) for row in rows], [("Alicia", "Math", 91), ("Bob", "Science", 81)])
+
+
+class BulkRouteTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def login(self, c):
+        login_page = c.get('/login')
+        csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                         login_page.get_data(as_text=True)).group(1)
+        c.post('/login', data={
+            'teacher_username': os.getenv("TEACHER_USERNAME"),
+            'teacher_password': os.getenv("TEACHER_PASSWORD"),
+            'csrf_token': csrf
+        })
+        return csrf
+
+    def add(self, c, csrf, name, subject='Bulk', marks=10):
+        c.post('/add_student', data={'student_name': name, 'subject': subject, 'marks': marks, 'csrf_token': csrf})
+        return db.find_duplicate_record(name, subject)['id']
+
+    def test_bulk_edit_and_delete_json(self):
+        with self.client as c:
+            csrf = self.login(c)
+            first = self.add(c, csrf, 'Bulk One')
+            second = self.add(c, csrf, 'Bulk Two')
+            headers = {'X-CSRFToken': csrf}
+
+            response = c.post('/bulk_edit', headers=headers, json={'records': [
+                [first, 'Bulk Uno', 'Bulk', 55], [second, 'Bulk Dos', 'Bulk', 66]]})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json, {'count': 2})
+            self.assertEqual(db.fetch_student_record_by_id(first)['student_name'], 'Bulk Uno')
+            self.assertEqual(db.fetch_student_record_by_id(second)['marks'], 66)
+            entries = db.get_db_connection().execute(
+                "SELECT record_id, student_name, old_marks, new_marks FROM audit_log "
+                "WHERE action = 'update' ORDER BY id DESC LIMIT 2").fetchall()
+            self.assertEqual(sorted(tuple(entry) for entry in entries),
+                             sorted([(first, 'Bulk Uno', 10, 55), (second, 'Bulk Dos', 10, 66)]))
+
+            response = c.post('/bulk_delete', headers=headers, json={'ids': [first, second]})
+            self.assertEqual(response.json, {'count': 2})
+            self.assertIsNone(db.fetch_student_record_by_id(first))
+            self.assertIsNone(db.fetch_student_record_by_id(second))
+
+    def test_malformed_json_payloads_are_rejected(self):
+        with self.client as c:
+            csrf = self.login(c)
+            first = self.add(c, csrf, 'Shape One')
+            headers = {'X-CSRFToken': csrf}
+
+            for path, payload in (('/bulk_delete', [first]), ('/bulk_delete', {'ids': first}),
+                                  ('/bulk_edit', [[first, 'Shape Uno', 'Bulk', 20]]), ('/bulk_edit', {'records': 5})):
+                response = c.post(path, headers=headers, json=payload)
+                self.assertEqual(response.status_code, 400, (path, payload))
+                self.assertEqual(len(response.json['errors']), 1)
+
+            for name, subject in ((5, 'Math'), ('Shape Uno', ['Math']), ({'name': 'x'}, 'Bulk')):
+                response = c.post('/bulk_edit', headers=headers, json={'records': [[first, name, subject, 50]]})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json['errors'], [f'Record {first}: Name and subject must be text.'])
+            self.assertEqual(db.fetch_student_record_by_id(first)['student_name'], 'Shape One')
+
+    def test_bulk_edit_is_all_or_nothing(self):
+        with self.client as c:
+            csrf = self.login(c)
+            first = self.add(c, csrf, 'Atomic One')
+            second = self.add(c, csrf, 'Atomic Two')
+            headers = {'X-CSRFToken': csrf}
+
+            # Second row would duplicate the first row's new name -> nothing changes
+            response = c.post('/bulk_edit', headers=headers, json={'records': [
+                [first, 'Atomic Same', 'Bulk', 20], [second, 'atomic same', 'bulk', 30]]})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(f'Record {second}: same name and subject as record {first}', response.json['errors'])
+            self.assertEqual(db.fetch_student_record_by_id(first)['student_name'], 'Atomic One')
+
+            # Validation errors name the record
+            response = c.post('/bulk_edit', headers=headers, json={'records': [[first, 'X', 'Bulk', 500]]})
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(all(error.startswith(f'Record {first}:') for error in response.json['errors']))
+
+            # Another teacher's record can't be touched
+            other = db.get_db_connection()
+            other.execute("INSERT INTO student_records (student_name, subject, marks, teacher_id) "
+                          "VALUES ('Not Mine', 'Bulk', 1, 999)")
+            other.commit()
+            not_mine = db.find_duplicate_record('Not Mine', 'Bulk')['id']
+            response = c.post('/bulk_delete', headers=headers, json={'ids': [first, not_mine]})
+            self.assertEqual(response.status_code, 400)
+            self.assertIsNotNone(db.fetch_student_record_by_id(first))
+            self.assertIsNotNone(db.fetch_student_record_by_id(not_mine))
+            c.post('/bulk_delete', headers=headers, json={'ids': [first, second]})
+            db.delete_student_record(not_mine)
+
+    def test_bulk_form_posts(self):
+        with self.client as c:
+            csrf = self.login(c)
+            first = self.add(c, csrf, 'Form One')
+            second = self.add(c, csrf, 'Form Two')
+
+            home = c.get('/home?subject=Bulk').get_data(as_text=True)
+            self.assertIn(f'name="record_id" value="{first}" form="bulk-form"', home)
+
+            response = c.post('/bulk_edit', data={
+                'csrf_token': csrf, 'record_id': [str(first)],
+                f'name-{first}': 'Form Uno', f'subject-{first}': 'Bulk', f'marks-{first}': '42'})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(db.fetch_student_record_by_id(first)['student_name'], 'Form Uno')
+
+            response = c.post('/bulk_delete', data={'csrf_token': csrf, 'record_id': [str(first), str(second)]},
+                              follow_redirects=True)
+            self.assertIn(b'Deleted 2 student records.', response.data)
+            self.assertIsNone(db.fetch_student_record_by_id(second))
+
+            response = c.post('/bulk_delete', data={'csrf_token': csrf}, follow_redirects=True)
+            self.assertIn(b'No records selected.', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
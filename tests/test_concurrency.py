@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+
+STRESS_PROCESSES = 4
+STRESS_OPERATIONS = 150
+
+
+# ---------------------------------------------------------
+# Stress worker (runs in a child process)
+# Mixed reads and writes against the shared database file:
+# paginated reads, summary reads, upserts, audit log inserts and a
+# read-modify-write of one shared counter row inside unit_of_work()
+# Returns the lock errors seen plus what was written, for checking
+# ---------------------------------------------------------
+def stress_worker(path, worker, operations, counter_id):
+    db.configure(database_path=path)
+    rng = random.Random(worker)
+    errors = []
+    increments = inserted = 0
+    for index in range(operations):
+        try:
+            choice = rng.random()
+            if choice < 0.3:
+                page = db.get_student_records_page(sort=rng.choice(['name', 'marks']), page_size=20)
+                db.get_subject_summaries()
+                assert len(page.rows) <= 20
+            elif choice < 0.5:
+                db.upsert_student_record(f'Worker {worker} Pupil {index}', 'Stress', 1, 1)
+                inserted += 1
+            elif choice < 0.6:
+                db.insert_audit_entries([db.audit_entry('update', worker, detail=f'op {index}')])
+            else:
+                with db.unit_of_work() as conn:
+                    marks = db.fetch_student_record_by_id(counter_id, conn=conn)['marks']
+                    db.update_student_record(counter_id, 'Shared Counter', 'Counter', marks + 1, conn=conn)
+                increments += 1
+        except sqlite3.OperationalError as error:
+            errors.append(str(error))
+    return {'errors': errors, 'increments': increments, 'inserted': inserted}
+
+
+class ConcurrentAccessTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'class-ledger.db')
+        models.migrate(self.path)
+        conn = sqlite3.connect(self.path)
+        self.counter_id = conn.execute(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) "
+            "VALUES ('Shared Counter', 'Counter', 0, 1)").lastrowid
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_processes_share_the_database_without_lock_errors(self):
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(STRESS_PROCESSES) as pool:
+            results = pool.starmap(stress_worker, [
+                (self.path, worker, STRESS_OPERATIONS, self.counter_id) for worker in range(STRESS_PROCESSES)])
+
+        self.assertEqual([error for result in results for error in result['errors']], [])
+
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        # No lost updates: every increment ran on fresh data under the write lock
+        self.assertEqual(conn.execute('SELECT marks FROM student_records WHERE id = ?', (self.counter_id,)).fetchone()[0],
+                         sum(result['increments'] for result in results))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM student_records WHERE subject = 'Stress'").fetchone()[0],
+                         sum(result['inserted'] for result in results))
+        conn.close()
+
+
+class BeginWriteTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'ledger.db')
+        self.holder = sqlite3.connect(self.path, isolation_level=None)
+        self.holder.execute('PRAGMA journal_mode = WAL')
+        self.holder.execute('CREATE TABLE t (x INTEGER)')
+        self.holder.execute('BEGIN IMMEDIATE')  # Keep the write lock
+
+    def tearDown(self):
+        self.holder.close()
+        self.tmp.cleanup()
+
+    def test_retries_with_backoff_then_gives_up(self):
+        conn = sqlite3.connect(self.path, timeout=0)
+        with mock.patch.object(db.settings, 'write_retries', 3), \
+                mock.patch.object(db.time, 'sleep') as sleep, \
+                self.assertRaises(sqlite3.OperationalError):
+            db.begin_write(conn)
+        self.assertEqual(sleep.call_count, 3)
+        # Each sleep is at most the doubled backoff for its attempt
+        for attempt, call in enumerate(sleep.call_args_list):
+            self.assertLessEqual(call.args[0], db.settings.retry_backoff_ms * 2 ** attempt / 1000.0)
+        conn.close()
+
+    def test_succeeds_once_the_lock_is_released(self):
+        conn = sqlite3.connect(self.path, timeout=0)
+        with mock.patch.object(db.time, 'sleep', side_effect=lambda seconds: self.holder.execute('COMMIT')):
+            db.begin_write(conn)
+        self.assertTrue(conn.in_transaction)
+        db.begin_write(conn)  # Already in a transaction -> no-op
+        conn.rollback()
+        conn.close()
+
+    def test_connection_settings(self):
+        with mock.patch.object(db.settings, 'cache_size_kib', 1024):
+            conn = sqlite3.connect(self.path)
+            db._configure_connection(conn)
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+            self.assertEqual(conn.execute('PRAGMA cache_size').fetchone()[0], -1024)
+            conn.close()
+        with self.assertRaises(ValueError):
+            db.configure(journal_mode='WAL; DROP TABLE t')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import sqlite3
+import time
 import sys
 import os
 
@@ -7,6 +8,7 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import db
+import models
 from db import (
     get_db_connection, get_teacher_by_username, insert_student_record,
     get_all_student_records, delete_student_record,
@@ -18,6 +20,9 @@ class DBConnectionTests(unittest.TestCase):
     def test_get_db_connection_returns_row_factory(self):
         conn = get_db_connection()
         self.assertIsNotNone(conn)
+        if db.backend_for(conn).name != 'sqlite':
+            conn.close()
+            self.skipTest("SQLite connection details")
         self.assertEqual(conn.row_factory, sqlite3.Row)
         cur = conn.cursor()
         cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
@@ -86,44 +91,313 @@ class StudentDBTests(unittest.TestCase):
 
 class StudentDBTests(unittest.TestCase):
     def setUp(self):
-        self.conn = sqlite3.connect(":memory:")
+        # A private in-memory database with the real schema; it lives as
+        # long as self.conn, the first connection to it, stays open
+        uri = f"file:student-db-tests-{id(self)}?mode=memory&cache=shared"
+        self.conn = db.connect_sqlite(uri, factory=db.LedgerConnection)
         self.conn.row_factory = sqlite3.Row
-        self.cur = self.conn.cursor()
-        self.cur.execute('''
-            CREATE TABLE student_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_name TEXT NOT NULL,
-                subject TEXT NOT NULL,
-                marks INT NOT NULL
-            )
-        ''')
-        self.conn.commit()
+        models.migrate(uri)
 
     def tearDown(self):
         self.conn.close()
 
     def test_insert_and_fetch(self):
-        insert_student_record("Alice", "Math", 90, conn=self.conn)
+        insert_student_record("Alice", "Math", 90, 1, conn=self.conn)
         records = get_all_student_records(conn=self.conn)
         assert len(records) == 1
         assert records[0]["student_name"] == "Alice"
 
     def test_find_duplicate(self):
-        insert_student_record("Alice", "Math", 90, conn=self.conn)
+        insert_student_record("Alice", "Math", 90, 1, conn=self.conn)
         result = find_duplicate_record("alice", "math", conn=self.conn)
         assert result is not None
         assert result["marks"] == 90
 
     def test_update_record(self):
-        insert_student_record("Bob", "Science", 80, conn=self.conn)
+        insert_student_record("Bob", "Science", 80, 1, conn=self.conn)
         record = find_duplicate_record("Bob", "Science", conn=self.conn)
         update_student_record(record["id"], "Bob", "Science", 95, conn=self.conn)
         updated = find_duplicate_record("Bob", "Science", conn=self.conn)
         assert updated["marks"] == 95
 
     def test_delete_record(self):
-        insert_student_record("Charlie", "History", 70, conn=self.conn)
+        insert_student_record("Charlie", "History", 70, 1, conn=self.conn)
         record = find_duplicate_record("Charlie", "History", conn=self.conn)
         delete_student_record(record["id"], conn=self.conn)
         result = find_duplicate_record("Charlie", "History", conn=self.conn)
         assert result is None
+
+
+class UnitOfWorkTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_commits_once_at_end(self):
+        with db.unit_of_work(self.conn):
+            insert_student_record("Alice", "Math", 90, 1, conn=self.conn)
+            insert_student_record("Bob", "Math", 80, 1, conn=self.conn)
+            # Helpers must not commit while the unit of work is open
+            self.assertTrue(self.conn.in_transaction)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(len(get_all_student_records(conn=self.conn)), 2)
+
+    def test_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with db.unit_of_work(self.conn):
+                insert_student_record("Alice", "Math", 90, 1, conn=self.conn)
+                raise RuntimeError("boom")
+        self.assertEqual(len(get_all_student_records(conn=self.conn)), 0)
+
+    def test_nested_units_commit_with_outermost(self):
+        with db.unit_of_work(self.conn):
+            with db.unit_of_work(self.conn):
+                insert_student_record("Alice", "Math", 90, 1, conn=self.conn)
+            self.assertTrue(self.conn.in_transaction)
+        self.assertFalse(self.conn.in_transaction)
+
+
+class RequestConnectionTests(unittest.TestCase):
+    def test_connection_shared_and_closed_on_teardown(self):
+        from flask import Flask
+        flask_app = Flask(__name__)
+        db.init_app(flask_app)
+
+        with flask_app.app_context():
+            conn = db.get_request_connection()
+            self.assertIs(conn, db.get_request_connection())
+
+        with self.assertRaises(db.backend_for(conn).Error):
+            conn.execute("SELECT 1")
+
+
+class KeysetPaginationTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        rows = [("Eve", "Math", 70, 1), ("Alice", "Math", 90, 1), ("Dan", "Art", 70, 2),
+                ("Bob", "Science", 80, 2), ("Carl", "Math", 60, 1), ("Fay", "Art", 95, 2),
+                ("Gus", "Science", 70, 1)]
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            rows)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def walk_forward(self, **kwargs):
+        names, cursor = [], None
+        while True:
+            page = db.get_student_records_page(after=cursor, page_size=3, conn=self.conn, **kwargs)
+            names.extend(row["student_name"] for row in page.rows)
+            if page.next_cursor is None:
+                return names, page
+            cursor = page.next_cursor
+
+    def test_walks_every_row_once_in_order(self):
+        names, _ = self.walk_forward(sort="name")
+        self.assertEqual(names, ["Alice", "Bob", "Carl", "Dan", "Eve", "Fay", "Gus"])
+
+    def test_ties_broken_by_id(self):
+        names, _ = self.walk_forward(sort="marks", descending=True)
+        self.assertEqual(names, ["Fay", "Alice", "Bob", "Gus", "Dan", "Eve", "Carl"])
+
+    def test_previous_page(self):
+        first = db.get_student_records_page(sort="name", page_size=3, conn=self.conn)
+        self.assertIsNone(first.prev_cursor)
+        second = db.get_student_records_page(sort="name", page_size=3, after=first.next_cursor, conn=self.conn)
+        back = db.get_student_records_page(sort="name", page_size=3, before=second.prev_cursor, conn=self.conn)
+        self.assertEqual([r["id"] for r in back.rows], [r["id"] for r in first.rows])
+        self.assertIsNone(back.prev_cursor)
+
+    def test_filters(self):
+        names, _ = self.walk_forward(sort="name", subject="Math", teacher_id=1)
+        self.assertEqual(names, ["Alice", "Carl", "Eve"])
+
+    def test_bad_cursor_starts_from_first_page(self):
+        page = db.get_student_records_page(sort="name", page_size=2, after="not-a-cursor", conn=self.conn)
+        self.assertEqual([r["student_name"] for r in page.rows], ["Alice", "Bob"])
+
+    def test_cursor_values_that_cannot_be_bound_are_rejected(self):
+        for values in ([{"a": 1}, 1], [[1], 1], ["Alice", "1"], ["Alice", 1.5], ["Alice", True], [None, None]):
+            crafted = db.encode_cursor(values)
+            self.assertIsNone(db.decode_cursor(crafted), values)
+            page = db.get_student_records_page(sort="name", page_size=2, after=crafted, conn=self.conn)
+            self.assertEqual([r["student_name"] for r in page.rows], ["Alice", "Bob"])
+        self.assertEqual(db.decode_cursor(db.encode_cursor(["Alice", 2])), ("Alice", 2))
+        self.assertEqual(db.decode_cursor(db.encode_cursor([None, 2])), (None, 2))
+
+
+class UpsertTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE UNIQUE INDEX unique_student_subject
+            ON student_records (LOWER(student_name), LOWER(subject))
+        ''')
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_insert_then_merge(self):
+        first = db.upsert_student_record("Alice", "Math", 40, 1, conn=self.conn)
+        self.assertEqual(first["marks"], 40)
+        merged = db.upsert_student_record("alice", "MATH", 35, 1, conn=self.conn)
+        self.assertEqual(merged["id"], first["id"])
+        self.assertEqual(merged["marks"], 75)
+        self.assertEqual(len(get_all_student_records(conn=self.conn)), 1)
+
+    def test_cap_refuses_merge(self):
+        db.upsert_student_record("Alice", "Math", 80, 1, conn=self.conn)
+        self.assertIsNone(db.upsert_student_record("Alice", "Math", 30, 1, conn=self.conn))
+        self.assertEqual(find_duplicate_record("Alice", "Math", conn=self.conn)["marks"], 80)
+
+
+class IterStudentRecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            [(f"Student{i}", "Math", i, 1 + i % 2) for i in range(1, 8)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_streams_all_rows_across_batches(self):
+        rows = list(db.iter_student_records(batch_size=3, conn=self.conn))
+        self.assertEqual([row["marks"] for row in rows], list(range(1, 8)))
+
+    def test_teacher_scope(self):
+        rows = list(db.iter_student_records(teacher_id=2, batch_size=2, conn=self.conn))
+        self.assertEqual([row["marks"] for row in rows], [1, 3, 5, 7])
+
+
+class TeacherRecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.execute("CREATE INDEX idx_student_records_teacher_subject_name "
+                          "ON student_records (teacher_id, subject, student_name)")
+        self.conn.execute("CREATE INDEX idx_student_records_teacher_name ON student_records (teacher_id, student_name)")
+        self.conn.execute("CREATE INDEX idx_student_records_teacher_marks ON student_records (teacher_id, marks)")
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            [("Eve", "Math", 70, 1), ("Alice", "Math", 90, 1), ("Dan", "Art", 70, 2),
+             ("Bob", "Science", 80, 2), ("Carl", "Art", 60, 1)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_only_the_teachers_records(self):
+        page = db.get_teacher_records_page(1, conn=self.conn)
+        self.assertEqual([row["student_name"] for row in page.rows], ["Alice", "Carl", "Eve"])
+        page = db.get_teacher_records_page(1, subject="Math", sort="marks", descending=True, conn=self.conn)
+        self.assertEqual([row["student_name"] for row in page.rows], ["Alice", "Eve"])
+
+    def test_teacher_subjects(self):
+        self.assertEqual(db.get_teacher_subjects(1, conn=self.conn), ["Art", "Math"])
+        self.assertEqual(db.get_teacher_subjects(3, conn=self.conn), [])
+
+    def test_pages_are_index_range_scans(self):
+        queries = [
+            ("SELECT * FROM student_records WHERE teacher_id = ? AND (student_name, id) > (?, ?) "
+             "ORDER BY student_name, id LIMIT 26", (1, "A", 0)),
+            ("SELECT * FROM student_records WHERE teacher_id = ? AND subject = ? "
+             "ORDER BY student_name, id LIMIT 26", (1, "Math")),
+            ("SELECT * FROM student_records WHERE teacher_id = ? ORDER BY marks DESC, id DESC LIMIT 26", (1,)),
+        ]
+        for sql, params in queries:
+            plan = " ".join(row[3] for row in self.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+            self.assertIn("USING INDEX idx_student_records_teacher_", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+class TeacherCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('CREATE TABLE teachers (id INTEGER PRIMARY KEY, username TEXT UNIQUE, password TEXT)')
+        self.conn.execute("INSERT INTO teachers (username, password) VALUES ('cached_teacher', 'old-hash')")
+        self.conn.commit()
+        db.teacher_cache.invalidate()
+
+    def tearDown(self):
+        db.teacher_cache.invalidate()
+        self.conn.close()
+
+    def test_second_lookup_served_from_cache(self):
+        first = get_teacher_by_username("cached_teacher", conn=self.conn)
+        self.conn.execute("DELETE FROM teachers")
+        self.assertIs(get_teacher_by_username("cached_teacher", conn=self.conn), first)
+
+    def test_password_change_invalidates(self):
+        get_teacher_by_username("cached_teacher", conn=self.conn)
+        db.set_teacher_password("cached_teacher", "new-hash", conn=self.conn)
+        self.assertEqual(get_teacher_by_username("cached_teacher", conn=self.conn)["password"], "new-hash")
+
+    def test_entries_expire(self):
+        cache = db.TTLCache(ttl=0.01)
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("key"))
+
+    def test_misses_are_not_cached(self):
+        self.assertIsNone(get_teacher_by_username("nobody", conn=self.conn))
+        self.conn.execute("INSERT INTO teachers (username, password) VALUES ('nobody', 'x')")
+        self.assertIsNotNone(get_teacher_by_username("nobody", conn=self.conn))
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import models
+from db import audit_entry
+from log_writer import LogWriter
+
+
+def entry(detail):
+    return audit_entry('update', 1, 7, 'John Smith', 'Math', 60, 70, detail=detail)
+
+
+class LogWriterTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        conn = sqlite3.connect(self.path)
+        models.create_audit_log_table(conn.cursor())
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def logged(self):
+        conn = self.connect()
+        rows = [row[0] for row in conn.execute('SELECT detail FROM audit_log ORDER BY id')]
+        conn.close()
+        return rows
+
+    def test_messages_written_in_order_after_flush(self):
+        writer = LogWriter(connect=self.connect, batch_size=3, flush_interval=0.05)
+        for i in range(10):
+            self.assertTrue(writer.enqueue(entry(f"msg {i}")))
+        writer.flush()
+        self.assertEqual(self.logged(), [f"msg {i}" for i in range(10)])
+        self.assertEqual(writer.stats()['written'], 10)
+        writer.stop()
+
+    def test_stop_drains_queue(self):
+        writer = LogWriter(connect=self.connect, batch_size=2, flush_interval=10)
+        for i in range(5):
+            writer.enqueue(entry(f"msg {i}"))
+        writer.stop()
+        self.assertEqual(len(self.logged()), 5)
+
+    def test_full_queue_counts_backpressure_and_drops(self):
+        writer = LogWriter(connect=self.connect, max_queue=1, put_timeout=0.01)
+        # Keep the worker from draining so the queue stays full
+        writer.start = lambda: None
+        self.assertTrue(writer.enqueue(entry("first")))
+        self.assertFalse(writer.enqueue(entry("second")))
+        stats = writer.stats()
+        self.assertEqual(stats['backpressured'], 1)
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['queued'], 1)
+
+    def test_rotation_runs_after_writes_at_most_once_per_interval(self):
+        rotations = []
+        writer = LogWriter(connect=self.connect, batch_size=1, flush_interval=0.01,
+                           rotate=lambda conn: rotations.append(conn) or 2, rotate_interval=3600)
+        for i in range(3):
+            writer.enqueue(entry(f"msg {i}"))
+        writer.stop()
+        self.assertEqual(len(self.logged()), 3)
+        self.assertEqual(len(rotations), 1)
+        self.assertEqual(writer.stats()['archived'], 2)
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import metrics
+import pytest
+
+
+class RegistryRenderTests(unittest.TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.MetricsRegistry()
+        histogram = registry.histogram('demo_seconds', 'Demo.', ('route',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, '/a')
+        histogram.observe(0.5, '/a')
+        histogram.observe(5.0, '/a')
+
+        text = registry.render()
+        self.assertIn('# TYPE demo_seconds histogram', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="1.0"} 2', text)
+        self.assertIn('demo_seconds_bucket{route="/a",le="+Inf"} 3', text)
+        self.assertIn('demo_seconds_count{route="/a"} 3', text)
+        self.assertIn('demo_seconds_sum{route="/a"} 5.55', text)
+
+    def test_label_values_are_escaped(self):
+        registry = metrics.MetricsRegistry()
+        registry.counter('demo_total', 'Demo.', ('name',)).inc('say "hi"\n')
+        self.assertIn('demo_total{name="say \\"hi\\"\\n"} 1', registry.render())
+
+    def test_callback_metric(self):
+        registry = metrics.MetricsRegistry()
+        registry.callback('demo_queued', 'Demo.', lambda: 7)
+        self.assertIn('demo_queued 7', registry.render())
+
+
+class TracedCursorTests(unittest.TestCase):
+    def setUp(self):
+        metrics.configure(enabled=True)
+        self.conn = sqlite3.connect(":memory:", factory=db.TracedConnection)
+        self.conn.execute("CREATE TABLE t (n INT)")
+        self.conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(10)])
+
+    def tearDown(self):
+        self.conn.close()
+        metrics.configure(enabled=False)
+
+    def test_rows_are_counted_for_every_fetch_style(self):
+        before = metrics.sql_rows_returned.value('select')
+        statements = metrics.sql_statement_seconds.count('select')
+
+        self.conn.execute("SELECT n FROM t").fetchall()
+        list(self.conn.execute("SELECT n FROM t WHERE n < 3"))
+        cur = self.conn.execute("SELECT n FROM t")
+        while cur.fetchmany(4):
+            pass
+        self.conn.execute("SELECT n FROM t WHERE n = 5").fetchone()
+
+        self.assertEqual(metrics.sql_rows_returned.value('select') - before, 10 + 3 + 10 + 1)
+        self.assertEqual(metrics.sql_statement_seconds.count('select') - statements, 4)
+
+    def test_slow_queries_are_logged(self):
+        metrics.configure(enabled=False, slow_query_ms=0.000001)
+        with self.assertLogs('class_ledger.slow_queries', level='WARNING') as logs:
+            self.conn.execute("SELECT   n\n FROM t").fetchall()
+        self.assertIn('10 rows): SELECT n FROM t', logs.output[0])
+
+    def test_untraced_connection_when_disabled(self):
+        metrics.configure(enabled=False)
+        conn = db.get_db_connection()
+        self.assertNotIsInstance(conn, db.TracedConnection)
+        conn.close()
+
+
+class MetricsEndpointTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def tearDown(self):
+        metrics.configure(enabled=False)
+
+    def test_not_found_when_disabled(self):
+        metrics.configure(enabled=False)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_request_and_sql_metrics_are_exposed(self):
+        self.app.config['METRICS_ENABLED'] = True
+        metrics.configure(enabled=True)  # SQL tracing is process-wide
+        self.client.get('/login')
+        with self.client.session_transaction() as sess:
+            sess['teacher_id'] = 1
+        self.client.get('/home')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn('ledger_http_request_duration_seconds_count{method="GET",endpoint="/home",status="200"}', text)
+        self.assertIn('ledger_http_request_sql_seconds_count{endpoint="/home"}', text)
+        self.assertIn('ledger_template_render_seconds_count{template="home.html"}', text)
+        self.assertIn('ledger_sql_statement_duration_seconds_count{statement="select"}', text)
+        self.assertIn('ledger_audit_log_queued', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
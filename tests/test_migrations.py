@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import models
+
+
+class MigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'ledger.db')
+        env = {'TEACHER_USERNAME': 'alpha', 'TEACHER_PASSWORD': 'pw1',
+               'TEACHER_USERNAME2': 'beta', 'TEACHER_PASSWORD2': 'pw2'}
+        patcher = mock.patch.dict(os.environ, env)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def index_names(self):
+        return {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def test_fresh_database_is_fully_migrated(self):
+        applied = models.migrate(self.path)
+        self.assertEqual(applied, [version for version, _, _ in models.MIGRATIONS])
+        self.assertEqual(self.query('PRAGMA user_version')[0][0], models.SCHEMA_VERSION)
+        self.assertTrue({name for name, _, _ in models.INDEXES} <= self.index_names())
+        self.assertEqual(sorted(row[0] for row in self.query('SELECT username FROM teachers')), ['alpha', 'beta'])
+
+    def test_current_schema_does_no_work(self):
+        models.migrate(self.path)
+        with mock.patch.object(models, 'generate_password_hash') as hash_password:
+            self.assertEqual(models.migrate(self.path), [])
+        hash_password.assert_not_called()
+
+    def test_only_missing_teachers_are_hashed(self):
+        models.migrate(self.path)
+        with mock.patch.dict(os.environ, {'TEACHER_USERNAME2': 'gamma'}), \
+                mock.patch.object(models, 'generate_password_hash', return_value='hashed') as hash_password:
+            models.migrate(self.path)
+        hash_password.assert_called_once_with('pw2')
+        self.assertEqual(self.query("SELECT password FROM teachers WHERE username = 'gamma'"), [('hashed',)])
+
+    def test_deferred_indexes_are_built_later(self):
+        models.migrate(self.path, defer_indexes=True)
+        self.assertNotIn('idx_student_records_teacher_marks', self.index_names())
+        self.assertIn('unique_student_subject', self.index_names())  # Schema, never deferred
+
+        conn = sqlite3.connect(self.path)
+        self.assertEqual(len(models.missing_indexes(conn)), len(models.INDEXES))
+        conn.close()
+
+        models.create_indexes_in_background(self.path).join()
+        self.assertEqual(models.create_indexes(self.path), [])
+        self.assertTrue({name for name, _, _ in models.INDEXES} <= self.index_names())
+
+    def test_unversioned_database_is_upgraded(self):
+        # A database from before versioning: base tables and data, user_version 0
+        conn = sqlite3.connect(self.path)
+        models._create_base_tables(conn.cursor())
+        conn.execute("INSERT INTO student_records (student_name, subject, marks, teacher_id) "
+                     "VALUES ('Old Pupil', 'Math', 70, 1)")
+        conn.commit()
+        conn.close()
+
+        models.migrate(self.path)
+        self.assertEqual(self.query('PRAGMA user_version')[0][0], models.SCHEMA_VERSION)
+        # Later steps backfilled from the existing rows
+        self.assertEqual(self.query("SELECT rowid FROM student_records_fts WHERE student_records_fts MATCH 'old'"),
+                         [(1,)])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM student_records')[0][0], 1)
+
+    def test_failed_step_leaves_version_unchanged(self):
+        def broken(cur):
+            cur.execute('CREATE TABLE half_done (id INTEGER)')
+            raise RuntimeError('boom')
+
+        models.migrate(self.path)
+        steps = models.MIGRATIONS + ((models.SCHEMA_VERSION + 1, 'broken', broken),)
+        with mock.patch.object(models, 'MIGRATIONS', steps), self.assertRaises(RuntimeError):
+            models.migrate(self.path)
+        self.assertEqual(self.query('PRAGMA user_version')[0][0], models.SCHEMA_VERSION)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'half_done'"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+from flask import Flask
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+from read_replica import ReadReplica
+
+
+class ReadReplicaTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'ledger.db')
+        models.migrate(self.path)
+        self.primary = sqlite3.connect(self.path, factory=db.LedgerConnection)
+        self.primary.row_factory = sqlite3.Row
+        self.addCleanup(self.primary.close)
+        db.insert_student_record('John Smith', 'Math', 70, 1, conn=self.primary)
+
+        # Polled by hand: no background thread racing the assertions
+        self.replica = ReadReplica(self.path, max_staleness=60, poll_interval=3600,
+                                   connection_factory=db.LedgerConnection)
+        self.replica.start()
+        self.addCleanup(self.replica.stop)
+
+    def read(self):
+        conn = self.replica.connect()
+        self.assertIsNotNone(conn)
+        try:
+            return [row['student_name'] for row in db.get_all_student_records(conn=conn)]
+        finally:
+            conn.close()
+
+    def test_reads_come_from_the_copy(self):
+        self.assertEqual(self.read(), ['John Smith'])
+        conn = self.replica.connect()
+        self.assertEqual(db.find_duplicate_record('john smith', 'MATH', conn=conn)['marks'], 70)
+        with self.assertRaises(sqlite3.OperationalError):  # Read-only
+            conn.execute("DELETE FROM student_records")
+        conn.close()
+        self.assertEqual(self.replica.stats()['replica'], 2)
+
+    def test_other_writers_are_picked_up_by_polling(self):
+        self.assertFalse(self.replica.poll())  # Unchanged file -> no copy
+        db.insert_student_record('Mary Jones', 'Art', 80, 2, conn=self.primary)
+        self.assertTrue(self.replica.poll())
+        self.assertEqual(sorted(self.read()), ['John Smith', 'Mary Jones'])
+        self.assertEqual(self.replica.stats()['refreshes'], 2)
+
+    def test_audit_log_writes_do_not_refresh(self):
+        db.insert_audit_entries([db.audit_entry('update', 1, detail='something happened')], conn=self.primary)
+        self.assertFalse(self.replica.poll())
+        self.assertEqual(self.replica.stats()['refreshes'], 1)
+
+    def test_local_writes_fall_back_to_the_primary(self):
+        self.replica.mark_stale()
+        self.assertIsNone(self.replica.connect())
+        self.assertEqual(self.replica.stats()['primary'], 1)
+        self.replica.poll()  # Confirms a copy taken after the write
+        self.assertTrue(self.replica.is_fresh())
+
+    def test_staleness_bound(self):
+        self.replica.max_staleness = 0.05
+        time.sleep(0.1)
+        self.assertIsNone(self.replica.connect())
+        self.assertGreater(self.replica.stats()['lag_seconds'], 0.05)
+        self.replica.poll()
+        self.assertIsNotNone(self.replica.connect())
+
+    def test_readers_keep_their_copy_across_a_refresh(self):
+        reader = self.replica.connect()
+        db.insert_student_record('Mary Jones', 'Art', 80, 2, conn=self.primary)
+        self.replica.poll()
+        self.assertEqual(len(db.get_all_student_records(conn=reader)), 1)  # Old copy, still open
+        reader.close()
+        self.assertEqual(len(self.read()), 2)
+
+
+class ReplicaRoutingTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'class-ledger.db')
+        self.addCleanup(db.configure, **vars(db.settings))  # Restore the suite's backend afterwards
+        db.configure(database_path=path, read_replica=True, replica_max_staleness_ms=60000)
+        models.migrate(path)
+        db.insert_student_record('John Smith', 'Math', 70, 1)
+        self.app = Flask(__name__)
+        db.init_app(self.app)
+
+    def test_reads_use_the_replica_until_the_request_writes(self):
+        with self.app.app_context():
+            self.assertEqual(len(db.get_all_student_records()), 1)
+            self.assertIs(db.get_replica_connection(), db.g.replica_conn)
+            record_id = db.find_duplicate_record('John Smith', 'Math')['id']
+            db.update_student_record(record_id, 'John Smith', 'Math', 75)
+            # Read-your-writes: straight back to the primary
+            self.assertEqual(db.fetch_student_record_by_id(record_id)['marks'], 75)
+            self.assertNotIn('replica_conn', db.g)
+        stats = db.read_replica_stats()
+        self.assertEqual((stats['replica'], stats['primary']), (1, 1))
+
+    def test_unit_of_work_reads_the_primary(self):
+        with self.app.app_context(), db.unit_of_work():
+            self.assertIsNone(db.get_replica_connection())
+            db.insert_student_record('Mary Jones', 'Art', 80, 2)
+            self.assertIsNotNone(db.find_duplicate_record('Mary Jones', 'Art'))
+
+    def test_disabled_by_default_and_for_postgres(self):
+        db.configure()
+        self.assertIsNone(db.get_read_replica())
+        db.configure(backend='postgres', read_replica=True)  # Nothing connects until first use
+        self.assertFalse(db.settings.read_replica)
+
+
+if __name__ == '__main__':
+    unittest.main()
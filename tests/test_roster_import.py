@@ -0,0 +1,111 @@
+import io
+import os
+import re
+import sqlite3
+import sys
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+from roster_import import import_roster
+import pytest
+
+
+class ImportRosterTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE UNIQUE INDEX unique_student_subject
+            ON student_records (LOWER(student_name), LOWER(subject))
+        ''')
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def run_import(self, text, batch_size=2):
+        return import_roster(io.StringIO(text), 1, batch_size=batch_size, conn=self.conn)
+
+    def test_valid_rows_are_inserted_and_merged(self):
+        report = self.run_import(
+            "student_name,subject,marks\n"
+            "Alice,Math,40\n"
+            "Bob,Math,50\n"
+            "alice,MATH,30\n"
+        )
+        self.assertEqual(report, (3, 3, []))
+        alice = db.find_duplicate_record("Alice", "Math", conn=self.conn)
+        self.assertEqual(alice["marks"], 70)
+        self.assertEqual(alice["student_name"], "alice")
+
+    def test_invalid_rows_are_reported_with_line_numbers(self):
+        report = self.run_import(
+            "student_name,subject,marks\n"
+            "A1,Math,40\n"
+            "Bob,,50\n"
+            "Carl,Math,abc\n"
+            "Dana,Math,101\n"
+            "Eve,Math,20\n"
+        )
+        self.assertEqual(report.total_rows, 5)
+        self.assertEqual(report.imported_rows, 1)
+        self.assertEqual([line for line, _ in report.errors], [2, 3, 4, 5])
+        self.assertIn("Name must contain only letters", report.errors[0][1])
+
+    def test_cap_is_checked_across_batches_and_existing_rows(self):
+        db.upsert_student_record("Alice", "Math", 60, 1, conn=self.conn)
+        report = self.run_import(
+            "student_name,subject,marks\n"
+            "Alice,Math,30\n"
+            "Bob,Math,10\n"
+            "Alice,Math,20\n"
+        )
+        self.assertEqual(report.imported_rows, 2)
+        self.assertEqual(report.errors[0][0], 4)
+        self.assertEqual(db.find_duplicate_record("Alice", "Math", conn=self.conn)["marks"], 90)
+
+    def test_missing_column(self):
+        report = self.run_import("student_name,marks\nAlice,40\n")
+        self.assertEqual(report.imported_rows, 0)
+        self.assertIn("subject", report.errors[0][1])
+
+
+class ImportRouteTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def test_upload_returns_json_report(self):
+        with self.client as c:
+            login_page = c.get('/login')
+            csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                             login_page.get_data(as_text=True)).group(1)
+            c.post('/login', data={
+                'teacher_username': os.getenv("TEACHER_USERNAME"),
+                'teacher_password': os.getenv("TEACHER_PASSWORD"),
+                'csrf_token': csrf
+            })
+
+            roster = b"student_name,subject,marks\nImport Tester,Roster Study,5\nBad 1,Math,5\n"
+            response = c.post('/import_records', data={
+                'roster': (io.BytesIO(roster), 'roster.csv'),
+                'csrf_token': csrf
+            }, headers={'Accept': 'application/json'}, content_type='multipart/form-data')
+
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['total_rows'], 2)
+            self.assertEqual(response.json['imported_rows'], 1)
+            self.assertEqual(response.json['errors'][0]['line'], 3)
@@ -0,0 +1,146 @@
+import os
+import re
+import sqlite3
+import sys
+import unittest
+from unittest import mock
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+import pytest
+
+
+class SearchStudentRecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        self.conn.execute("INSERT INTO student_records (student_name, subject, marks, teacher_id) "
+                          "VALUES ('Existing Pupil', 'Latin', 40, 1)")
+        models.create_search_index(self.conn.cursor())
+        models.rebuild_search_index(self.conn.cursor())
+        self.conn.executemany(
+            "INSERT INTO student_records (student_name, subject, marks, teacher_id) VALUES (?, ?, ?, ?)",
+            [('John Smith', 'Math', 70, 1),
+             ('Johanna Math', 'History', 80, 2),
+             ('Mary Jones', 'Mathematics', 90, 1),
+             ('Peter Pan', 'Art', 50, 2)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def names(self, query, **kwargs):
+        page = db.search_student_records(query, conn=self.conn, **kwargs)
+        return [row['student_name'] for row in page.rows]
+
+    def test_query_building(self):
+        self.assertEqual(db.build_search_query('jo  sm'), '"jo"* "sm"*')
+        self.assertEqual(db.build_search_query('a OR "b'), '"a" "OR"* "b"')
+        self.assertIsNone(db.build_search_query(' -*" '))
+        self.assertEqual(self.names('"* OR'), [])
+
+    def test_prefix_matching_across_columns(self):
+        self.assertEqual(sorted(self.names('joh')), ['Johanna Math', 'John Smith'])
+        self.assertEqual(self.names('jo sm'), ['John Smith'])
+        self.assertEqual(self.names('existing'), ['Existing Pupil'])  # Backfilled
+        self.assertEqual(self.names('xyz'), [])
+
+    def test_name_matches_rank_above_subject_matches(self):
+        self.assertEqual(self.names('math')[0], 'Johanna Math')
+        self.assertEqual(len(self.names('math')), 3)
+
+    def test_filters_and_projection(self):
+        self.assertEqual(sorted(self.names('math', teacher_id=1)), ['John Smith', 'Mary Jones'])
+        self.assertEqual(self.names('math', subject='History'), ['Johanna Math'])
+        page = db.search_student_records('peter', fields=('marks',), conn=self.conn)
+        self.assertEqual(page.rows, [(50,)])
+
+    def test_pagination_walks_the_ranking(self):
+        first = db.search_student_records('math', page_size=2, conn=self.conn)
+        second = db.search_student_records('math', page_size=2, after=first.next_cursor, conn=self.conn)
+        self.assertEqual(len(first.rows), 2)
+        self.assertEqual(len(second.rows), 1)
+        self.assertIsNone(second.next_cursor)
+        seen = [row['id'] for row in first.rows + second.rows]
+        self.assertEqual(len(set(seen)), 3)
+
+        back = db.search_student_records('math', page_size=2, before=second.prev_cursor, conn=self.conn)
+        self.assertEqual([row['id'] for row in back.rows], [row['id'] for row in first.rows])
+
+    def test_broad_queries_fall_back_to_id_order(self):
+        with mock.patch.object(db, 'SEARCH_RANK_LIMIT', 2):
+            first = db.search_student_records('math', page_size=2, conn=self.conn)
+            second = db.search_student_records('math', page_size=2, after=first.next_cursor, conn=self.conn)
+        ids = [row['id'] for row in first.rows + second.rows]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 3)
+
+    def test_rank_limit_counts_filtered_matches(self):
+        # 'math' matches 3 records, but only 2 of teacher 1's: within the limit, so ranked
+        with mock.patch.object(db, 'SEARCH_RANK_LIMIT', 2):
+            page = db.search_student_records('math', teacher_id=1, page_size=1, conn=self.conn)
+        self.assertIsInstance(db.decode_cursor(page.next_cursor)[0], float)  # (score, id), not (id, id)
+
+    def test_triggers_keep_index_in_sync(self):
+        record_id = self.conn.execute("SELECT id FROM student_records WHERE student_name = 'Peter Pan'").fetchone()[0]
+        self.conn.execute("UPDATE student_records SET student_name = 'Wendy Darling' WHERE id = ?", (record_id,))
+        self.assertEqual(self.names('peter'), [])
+        self.assertEqual(self.names('wend'), ['Wendy Darling'])
+
+        self.conn.execute("UPDATE student_records SET marks = 99 WHERE id = ?", (record_id,))
+        self.assertEqual(self.names('wend'), ['Wendy Darling'])
+
+        self.conn.execute("DELETE FROM student_records WHERE id = ?", (record_id,))
+        self.assertEqual(self.names('wend'), [])
+        # Raises if the index and student_records disagree
+        self.conn.execute("INSERT INTO student_records_fts (student_records_fts) VALUES ('integrity-check')")
+
+
+class SearchRouteTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
+
+    def login(self, c):
+        login_page = c.get('/login')
+        csrf = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"',
+                         login_page.get_data(as_text=True)).group(1)
+        c.post('/login', data={
+            'teacher_username': os.getenv("TEACHER_USERNAME"),
+            'teacher_password': os.getenv("TEACHER_PASSWORD"),
+            'csrf_token': csrf
+        })
+        return csrf
+
+    def test_search_box_and_api(self):
+        with self.client as c:
+            csrf = self.login(c)
+            c.post('/add_student', data={
+                'student_name': 'Searchable Quokka', 'subject': 'Zoology', 'marks': 33, 'csrf_token': csrf
+            })
+
+            home = c.get('/home?q=quok')
+            html = home.get_data(as_text=True)
+            self.assertIn('name="q"', html)
+            self.assertIn('Searchable Quokka', html)
+
+            response = c.get('/api/records?q=searchable+quo&fields=student_name,subject')
+            self.assertEqual(response.json['records'][0],
+                             {'student_name': 'Searchable Quokka', 'subject': 'Zoology'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+
+# PostgreSQL runs need a scratch database (its tables are truncated), e.g.
+# TEST_DATABASE_URL=postgresql://localhost/ledger_test python -m pytest
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+try:
+    import postgres_backend
+    from psycopg_pool import PoolTimeout
+except ImportError:  # psycopg not installed
+    postgres_backend = None
+
+
+# ---------------------------------------------------------
+# The same checks against every storage backend: each subclass
+# provides a connection to an empty, fully migrated database
+# ---------------------------------------------------------
+class BackendContract:
+    def setUp(self):
+        self.conn = self.connect()
+        self.addCleanup(self.conn.close)
+        db.upsert_student_records_many([
+            ('John Smith', 'Math', 70, 1), ('Johanna Math', 'History', 80, 2),
+            ('Mary Jones', 'Mathematics', 90, 1), ('Peter Pan', 'Art', 50, 2)], conn=self.conn)
+
+    def test_rows_read_like_sqlite_rows(self):
+        row = db.find_duplicate_record('john smith', 'MATH', conn=self.conn)
+        self.assertEqual(row['student_name'], 'John Smith')
+        self.assertEqual(row[1], 'John Smith')
+        self.assertEqual(dict(row)['marks'], 70)
+        self.assertIn('teacher_id', row.keys())
+
+    def test_upsert_reports_whether_it_inserted(self):
+        created = db.upsert_student_record('Zero Pupil', 'Math', 0, 1, conn=self.conn)
+        self.assertTrue(created['inserted'])
+        merged = db.upsert_student_record('ZERO PUPIL', 'math', 30, 1, conn=self.conn)  # Into a 0-mark record
+        self.assertFalse(merged['inserted'])
+        self.assertEqual((merged['id'], merged['marks']), (created['id'], 30))
+
+    def test_upsert_adds_marks_up_to_the_cap(self):
+        merged = db.upsert_student_record('JOHN SMITH', 'math', 20, 1, conn=self.conn)
+        self.assertEqual(merged['marks'], 90)
+        self.assertIsNone(db.upsert_student_record('John Smith', 'Math', 20, 1, conn=self.conn))
+        self.assertEqual(db.get_marks_for_record_keys([db.record_key('john smith', 'math'),
+                                                       db.record_key('nobody', 'math')], conn=self.conn),
+                         {('john smith', 'math'): 90})
+
+    def test_keyset_pages_in_both_directions(self):
+        first = db.get_student_records_page(sort='marks', page_size=3, conn=self.conn)
+        second = db.get_student_records_page(sort='marks', page_size=3, after=first.next_cursor, conn=self.conn)
+        self.assertEqual([row['marks'] for row in first.rows + second.rows], [50, 70, 80, 90])
+        back = db.get_student_records_page(sort='marks', page_size=3, before=second.prev_cursor, conn=self.conn)
+        self.assertEqual([row['id'] for row in back.rows], [row['id'] for row in first.rows])
+        mine = db.get_teacher_records_page(1, fields=('student_name',), conn=self.conn)
+        self.assertEqual(mine.rows, [('John Smith',), ('Mary Jones',)])
+
+    def test_bulk_helpers(self):
+        john = db.find_duplicate_record('John Smith', 'Math', conn=self.conn)['id']
+        mary = db.find_duplicate_record('Mary Jones', 'Mathematics', conn=self.conn)['id']
+        self.assertEqual(db.find_duplicate_records_many([(john, 'john smith', 'math'),
+                                                         (mary, 'John Smith', 'Math')], conn=self.conn),
+                         [(mary, john)])
+        db.update_student_records_many([(john, 'John Smith', 'Math', 75)], conn=self.conn)
+        db.delete_student_records_many([mary], conn=self.conn)
+        self.assertEqual(sorted(db.fetch_student_records_by_ids([john, mary], conn=self.conn)), [john])
+
+    def test_search_ranks_names_first_and_pages(self):
+        page = db.search_student_records('math', page_size=2, conn=self.conn)
+        self.assertEqual(page.rows[0]['student_name'], 'Johanna Math')
+        rest = db.search_student_records('math', page_size=2, after=page.next_cursor, conn=self.conn)
+        self.assertEqual(len(page.rows + rest.rows), 3)
+        self.assertEqual([row[0] for row in db.search_student_records('jo sm', fields=('student_name',),
+                                                                      conn=self.conn).rows], ['John Smith'])
+        self.assertEqual(db.search_student_records('" OR *', conn=self.conn).rows, [])
+
+    def test_summaries_follow_writes(self):
+        db.insert_student_record('Wendy Darling', 'Art', 95, 2, conn=self.conn)
+        art = db.get_subject_summaries('Art', conn=self.conn)[0]
+        self.assertEqual((art['record_count'], art['marks_min'], art['marks_max']), (2, 50, 95))
+        db.delete_student_record(db.find_duplicate_record('Wendy Darling', 'Art', conn=self.conn)['id'],
+                                 conn=self.conn)
+        art = db.get_subject_summaries('Art', conn=self.conn)[0]
+        self.assertEqual((art['record_count'], art['marks_max'], art['mean']), (1, 50, 50))
+        self.assertEqual([summary['key'] for summary in db.get_teacher_summaries(conn=self.conn)], [1, 2])
+
+    def test_data_version_changes_on_write(self):
+        before = db.get_data_version(conn=self.conn)
+        db.insert_student_record('New Pupil', 'Art', 10, 1, conn=self.conn)
+        self.assertNotEqual(db.get_data_version(conn=self.conn), before)
+
+    def test_streaming_reads(self):
+        names = [row['student_name'] for row in db.iter_student_records(batch_size=2, conn=self.conn)]
+        self.assertEqual(len(names), 4)
+        self.assertEqual([row['student_name'] for row in db.iter_student_records(teacher_id=2, conn=self.conn)],
+                         ['Johanna Math', 'Peter Pan'])
+        marks = list(db.iter_subject_marks('Math', batch_size=1, conn=self.conn))
+        self.assertEqual([type(row) for row in marks], [tuple])
+        self.assertEqual(marks[0][1], 70)
+
+    def test_unit_of_work_rolls_back(self):
+        with self.assertRaises(RuntimeError), db.unit_of_work(self.conn):
+            db.insert_student_record('Ghost', 'Art', 1, 1, conn=self.conn)
+            raise RuntimeError
+        self.assertIsNone(db.find_duplicate_record('Ghost', 'Art', conn=self.conn))
+
+
+class SQLiteBackendTests(BackendContract, unittest.TestCase):
+    def connect(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'ledger.db')
+        models.migrate(path)
+        conn = sqlite3.connect(path, factory=db.LedgerConnection)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+@unittest.skipUnless(TEST_DATABASE_URL and postgres_backend, "set TEST_DATABASE_URL (and install psycopg)")
+class PostgresBackendTests(BackendContract, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        postgres_backend.create_schema(TEST_DATABASE_URL)
+        cls.backend = postgres_backend.PostgresBackend(TEST_DATABASE_URL, pool_min_size=1, pool_max_size=2,
+                                                       pool_timeout=0.5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.backend.close()
+
+    def connect(self):
+        conn = self.backend.connect()
+        conn.execute("TRUNCATE student_records, audit_log, subject_summary, teacher_summary RESTART IDENTITY")
+        conn.commit()
+        return conn
+
+    def test_pool_is_bounded(self):
+        other = self.backend.connect()  # Second and last connection
+        with self.assertRaises(PoolTimeout):
+            self.backend.connect()
+        other.close()
+        self.backend.connect().close()  # Returned connections are reused
+
+    def test_placeholders_and_percent_signs(self):
+        self.assertEqual(postgres_backend.to_postgres_sql("SELECT ? WHERE x LIKE '5%'"),
+                         "SELECT %s WHERE x LIKE '5%%'")
+        self.assertEqual(self.conn.execute("SELECT ? || '%'", ('50',)).fetchone()[0], '50%')
+
+
+if __name__ == '__main__':
+    unittest.main()
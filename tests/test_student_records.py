@@ -1,7 +1,7 @@
 import unittest
 import os
 import re
-from app import app
+import pytest
 
 class StudentRecordTests(unittest.TestCase):
 
@@ -10,9 +10,10 @@ class StudentRecordTests(unittest.TestCase):
         match = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', html)
         return match.group(1) if match else None
 
-    def setUp(self):
-        app.config['TESTING'] = True
-        self.client = app.test_client()
+    @pytest.fixture(autouse=True)
+    def _client(self, app, client):
+        self.app = app
+        self.client = client
 
     def test_add_student_and_merge(self):
         with self.client as c:
@@ -47,6 +48,23 @@ class StudentRecordTests(unittest.TestCase):
 
             self.assertIn(b'Merged with existing record', response.data)
 
+    def test_adding_to_a_zero_mark_record_is_a_merge(self):
+        import db
+        teacher_id = db.get_teacher_by_username(os.getenv("TEACHER_USERNAME"))['id']
+        record_id = db.upsert_student_record('Zero Pupil', 'Zeroes', 0, teacher_id)['id']
+        self.addCleanup(db.delete_student_record, record_id)
+
+        with self.client as c:
+            self.login_as_teacher1(c)
+            response = c.post('/add_student', follow_redirects=True, data={
+                'student_name': 'Zero Pupil', 'subject': 'Zeroes', 'marks': 20,
+                'csrf_token': self.extract_csrf_token(c.get('/home').get_data(as_text=True))})
+            self.assertIn(b'Merged with existing record. Total marks: 20', response.data)
+
+        self.app.extensions['ledger'].audit_log.flush()
+        entry = db.get_audit_history(record_id).rows[0]
+        self.assertEqual((entry['action'], entry['old_marks'], entry['new_marks']), ('merge', 0, 20))
+
     def test_edit_and_delete_student(self):
         with self.client as c:
             # Login
@@ -92,3 +110,187 @@ class StudentRecordTests(unittest.TestCase):
             final_page = c.get('/home')
             self.assertNotIn(b'Jane Updated', final_page.data)
 
+    def test_partial_updates_return_only_the_changed_row(self):
+        with self.client as c:
+            self.login_as_teacher1(c)
+            csrf_token = self.extract_csrf_token(c.get('/home').get_data(as_text=True))
+            headers = {'Accept': 'application/json'}
+
+            added = c.post('/add_student', headers=headers, data={
+                'student_name': 'Partial Pupil', 'subject': 'Ajax', 'marks': 30, 'csrf_token': csrf_token})
+            self.assertEqual(added.status_code, 200)
+            record_id = added.json['record']['id']
+            self.assertTrue(added.json['row'].startswith(f'<tr id="row-{record_id}">'))
+            self.assertEqual(added.json['messages'], [{'category': 'success',
+                                                       'message': 'Student record successfully added.'}])
+
+            edited = c.post(f'/edit_record/{record_id}', headers=headers, data={
+                'name': 'Partial Pupil', 'subject': 'Ajax', 'marks': '45', 'csrf_token': csrf_token})
+            self.assertEqual(edited.json['record']['marks'], 45)
+            self.assertIn('value="45"', edited.json['row'])
+            self.assertNotIn('<table', edited.json['row'])
+
+            invalid = c.post(f'/edit_record/{record_id}', headers=headers, data={
+                'name': 'Partial Pupil', 'subject': 'Ajax', 'marks': 'many', 'csrf_token': csrf_token})
+            self.assertEqual(invalid.status_code, 400)
+            self.assertNotIn('row', invalid.json)
+
+            removed = c.post(f'/remove_record/{record_id}', headers=headers, data={'csrf_token': csrf_token})
+            self.assertEqual(removed.json['removed'], record_id)
+            # Flashes went into the JSON answers, not the next page
+            self.assertNotIn(b'class="flash-message', c.get('/home').data)
+
+
+    def test_export_streams_csv_and_jsonl(self):
+        with self.client as c:
+            login_page = c.get('/login')
+            csrf_login = self.extract_csrf_token(login_page.get_data(as_text=True))
+            c.post('/login', data={
+                'teacher_username': os.getenv("TEACHER_USERNAME"),
+                'teacher_password': os.getenv("TEACHER_PASSWORD"),
+                'csrf_token': csrf_login
+            }, follow_redirects=True)
+
+            csv_response = c.get('/export?format=csv&scope=all')
+            self.assertEqual(csv_response.status_code, 200)
+            self.assertTrue(csv_response.is_streamed)
+            self.assertEqual(csv_response.mimetype, 'text/csv')
+            self.assertTrue(csv_response.get_data(as_text=True).startswith('id,student_name,subject,marks,teacher_id'))
+
+            jsonl_response = c.get('/export?format=jsonl')
+            self.assertEqual(jsonl_response.mimetype, 'application/x-ndjson')
+            for line in jsonl_response.get_data(as_text=True).splitlines():
+                self.assertIn('"student_name"', line)
+
+            self.assertEqual(c.get('/export?format=xml').status_code, 400)
+
+    def test_home_conditional_get(self):
+        with self.client as c:
+            login_page = c.get('/login')
+            csrf_login = self.extract_csrf_token(login_page.get_data(as_text=True))
+            c.post('/login', data={
+                'teacher_username': os.getenv("TEACHER_USERNAME"),
+                'teacher_password': os.getenv("TEACHER_PASSWORD"),
+                'csrf_token': csrf_login
+            }, follow_redirects=True)
+
+            first = c.get('/home')
+            etag = first.headers.get('ETag')
+            self.assertIsNotNone(etag)
+
+            # Unchanged data -> 304 with no body
+            cached = c.get('/home', headers={'If-None-Match': etag})
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached.data, b'')
+
+            # A write bumps the data version -> full page again
+            c.post('/add_student', data={
+                'student_name': 'Etag Student',
+                'subject': 'Caching',
+                'marks': 10,
+                'csrf_token': self.extract_csrf_token(first.get_data(as_text=True))
+            }, follow_redirects=True)
+            fresh = c.get('/home', headers={'If-None-Match': etag})
+            self.assertEqual(fresh.status_code, 200)
+            self.assertIn(b'Etag Student', fresh.data)
+
+    def test_home_streams_the_head_before_the_records(self):
+        import db
+        teacher_id = db.get_teacher_by_username(os.getenv("TEACHER_USERNAME"))['id']
+        record_id = db.upsert_student_record('Streamed Pupil', 'Streaming', 50, teacher_id)['id']
+        self.addCleanup(db.delete_student_record, record_id)
+
+        with self.client as c:
+            self.login_as_teacher1(c)
+            self.app.extensions['ledger'].fragment_cache.invalidate()
+
+            streamed = c.get('/home?subject=Streaming')
+            self.assertIsNotNone(streamed.headers.get('ETag'))
+            chunks = iter(streamed.response)
+            head = next(chunks)
+            self.assertIn(b'id="addModal"', head)
+            self.assertNotIn(b'Streamed Pupil', head)  # Sent before the records query
+            page = head + b''.join(chunks)
+            self.assertIn(b'Streamed Pupil', page)
+
+            # The streamed table was cached: the same page now comes in one piece
+            cached = list(c.get('/home?subject=Streaming').response)
+            self.assertEqual(cached, [page])
+
+    def login_as_teacher1(self, c):
+        login_page = c.get('/login')
+        c.post('/login', data={
+            'teacher_username': os.getenv("TEACHER_USERNAME"),
+            'teacher_password': os.getenv("TEACHER_PASSWORD"),
+            'csrf_token': self.extract_csrf_token(login_page.get_data(as_text=True))
+        }, follow_redirects=True)
+
+    def test_home_defaults_to_my_records(self):
+        from db import upsert_student_record
+        upsert_student_record('Other Teachers Pupil', 'Scoping', 40, 999)
+
+        self.app.config['ADMIN_USERNAMES'] = set()
+        with self.client as c:
+            self.login_as_teacher1(c)
+            self.assertNotIn(b'Other Teachers Pupil', c.get('/home?subject=Scoping').data)
+            # Non-admins can't widen the scope
+            self.assertNotIn(b'Other Teachers Pupil', c.get('/home?subject=Scoping&scope=all').data)
+            self.assertNotIn(b'All records', c.get('/home').data)
+            api = c.get('/api/records?subject=Scoping&fields=student_name')
+            self.assertEqual(api.json['records'], [])
+
+        self.app.config['ADMIN_USERNAMES'] = {os.getenv("TEACHER_USERNAME")}
+        with self.app.test_client() as c:
+            self.login_as_teacher1(c)
+            self.assertIn(b'All records', c.get('/home').data)
+            self.assertNotIn(b'Other Teachers Pupil', c.get('/home?subject=Scoping').data)
+            self.assertIn(b'Other Teachers Pupil', c.get('/home?subject=Scoping&scope=all').data)
+            api = c.get('/api/records?subject=Scoping&scope=all&fields=student_name')
+            self.assertEqual(api.json['records'], [{'student_name': 'Other Teachers Pupil'}])
+
+    def test_export_of_all_records_is_for_admins_only(self):
+        from db import upsert_student_record
+        upsert_student_record('Other Teachers Pupil', 'Exporting', 40, 999)
+
+        self.app.config['ADMIN_USERNAMES'] = set()
+        with self.client as c:
+            self.login_as_teacher1(c)
+            self.assertNotIn(b'scope=all', c.get('/home').data)  # No "All CSV" / "All JSONL" links
+            for export_format in ('csv', 'jsonl'):
+                export = c.get(f'/export?format={export_format}&scope=all').get_data(as_text=True)
+                self.assertNotIn('Other Teachers Pupil', export)
+
+        self.app.config['ADMIN_USERNAMES'] = {os.getenv("TEACHER_USERNAME")}
+        with self.app.test_client() as c:
+            self.login_as_teacher1(c)
+            self.assertIn('Other Teachers Pupil', c.get('/export?format=csv&scope=all').get_data(as_text=True))
+
+
+class AppIsolationTests(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _apps(self, app, app_config, tmp_path):
+        if app_config['STORAGE_BACKEND'] != 'sqlite':
+            pytest.skip("PostgreSQL runs share DATABASE_URL")
+        import models
+        from app import create_app
+        other_path = str(tmp_path / 'other-ledger.db')
+        models.migrate(other_path)
+        self.app = app
+        self.other_app = create_app(dict(app_config, DATABASE_PATH=other_path))
+        yield
+        self.other_app.extensions['ledger'].close()
+
+    def records_seen_by(self, flask_app):
+        with flask_app.test_client() as c:
+            with c.session_transaction() as sess:
+                sess['teacher_id'] = 1
+            return c.get('/api/records?subject=Isolation&fields=student_name').json['records']
+
+    def test_apps_use_their_own_database(self):
+        from db import upsert_student_record
+        upsert_student_record('Isolated Pupil', 'Isolation', 40, 1)  # The first app's database (see conftest.py)
+
+        self.assertEqual(self.records_seen_by(self.app), [{'student_name': 'Isolated Pupil'}])
+        self.assertEqual(self.records_seen_by(self.other_app), [])
+        # Creating the second app didn't repoint the first
+        self.assertEqual(self.records_seen_by(self.app), [{'student_name': 'Isolated Pupil'}])
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+# Add the project root directory to sys.path so you can import from app root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db
+import models
+
+
+class SummaryTriggerTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", factory=db.LedgerConnection)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('''
+            CREATE TABLE student_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_name TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                marks INT NOT NULL,
+                teacher_id INT NOT NULL
+            )
+        ''')
+        models.create_summary_tables(self.conn.cursor())
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def insert(self, name, subject, marks, teacher_id=1):
+        db.insert_student_record(name, subject, marks, teacher_id, conn=self.conn)
+
+    def expected(self, column):
+        rows = self.conn.execute(f'''
+            SELECT {column}, COUNT(*), SUM(marks), MIN(marks), MAX(marks), SUM(marks * marks)
+            FROM student_records GROUP BY {column} ORDER BY {column}
+        ''').fetchall()
+        return [tuple(row) for row in rows]
+
+    def actual(self, table, column):
+        rows = self.conn.execute(f'''
+            SELECT {column}, record_count, marks_sum, marks_min, marks_max, marks_sum_sq
+            FROM {table} ORDER BY {column}
+        ''').fetchall()
+        return [tuple(row) for row in rows]
+
+    def assert_in_sync(self):
+        self.assertEqual(self.actual('subject_summary', 'subject'), self.expected('subject'))
+        self.assertEqual(self.actual('teacher_summary', 'teacher_id'), self.expected('teacher_id'))
+
+    def test_insert_update_delete_keep_summaries_in_sync(self):
+        self.insert("Alice", "Math", 90)
+        self.insert("Bob", "Math", 40, teacher_id=2)
+        self.insert("Carl", "Art", 70)
+        self.assert_in_sync()
+
+        # Remove the subject maximum -> max recomputed from remaining rows
+        alice = db.find_duplicate_record("Alice", "Math", conn=self.conn)
+        db.update_student_record(alice["id"], "Alice", "Math", 10, conn=self.conn)
+        self.assert_in_sync()
+
+        # Move a record to another subject
+        bob = db.find_duplicate_record("Bob", "Math", conn=self.conn)
+        db.update_student_record(bob["id"], "Bob", "Art", 40, conn=self.conn)
+        self.assert_in_sync()
+
+        # Moving teachers is tracked too
+        self.conn.execute("UPDATE student_records SET teacher_id = 3 WHERE id = ?", (bob["id"],))
+        self.assert_in_sync()
+
+        # Empty groups disappear
+        db.delete_student_record(alice["id"], conn=self.conn)
+        self.assert_in_sync()
+        self.assertEqual([s["key"] for s in db.get_subject_summaries(conn=self.conn)], ["Art"])
+
+    def test_derived_mean_and_std(self):
+        self.insert("Alice", "Math", 90)
+        self.insert("Bob", "Math", 70)
+        summary = db.get_subject_summaries("Math", conn=self.conn)[0]
+        self.assertEqual(summary["mean"], 80.0)
+        self.assertAlmostEqual(summary["std"], 10.0)
+
+    def test_rebuild(self):
+        self.insert("Alice", "Math", 90)
+        self.conn.execute("DELETE FROM subject_summary")
+        models.rebuild_summaries(self.conn.cursor())
+        self.assert_in_sync()